@@ -6,6 +6,7 @@ import streamlit as st
 from data_sources.nefino_news.analysis import create_news_analysis
 from data_sources.web_search.analysis import create_search_engine_analysis
 from dotenv import load_dotenv
+from enums import NewsEnergyType
 from langchain.output_parsers import JsonOutputToolsParser
 from langchain.tools import StructuredTool
 from langchain_core.prompts import ChatPromptTemplate
@@ -21,12 +22,15 @@ llm = ChatOpenAI(organization=OPENAI_ORG_ID, model=OPENAI_SMART_LLM, temperature
 
 
 # Step 1: Create a combined analysis from Nefino LI News and Google Search
-async def generate_combined_analysis(place: dict[str, str]) -> str:
+async def generate_combined_analysis(
+    place: dict[str, str], energy_type: NewsEnergyType = NewsEnergyType.SOLAR
+) -> str:
     """
     Create a combined analysis from Nefino LI News and Google Search.
 
     Args:
         place: A dictionary containing place information.
+        energy_type: The energy type selection of the news analysis.
 
     Returns:
         A string that represents the combined analysis.
@@ -35,7 +39,9 @@ async def generate_combined_analysis(place: dict[str, str]) -> str:
     validate_place_id(place["id"])
 
     # gather infos from Nefino LI News
-    news_analysis_future = asyncio.create_task(create_news_analysis(place))
+    news_analysis_future = asyncio.create_task(
+        create_news_analysis(place, energy_type)
+    )
 
     # gather infos from Google Search
     search_engine_analysis_future = asyncio.create_task(
@@ -113,7 +119,9 @@ async def evaluate_attitude(place, analysis: str) -> str:
 
 # Full analysis which combines the above two steps asynchronously
 async def run_full_analysis(
-    targets: list[dict[str, str]], cancel_flag: asyncio.Event
+    targets: list[dict[str, str]],
+    cancel_flag: asyncio.Event,
+    energy_type: NewsEnergyType = NewsEnergyType.SOLAR,
 ) -> list[str]:
     total_tasks = (
         len(targets) * 2
@@ -130,7 +138,8 @@ async def run_full_analysis(
 
     for split in targets_splits:
         analyses_tasks = [
-            asyncio.create_task(generate_combined_analysis(target)) for target in split
+            asyncio.create_task(generate_combined_analysis(target, energy_type))
+            for target in split
         ]
         evaluation_tasks = []
         while (analyses_tasks or evaluation_tasks) and not cancel_flag.is_set():
@@ -0,0 +1,143 @@
+"""
+Benchmark of the quantized embedding storage modes on an existing news table.
+
+Loads the embeddings of a populated news table and uses a sample of them as queries. For
+float16 and int8 it compares the quantized first pass with exact re-ranking against exact
+search and reports recall@k, the memory of the first-pass embeddings and the disk usage of
+the stored columns or files.
+
+Run from /src, e.g.: python -m benchmarks.quantization --table nefino_news_energy_types --backend local
+"""
+
+import argparse
+import os
+
+import numpy as np
+from utility.connections import get_clickhouse_client
+from utility.local_news_store import get_local_news_store
+from utility.quantization import (
+    QuantizationSettings,
+    quantize,
+    squared_distances,
+    top_k,
+)
+
+
+def load_embeddings(table: str, backend: str) -> np.ndarray:
+    """
+    Loads all embeddings of a news table.
+
+    Args:
+        table: The name of the news table.
+        backend: "clickhouse" or "local".
+
+    Returns:
+        A float32 matrix with one embedding per row.
+    """
+    if backend == "local":
+        return np.asarray(get_local_news_store(table, None).vectors)
+    result = get_clickhouse_client().query(f"SELECT embedding FROM {table}")
+    return np.asarray([row[0] for row in result.result_rows], dtype=np.float32)
+
+
+def disk_usage(table: str, backend: str) -> dict[str, int]:
+    """
+    Reads the bytes the embeddings take on disk.
+
+    Args:
+        table: The name of the news table.
+        backend: "clickhouse" or "local".
+
+    Returns:
+        The compressed bytes of each embedding column, or the size of each embedding file.
+    """
+    if backend == "local":
+        directory = get_local_news_store(table, None).directory
+        return {
+            name: os.path.getsize(os.path.join(directory, name))
+            for name in sorted(os.listdir(directory))
+            if name.startswith(("vectors.", "scales."))
+        }
+    result = get_clickhouse_client().query(
+        "SELECT name, data_compressed_bytes FROM system.columns "
+        "WHERE database = currentDatabase() AND table = {table:String} "
+        "AND name LIKE 'embedding%'",
+        parameters={"table": table},
+    )
+    return dict(result.result_rows)
+
+
+def recall_at_k(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    query_rows: np.ndarray,
+    settings: QuantizationSettings,
+    k: int,
+) -> float:
+    """
+    Measures the recall of the quantized search against exact search.
+
+    The query chunks themselves are excluded from both results.
+
+    Args:
+        vectors: The float32 embeddings.
+        queries: The query embeddings.
+        query_rows: The row of each query embedding.
+        settings: The quantization settings.
+        k: The number of results per query.
+
+    Returns:
+        The mean recall@k.
+    """
+    codes, scales = quantize(vectors, settings)
+    recalls = []
+    for query, query_row in zip(queries, query_rows):
+        exact = top_k(squared_distances(vectors, query), k + 1)
+        exact = set(exact[exact != query_row][:k])
+
+        first_pass = top_k(
+            squared_distances(codes, query, scales), (k + 1) * settings.oversampling
+        )
+        distances = squared_distances(vectors[first_pass], query)
+        found = first_pass[top_k(distances, k + 1)]
+        found = set(found[found != query_row][:k])
+        recalls.append(len(found & exact) / len(exact))
+    return float(np.mean(recalls))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--table", default="nefino_news_energy_types")
+    parser.add_argument("--backend", default="clickhouse", choices=["clickhouse", "local"])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument(
+        "--oversampling", type=int, default=QuantizationSettings.oversampling
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    vectors = load_embeddings(args.table, args.backend)
+    rows, dimension = vectors.shape
+    rng = np.random.default_rng(args.seed)
+    query_rows = rng.choice(rows, size=min(args.queries, rows), replace=False)
+    queries = vectors[query_rows]
+
+    full_bytes = QuantizationSettings().bytes_per_vector(dimension) * rows
+    print(f"Corpus: {rows} chunks of dimension {dimension} in {args.table}")
+    print(f"{'float32':>8} first pass memory: {full_bytes / 2**20:10.1f} MiB")
+    for mode in ("float16", "int8"):
+        settings = QuantizationSettings(mode=mode, oversampling=args.oversampling)
+        quantized_bytes = settings.bytes_per_vector(dimension) * rows
+        recall = recall_at_k(vectors, queries, query_rows, settings, args.k)
+        print(
+            f"{mode:>8} first pass memory: {quantized_bytes / 2**20:10.1f} MiB "
+            f"({1 - quantized_bytes / full_bytes:.0%} saved), "
+            f"recall@{args.k} with {args.oversampling}x re-ranking: {recall:.3f}"
+        )
+    for name, size in disk_usage(args.table, args.backend).items():
+        print(f"Disk {name}: {size / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
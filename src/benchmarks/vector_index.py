@@ -0,0 +1,207 @@
+"""
+Benchmark of the ANN index modes of the news tables.
+
+Fills a news table with a synthetic corpus of clustered, normalized embeddings and compares
+searches through the configured ANN index with exact brute-force searches. Reports recall@k
+against the exact results and the p50/p99 latency of both.
+
+Run from /src, e.g.: python -m benchmarks.vector_index --index annoy --trees 100
+"""
+
+import argparse
+import json
+import time
+from datetime import date
+from typing import Iterator
+
+import numpy as np
+from utility.connections import get_clickhouse_client
+from utility.news_store import (
+    ANN_INDEX_NAME,
+    NEWS_CHUNK_COLUMNS,
+    NewsIndexSettings,
+    NewsVectorStore,
+)
+from utility.quantization import QuantizationSettings
+
+
+def generate_vectors(
+    rng: np.random.Generator,
+    centers: np.ndarray,
+    count: int,
+    batch_size: int,
+    noise: float = 0.35,
+) -> Iterator[np.ndarray]:
+    """
+    Generates normalized vectors scattered around cluster centers, batch by batch.
+
+    Args:
+        rng: The random generator.
+        centers: The cluster centers.
+        count: The number of vectors.
+        batch_size: The number of vectors per batch.
+        noise: The standard deviation of the scatter around the centers.
+
+    Yields:
+        A float32 matrix with one vector per row.
+    """
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        vectors = centers[rng.integers(len(centers), size=size)]
+        vectors = vectors + noise * rng.standard_normal(vectors.shape, dtype=np.float32)
+        yield vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def fill_table(
+    store: NewsVectorStore, vectors: Iterator[np.ndarray], chunks: int
+) -> None:
+    """
+    Inserts the synthetic corpus into the news table with one columnar insert per batch.
+
+    Args:
+        store: The vector store of the benchmark table.
+        vectors: The batches of embeddings.
+        chunks: The total number of chunks, used for the progress output.
+    """
+    inserted = 0
+    for batch in vectors:
+        news_ids = range(inserted, inserted + len(batch))
+        columns = [
+            [str(news_id) for news_id in news_ids],
+            [""] * len(batch),
+            list(news_ids),
+            [date(2024, 1, 1)] * len(batch),
+            [f"DE_{news_id % 11000:08d}" for news_id in news_ids],
+            [0] * len(batch),
+            [""] * len(batch),
+            [["SOLAR"]] * len(batch),
+            [[]] * len(batch),
+            [""] * len(batch),
+            [json.dumps({"news_id": news_id}) for news_id in news_ids],
+            list(batch),
+        ]
+        store.client.insert(
+            store.table,
+            columns,
+            column_names=NEWS_CHUNK_COLUMNS,
+            column_oriented=True,
+        )
+        inserted += len(batch)
+        print(f"\rInserted {inserted}/{chunks} chunks", end="", flush=True)
+    print()
+
+
+def run_queries(
+    store: NewsVectorStore, queries: np.ndarray, k: int
+) -> tuple[list[set[int]], np.ndarray]:
+    """
+    Runs every query against the vector store.
+
+    Args:
+        store: The vector store to search.
+        queries: The query embeddings.
+        k: The number of results per query.
+
+    Returns:
+        The news IDs found for each query and the latency of each query in milliseconds.
+    """
+    results = []
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        documents = store.similarity_search_with_score_by_vector(query.tolist(), k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append({document.metadata["news_id"] for document, _ in documents})
+    return results, np.asarray(latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--table", default="benchmark_news")
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index", default="annoy", choices=["annoy", "usearch"])
+    parser.add_argument("--trees", type=int, default=NewsIndexSettings.trees)
+    parser.add_argument(
+        "--search-k-nodes", type=int, default=NewsIndexSettings.search_k_nodes
+    )
+    parser.add_argument(
+        "--granularity", type=int, default=NewsIndexSettings.granularity
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--reuse", action="store_true", help="Reuse a filled benchmark table."
+    )
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centers = rng.standard_normal((args.clusters, args.dimension), dtype=np.float32)
+
+    index_settings = NewsIndexSettings(
+        index_type=args.index,
+        trees=args.trees,
+        search_k_nodes=args.search_k_nodes,
+        granularity=args.granularity,
+    )
+    if not args.reuse:
+        get_clickhouse_client().command(f"DROP TABLE IF EXISTS {args.table}")
+    # Both stores pin the quantization, so the environment cannot change what is measured
+    ann_store = NewsVectorStore(
+        args.table,
+        None,
+        get_clickhouse_client,
+        index_settings=index_settings,
+        quantization=QuantizationSettings(mode="none"),
+    )
+    exact_store = NewsVectorStore(
+        args.table,
+        None,
+        get_clickhouse_client,
+        index_settings=NewsIndexSettings(index_type="none"),
+        quantization=QuantizationSettings(mode="none"),
+    )
+
+    if not args.reuse:
+        fill_table(
+            ann_store,
+            generate_vectors(rng, centers, args.chunks, args.batch_size),
+            args.chunks,
+        )
+        # One part per partition, so the ANN index is searched once per query
+        ann_store.client.command(
+            f"OPTIMIZE TABLE {args.table} FINAL",
+            settings=index_settings.creation_settings,
+        )
+
+    queries = next(generate_vectors(rng, centers, args.queries, args.queries))
+    explanation = ann_store.explain_search(queries[0].tolist(), args.k)
+    if f"Name: {ANN_INDEX_NAME}" not in explanation:
+        raise RuntimeError(
+            f"The ANN searches do not use the {ANN_INDEX_NAME} index:\n{explanation}"
+        )
+    exact_results, exact_latencies = run_queries(exact_store, queries, args.k)
+    ann_results, ann_latencies = run_queries(ann_store, queries, args.k)
+
+    recall = np.mean(
+        [
+            len(ann & exact) / len(exact)
+            for ann, exact in zip(ann_results, exact_results)
+            if exact
+        ]
+    )
+    print(f"Corpus: {ann_store.count()} chunks of dimension {args.dimension}")
+    print(f"Index: {index_settings}")
+    print(f"recall@{args.k}: {recall:.3f}")
+    for name, latencies in (("exact", exact_latencies), (args.index, ann_latencies)):
+        print(
+            f"{name:>8} latency p50: {np.percentile(latencies, 50):8.2f} ms, "
+            f"p99: {np.percentile(latencies, 99):8.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,56 +1,233 @@
+import asyncio
+import hashlib
 import os
 from operator import itemgetter
 
 from dotenv import load_dotenv
+from enums import NewsEnergyType
+from langchain_core.messages import AIMessage
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import Runnable
 from langchain_openai.chat_models import ChatOpenAI
 from prompts.news import (
     BASIC_NEWS_PROMPT,
 )
-from utility.database import establish_clickhouse_connection
+from utility.database import create_news_retriever, get_news_vector_store
+from utility.news_digests import (
+    NewsDigest,
+    combine_fingerprints,
+    fingerprint_news,
+    load_news_digests,
+    save_news_digests,
+)
+from utility.places import get_place_lineage
+from utility.retrieval import (
+    NEWS_CONTEXT_FORMAT,
+    RetrievalSettings,
+    format_news_context,
+)
 
 load_dotenv(verbose=True)
 OPENAI_ORG_ID = os.getenv("OPENAI_ORG_ID")
 OPENAI_SMART_LLM = os.getenv("OPENAI_SMART_LLM")
 llm = ChatOpenAI(organization=OPENAI_ORG_ID, model=OPENAI_SMART_LLM, temperature=0)
+# The answer to BASIC_NEWS_PROMPT when no news are stored about any place of the scope
+NO_NEWS_DIGEST = "\n".join(f"CF{feature}: N/A" for feature in range(1, 6))
 
 
-def create_news_analysis_chain() -> Runnable:
+def create_news_analysis_chain(
+    energy_type: NewsEnergyType, place_ids: list[str] | None = None
+) -> Runnable:
     """
     Creates a chain for generating a news analysis.
 
+    Args:
+        energy_type: The energy type selection to retrieve news about.
+        place_ids: Only retrieve news about these places. Defaults to all places.
+
     Returns:
         A LangChain Runnable.
     """
     prompt = ChatPromptTemplate.from_template(BASIC_NEWS_PROMPT)
-    vs = establish_clickhouse_connection()
-    retriever = vs.as_retriever()
+    retriever = create_news_retriever(energy_type, place_ids)
 
     chain = {
-        "context": itemgetter("question") | retriever,
+        "context": itemgetter("question") | retriever | format_news_context,
         "place": itemgetter("place"),
     } | prompt | llm
     return chain
 
 
-async def create_news_analysis(place: dict[str] = None) -> str:
+def get_news_scope(
+    place: dict[str], include_ancestors: bool = True
+) -> tuple[str, list[str]]:
     """
-    Creates a news analysis for a given place.
+    Determines the search query and the places to retrieve news about for a place.
 
     Args:
         place: A dictionary containing place information.
+        include_ancestors: Whether to include the news about the ancestors of the place.
 
     Returns:
-        A string containing the news analysis.
+        The search query and the IDs of the places.
     """
-    ChatPromptTemplate.from_template(BASIC_NEWS_PROMPT)
+    # Name the surrounding places to disambiguate municipalities with the same name
+    lineage = get_place_lineage(place["id"])
+    ancestor_names = ", ".join(ancestor.name for ancestor in lineage[1:])
     search_query = str(
-        f'Kriterienkatalog, Flächennutzungsplan, Klimaschutzmanager, Standortkonzept in {place["name"]} {place["id"]}'
+        f'Kriterienkatalog, Flächennutzungsplan, Klimaschutzmanager, Standortkonzept in {place["name"]} {place["id"]} ({ancestor_names})'
+    )
+    place_ids = [
+        scoped_place.nuts_code
+        for scoped_place in (lineage if include_ancestors else lineage[:1])
+    ]
+    return search_query, place_ids
+
+
+def fingerprint_news_scope(
+    place_ids: list[str], place_fingerprints: dict[str, str]
+) -> str:
+    """
+    Computes the fingerprint of the news analysis of a place.
+
+    It changes whenever the news about any of the places change, and with the model, the
+    prompt, the context format or the retrieval settings.
+
+    Args:
+        place_ids: The IDs of the places the news are retrieved about.
+        place_fingerprints: The fingerprint of the news about each place with news.
+
+    Returns:
+        The fingerprint.
+    """
+    return combine_fingerprints(
+        OPENAI_SMART_LLM or "",
+        hashlib.sha256(BASIC_NEWS_PROMPT.encode("utf-8")).hexdigest(),
+        NEWS_CONTEXT_FORMAT,
+        repr(RetrievalSettings.from_environment()),
+        *(
+            place_fingerprints.get(place_id, fingerprint_news([]))
+            for place_id in place_ids
+        ),
+    )
+
+
+def get_place_fingerprints(
+    energy_type: NewsEnergyType, place_ids: list[str] | None = None
+) -> dict[str, str]:
+    """
+    Fingerprints the stored news grouped by their place.
+
+    Args:
+        energy_type: The energy type selection to fingerprint the news of.
+        place_ids: Only fingerprint the news about these places. Defaults to all places.
+
+    Returns:
+        The fingerprint of the news about each place with news by its ID.
+    """
+    versions = get_news_vector_store().news_versions_by_place(
+        place_ids, list(energy_type.value)
     )
+    return {
+        place_id: fingerprint_news(place_versions)
+        for place_id, place_versions in versions.items()
+    }
+
 
-    chain = create_news_analysis_chain()
+def has_news(place_ids: list[str], place_fingerprints: dict[str, str]) -> bool:
+    """
+    Checks whether news are stored about any of the given places.
+
+    Args:
+        place_ids: The IDs of the places the news are retrieved about.
+        place_fingerprints: The fingerprint of the news about each place with news.
+
+    Returns:
+        Whether any of the places has news.
+    """
+    return any(place_id in place_fingerprints for place_id in place_ids)
+
+
+async def compute_news_digest(
+    place: dict[str],
+    energy_type: NewsEnergyType,
+    include_ancestors: bool,
+    fingerprint: str,
+    with_news: bool = True,
+) -> NewsDigest:
+    """
+    Runs the news analysis chain for a place.
+
+    Without news the chain is not run, the digest is NO_NEWS_DIGEST.
+
+    Args:
+        place: A dictionary containing place information.
+        energy_type: The energy type selection to retrieve news about.
+        include_ancestors: Whether to include the news about the ancestors of the place.
+        fingerprint: The fingerprint of the news the analysis is computed from.
+        with_news: Whether news are stored about any place of the scope, see has_news.
+
+    Returns:
+        The news digest of the place.
+    """
+    if not with_news:
+        return NewsDigest(
+            place_id=place["id"],
+            energy_type=energy_type.name,
+            include_ancestors=include_ancestors,
+            fingerprint=fingerprint,
+            digest=NO_NEWS_DIGEST,
+        )
+    search_query, place_ids = get_news_scope(place, include_ancestors)
+    chain = create_news_analysis_chain(energy_type, place_ids)
     news_analysis = await chain.ainvoke(
         input={"question": search_query, "place": place["name"]}
     )
-    return news_analysis
+    return NewsDigest(
+        place_id=place["id"],
+        energy_type=energy_type.name,
+        include_ancestors=include_ancestors,
+        fingerprint=fingerprint,
+        digest=news_analysis.content,
+    )
+
+
+async def create_news_analysis(
+    place: dict[str] = None,
+    energy_type: NewsEnergyType = NewsEnergyType.SOLAR,
+    include_ancestors: bool = True,
+) -> AIMessage:
+    """
+    Creates a news analysis for a given place.
+
+    Only news about the place itself are retrieved, optionally widened to the news about
+    its ancestors like its county or federal state. The analysis is looked up in the news
+    digests and only computed if the news about these places changed since it was stored.
+
+    Args:
+        place: A dictionary containing place information.
+        energy_type: The energy type selection to retrieve news about.
+        include_ancestors: Whether to include the news about the ancestors of the place.
+
+    Returns:
+        A message containing the news analysis.
+    """
+    _, place_ids = get_news_scope(place, include_ancestors)
+    place_fingerprints = await asyncio.to_thread(
+        get_place_fingerprints, energy_type, place_ids
+    )
+    fingerprint = fingerprint_news_scope(place_ids, place_fingerprints)
+    stored = await asyncio.to_thread(
+        load_news_digests, energy_type.name, include_ancestors, [place["id"]]
+    )
+    digest = stored.get(place["id"])
+    if digest is None or digest.fingerprint != fingerprint:
+        digest = await compute_news_digest(
+            place,
+            energy_type,
+            include_ancestors,
+            fingerprint,
+            has_news(place_ids, place_fingerprints),
+        )
+        await asyncio.to_thread(save_news_digests, [digest])
+    return AIMessage(content=digest.digest)
@@ -1,6 +1,7 @@
 import os
 
 from dotenv import load_dotenv
+from enums import NewsEnergyType
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables import Runnable, RunnablePassthrough
@@ -9,7 +10,7 @@ from prompts.bonus_chat import (
     CONTEXTUALIZE_PROMPT,
     QA_CHAT_BOT_PROMPT,
 )
-from utility.database import establish_clickhouse_connection
+from utility.database import create_news_retriever
 
 load_dotenv(verbose=True)
 OPENAI_ORG_ID = os.getenv("OPENAI_ORG_ID")
@@ -47,15 +48,17 @@ def create_contextualize_chain() -> Runnable:
     return contextualize_q_prompt | llm | StrOutputParser()
 
 
-def create_chat_chain() -> Runnable:
+def create_chat_chain(energy_type: NewsEnergyType = NewsEnergyType.SOLAR) -> Runnable:
     """
     Creates a chain for a chat.
 
+    Args:
+        energy_type: The energy type selection to retrieve news about.
+
     Returns:
         A LangChain Runnable.
     """
-    vs = establish_clickhouse_connection()
-    retriever = vs.as_retriever()
+    retriever = create_news_retriever(energy_type)
 
     qa_prompt = ChatPromptTemplate.from_messages(
         [
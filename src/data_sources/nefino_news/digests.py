@@ -0,0 +1,128 @@
+"""
+Offline job precomputing the news digests of all places.
+
+The stored news are grouped by place and fingerprinted in one pass. Only the places whose
+digest is missing or was computed from other news, another model, prompt or retrieval
+settings are analyzed again, so rerunning the job after a news update is cheap.
+
+Run from /src, e.g.: python -m data_sources.nefino_news.digests --energy-type SOLAR
+"""
+
+import argparse
+import asyncio
+
+from data_sources.nefino_news.analysis import (
+    compute_news_digest,
+    fingerprint_news_scope,
+    get_news_scope,
+    get_place_fingerprints,
+    has_news,
+)
+from enums import NewsEnergyType
+from utility.llm_cache import enable_llm_response_cache
+from utility.news_digests import NewsDigest, load_news_digests, save_news_digests
+from utility.places import get_selection_targets
+
+
+async def build_news_digests(
+    places: list[dict[str]],
+    energy_type: NewsEnergyType,
+    include_ancestors: bool = True,
+    concurrency: int = 4,
+    batch_size: int = 50,
+) -> dict[str, int]:
+    """
+    Computes the missing and outdated news digests of the given places.
+
+    Computed digests are saved in batches, so an interrupted job keeps most of its work.
+    Places without any news in their scope get an empty digest without running the chain.
+
+    Args:
+        places: The places, each a dictionary with an "id" and "name".
+        energy_type: The energy type selection to retrieve news about.
+        include_ancestors: Whether to include the news about the ancestors of the places.
+        concurrency: The maximum number of concurrent analyses.
+        batch_size: The number of digests saved at once.
+
+    Returns:
+        The number of "current" digests, of "computed" digests and of "empty" digests of
+        places without news.
+    """
+    place_fingerprints = get_place_fingerprints(energy_type)
+    stored = load_news_digests(energy_type.name, include_ancestors)
+
+    outdated, empty = [], []
+    for place in places:
+        _, place_ids = get_news_scope(place, include_ancestors)
+        fingerprint = fingerprint_news_scope(place_ids, place_fingerprints)
+        digest = stored.get(place["id"])
+        if digest is not None and digest.fingerprint == fingerprint:
+            continue
+        if has_news(place_ids, place_fingerprints):
+            outdated.append((place, fingerprint))
+        else:
+            empty.append(
+                await compute_news_digest(
+                    place, energy_type, include_ancestors, fingerprint, False
+                )
+            )
+    save_news_digests(empty)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def compute(place: dict[str], fingerprint: str) -> NewsDigest:
+        async with semaphore:
+            return await compute_news_digest(
+                place, energy_type, include_ancestors, fingerprint
+            )
+
+    batch = []
+    for task in asyncio.as_completed(
+        [compute(place, fingerprint) for place, fingerprint in outdated]
+    ):
+        batch.append(await task)
+        if len(batch) >= batch_size:
+            save_news_digests(batch)
+            print(f"Saved {len(batch)} news digests.")
+            batch = []
+    save_news_digests(batch)
+    return {
+        "current": len(places) - len(outdated) - len(empty),
+        "computed": len(outdated),
+        "empty": len(empty),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--energy-type",
+        default=NewsEnergyType.SOLAR.name,
+        choices=[energy_type.name for energy_type in NewsEnergyType],
+    )
+    parser.add_argument("--place-only", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    llm_cache = enable_llm_response_cache()
+    statistics = asyncio.run(
+        build_news_digests(
+            get_selection_targets(),
+            NewsEnergyType[args.energy_type],
+            include_ancestors=not args.place_only,
+            concurrency=args.concurrency,
+        )
+    )
+    print(
+        f"{statistics['computed']} news digests computed, "
+        f"{statistics['empty']} places without news, "
+        f"{statistics['current']} were up to date."
+    )
+    if llm_cache is not None:
+        print(
+            f"LLM cache: {llm_cache.store.hits} hits, {llm_cache.store.misses} misses."
+        )
+
+
+if __name__ == "__main__":
+    main()
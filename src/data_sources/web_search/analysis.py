@@ -1,3 +1,4 @@
+import asyncio
 import os
 from operator import itemgetter
 
@@ -9,11 +10,14 @@ from prompts.google_search import FINAL_WEB_ANALYSIS_PROMPT
 from data_sources.web_search.google_knowledge_graph import search_knowledge_graph
 from data_sources.web_search.google_web_search import google_web_search
 from data_sources.web_search.individual_analysis_agent import (
-    run_individual_analysis_agent,
+    arun_individual_analysis_agent,
 )
 
 OPENAI_ORG_ID = os.getenv("OPENAI_ORG_ID")
 OPENAI_SMART_LLM = os.getenv("OPENAI_SMART_LLM")
+# The maximum number of concurrent agents per place and the seconds each may take
+WEB_ANALYSIS_CONCURRENCY = int(os.getenv("WEB_ANALYSIS_CONCURRENCY", 4))
+WEB_ANALYSIS_TIMEOUT = float(os.getenv("WEB_ANALYSIS_TIMEOUT", 180))
 
 llm = ChatOpenAI(organization=OPENAI_ORG_ID, model=OPENAI_SMART_LLM, temperature=0)
 
@@ -31,23 +35,38 @@ def combine_individual_analyses(individual_analysis: list[str]) -> str:
     return "\n\n".join(individual_analysis)
 
 
-def analyze_each_search(_dict) -> list[str]:
+async def analyze_each_search(_dict) -> str:
     """
     Analyze each search result.
 
+    The agents run concurrently, at most WEB_ANALYSIS_CONCURRENCY at a time, and each is
+    given WEB_ANALYSIS_TIMEOUT seconds. The analyses keep the order of the search results,
+    so the final prompt is deterministic.
+
     Args:
         _dict: A dictionary containing search results and context.
 
     Returns:
-        A list of analyses.
+        The combined analyses.
     """
-
-    indi_analyses = [
-        run_individual_analysis_agent(
-            str({"search_result": result, "context": _dict["context"]})
-        )
-        for result in _dict["search_results"]
-    ]
+    semaphore = asyncio.Semaphore(WEB_ANALYSIS_CONCURRENCY)
+
+    async def analyze(result: dict) -> str:
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(
+                    arun_individual_analysis_agent(
+                        str({"search_result": result, "context": _dict["context"]})
+                    ),
+                    timeout=WEB_ANALYSIS_TIMEOUT,
+                )
+            except asyncio.TimeoutError:
+                target = result.get("target")
+                return f"The analysis of the search for {target} timed out."
+
+    indi_analyses = await asyncio.gather(
+        *(analyze(result) for result in _dict["search_results"])
+    )
     return combine_individual_analyses(indi_analyses)
 
 
@@ -105,74 +124,86 @@ async def create_search_engine_analysis(place: dict[str]) -> str:
     """
     Create a search engine analysis.
 
+    The Knowledge Graph lookup finds the website of the place, then the restricted and the
+    general searches are all issued concurrently.
+
     Args:
         place: A dictionary containing place information.
 
     Returns:
         A search engine analysis.
     """
-    place_context = search_knowledge_graph(place["name"])
+    place_context = await search_knowledge_graph(place["name"])
     search_queries = [
         "Klimaschutzmanager",
         "(Kriterienkatalog OR Standortkonzept) (FFPV OR PV-FFA OR Freiflächenphotovoltaik)",
         "Flächennutzungsplan",
         "FFPV or PV-FFA",
     ]
-    raw_search_results = []
+    searches = [run_general_search(place, search_queries)]
 
-    if place_context.get("URL"):
-        raw_search_results = run_restricted_search(
-            place, search_queries, place_context.get("URL")
-        )
-    raw_search_results += run_general_search(place, search_queries)
+    url = place_context.get("url")
+    if url and url != "Not found":
+        searches.insert(0, run_restricted_search(place, search_queries, url))
+    raw_search_results = [
+        result for results in await asyncio.gather(*searches) for result in results
+    ]
 
     response = await run_search_analysis_chain(raw_search_results, str(place_context))
     return response.content
 
 
-def run_general_search(place: dict[str], search_queries: list[str]) -> list[str]:
+async def run_general_search(place: dict[str], search_queries: list[str]) -> list[str]:
     """
     Run an unrestricted search on a set of search queries.
 
+    The queries are issued concurrently.
+
     Args:
         place: The place to search for.
         search_queries: A list of search queries.
 
     Returns:
-        A list of raw search results.
+        A list of raw search results, in the order of the queries.
     """
-    raw_search_results = []
-    for instruction in search_queries:
-        raw_search_results.append(
+    search_results = await asyncio.gather(
+        *(
             google_web_search(instruction + " " + place["name"])
-            | {"target": instruction}
+            for instruction in search_queries
         )
-
-    return raw_search_results
+    )
+    return [
+        search_result | {"target": instruction}
+        for instruction, search_result in zip(search_queries, search_results)
+    ]
 
 
-def run_restricted_search(
+async def run_restricted_search(
     place: dict[str], search_queries: list[str], url: str
 ) -> list[str]:
     """
     Run a restricted search on a set of search queries.
 
+    The queries are issued concurrently.
+
     Args:
         place: The place to search for.
         search_queries: A list of search queries.
         url: The URL to restrict the search to.
 
     Returns:
-        A list of raw search results.
+        A list of raw search results, in the order of the queries.
     """
-    raw_search_results = []
-    for instruction in search_queries:
-        raw_search_results.append(
+    search_results = await asyncio.gather(
+        *(
             google_web_search(
                 instruction + " " + place["name"],
                 restrict_to_site=url,
             )
-            | {"target": instruction}
+            for instruction in search_queries
         )
-
-    return raw_search_results
+    )
+    return [
+        search_result | {"target": instruction}
+        for instruction, search_result in zip(search_queries, search_results)
+    ]
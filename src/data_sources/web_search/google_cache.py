@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import json
+import os
+import unicodedata
+from typing import Any, Awaitable, Callable
+
+from dotenv import load_dotenv
+from utility.cache import DiskCache, get_cache_directory
+from utility.http_client import get_async_http_client
+
+load_dotenv()
+# Google results change slowly, a week keeps batch runs and re-runs within the CSE quota
+GOOGLE_CACHE_TTL = float(os.getenv("GOOGLE_CACHE_TTL", 7 * 24 * 60 * 60))
+# Request parameters which do not change the response and are left out of the cache key
+UNKEYED_PARAMETERS = ("key",)
+
+google_cache = DiskCache(
+    os.path.join(get_cache_directory("google"), "responses.sqlite"),
+    ttl=GOOGLE_CACHE_TTL or None,
+)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a search query, so spelling variants of the same query share a cache entry.
+
+    The case is kept, as Google only reads uppercase OR as an operator.
+
+    Args:
+        query: The search query.
+
+    Returns:
+        The query in Unicode NFC form with collapsed whitespace.
+    """
+    return " ".join(unicodedata.normalize("NFC", query).split())
+
+
+def get_cache_key(url: str, params: dict[str, Any]) -> str:
+    """
+    Computes the cache key of a Google API request.
+
+    Args:
+        url: The URL of the API endpoint.
+        params: The request parameters, with the query already normalized.
+
+    Returns:
+        The hex digest of the endpoint and its keyed parameters.
+    """
+    keyed = {
+        name: value for name, value in params.items() if name not in UNKEYED_PARAMETERS
+    }
+    return hashlib.sha256(
+        json.dumps([url, keyed], sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls with the same key.
+
+    The first caller of a key starts the coroutine, later callers on the same event loop
+    await the same task and share its result or exception instead of starting it again.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize the SingleFlight class.
+        """
+        self._tasks: dict[tuple[asyncio.AbstractEventLoop, str], asyncio.Task] = {}
+
+    async def do(self, key: str, function: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Runs a coroutine function once for all concurrent callers of the same key.
+
+        Args:
+            key: The key of the call.
+            function: The coroutine function to run.
+
+        Returns:
+            The result of the coroutine.
+
+        Raises:
+            Exception: The exception raised by the coroutine.
+        """
+        loop = asyncio.get_running_loop()
+        task = self._tasks.get((loop, key))
+        if task is None:
+            task = loop.create_task(function())
+            self._tasks[(loop, key)] = task
+            task.add_done_callback(lambda _: self._tasks.pop((loop, key), None))
+        # A cancelled caller must not cancel the request the other callers wait for
+        return await asyncio.shield(task)
+
+
+_single_flight = SingleFlight()
+
+
+async def get_google_json(url: str, params: dict[str, Any]) -> dict:
+    """
+    Requests a Google API, serving fresh responses from the on-disk cache.
+
+    Identical requests in flight are sent once, over the pooled connections of the event
+    loop. Failed requests are not cached.
+
+    Args:
+        url: The URL of the API endpoint.
+        params: The request parameters.
+
+    Returns:
+        The JSON response.
+
+    Raises:
+        httpx.HTTPStatusError: If there is an error in the HTTP request.
+    """
+    key = get_cache_key(url, params)
+    cached = google_cache.get(key)
+    if cached is not None:
+        return json.loads(cached)
+
+    async def fetch() -> dict:
+        response = await get_async_http_client().get(url, params=params)
+        response.raise_for_status()
+        google_cache.set(key, response.text)
+        return response.json()
+
+    return await _single_flight.do(key, fetch)
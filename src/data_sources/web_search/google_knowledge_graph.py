@@ -1,13 +1,14 @@
 import os
 
-import requests
 from dotenv import load_dotenv
 
+from data_sources.web_search.google_cache import get_google_json, normalize_query
+
 load_dotenv()
 API_KEY = os.getenv("GOOGLE_API_KEY")
 
 
-def search_knowledge_graph(query: str) -> dict[str, str]:
+async def search_knowledge_graph(query: str) -> dict[str, str]:
     """
     Search the Google Knowledge Graph for information related to the given query.
 
@@ -18,19 +19,17 @@ def search_knowledge_graph(query: str) -> dict[str, str]:
         The extracted data from the Knowledge Graph, including the name, URL, and description.
 
     Raises:
-        requests.exceptions.HTTPError: If there is an error in the HTTP request.
+        httpx.HTTPStatusError: If there is an error in the HTTP request.
     """
     url = "https://kgsearch.googleapis.com/v1/entities:search"
     params = {
-        "query": query,
+        "query": normalize_query(query),
         "key": API_KEY,
         "types": "AdministrativeArea",
         "languages": "de",
     }
 
-    response = requests.get(url, params=params)
-    response.raise_for_status()
-    data = response.json()
+    data = await get_google_json(url, params)
 
     if "itemListElement" not in data or len(data["itemListElement"]) == 0:
         return {}
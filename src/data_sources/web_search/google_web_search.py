@@ -1,8 +1,9 @@
 import os
 
-import requests
 from dotenv import load_dotenv
 
+from data_sources.web_search.google_cache import get_google_json, normalize_query
+
 load_dotenv()
 API_KEY = os.getenv("GOOGLE_API_KEY")
 GOOGLE_CSE_ID = os.getenv(
@@ -10,7 +11,7 @@ GOOGLE_CSE_ID = os.getenv(
 )  # https://programmablesearchengine.google.com/controlpanel/all
 
 
-def google_web_search(query: str, restrict_to_site: str = None) -> dict:
+async def google_web_search(query: str, restrict_to_site: str = None) -> dict:
     """
     Perform a web search using the Google Custom Search API.
 
@@ -27,7 +28,7 @@ def google_web_search(query: str, restrict_to_site: str = None) -> dict:
         "cx": GOOGLE_CSE_ID,
         "gl": "de",
         "hl": "de",
-        "q": query,
+        "q": normalize_query(query),
         "num": 4,
     }
 
@@ -36,9 +37,7 @@ def google_web_search(query: str, restrict_to_site: str = None) -> dict:
         params["siteSearch"] = restrict_to_site
         params["siteSearchFilter"] = "i"
 
-    response = requests.get(url, params=params)
-    response.raise_for_status()
-    data = response.json()
+    data = await get_google_json(url, params)
 
     if "items" not in data:
         extracted_results = []
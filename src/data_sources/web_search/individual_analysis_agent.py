@@ -1,24 +1,30 @@
+import asyncio
 import os
+import threading
 from typing import Any
 
 from dotenv import load_dotenv
-from langchain import hub
 from langchain.agents import (
     AgentExecutor,
     BaseMultiActionAgent,
     create_openai_tools_agent,
-    load_tools,
 )
 from langchain.chains.combine_documents.stuff import StuffDocumentsChain
 from langchain.chains.llm import LLMChain
 from langchain.text_splitter import TokenTextSplitter
 from langchain.tools import BaseTool, StructuredTool
 from langchain_core.documents import Document
-from langchain_core.prompts import PromptTemplate
+from langchain_core.prompts import (
+    ChatPromptTemplate,
+    MessagesPlaceholder,
+    PromptTemplate,
+)
 from langchain_openai.chat_models import ChatOpenAI
 from prompts.google_search import AGENT_INSTRUCTIONS, SUMMARY_PROMPT
 from utility.web_scraping import Scraper
 
+from data_sources.web_search.google_web_search import google_web_search
+
 load_dotenv()
 OPENAI_ORG_ID = os.getenv("OPENAI_ORG_ID")
 OPENAI_SMART_LLM = os.getenv("OPENAI_SMART_LLM")
@@ -31,8 +37,16 @@ fast_llm = ChatOpenAI(organization=OPENAI_ORG_ID, model=OPENAI_FAST_LLM, tempera
 
 llm = fast_llm
 
-# Basic prompt setup without content from https://smith.langchain.com/hub/hwchase17/openai-tools-agent/c1867281
-indi_template = hub.pull("hwchase17/openai-tools-agent:c1867281")
+# Vendored from https://smith.langchain.com/hub/hwchase17/openai-tools-agent/c1867281 with
+# the instructions as system message, so no hub request is made on import
+indi_template = ChatPromptTemplate.from_messages(
+    [
+        ("system", AGENT_INSTRUCTIONS),
+        MessagesPlaceholder(variable_name="chat_history", optional=True),
+        ("human", "{input}"),
+        MessagesPlaceholder(variable_name="agent_scratchpad"),
+    ]
+)
 
 
 def run_scraper(urls: list[str]) -> list[dict[str, str]]:
@@ -75,6 +89,33 @@ def run_scraper(urls: list[str]) -> list[dict[str, str]]:
     return shortened_contents
 
 
+async def asearch_google(query: str) -> str:
+    """
+    Search Google for the agent, through the cached and pooled web search.
+
+    Args:
+        query: The search query.
+
+    Returns:
+        The titles, links and snippets of the search results.
+    """
+    search_results = await google_web_search(query)
+    return str(search_results["results"])
+
+
+def search_google(query: str) -> str:
+    """
+    Search Google for the agent when it runs synchronously in a thread without event loop.
+
+    Args:
+        query: The search query.
+
+    Returns:
+        The titles, links and snippets of the search results.
+    """
+    return asyncio.run(asearch_google(query))
+
+
 def report(thoughts: str, fazit: str) -> str:
     """
     Function for getting the structure for an LLM Tool.
@@ -94,15 +135,22 @@ def get_tools() -> list[BaseTool]:
         name="scrape_urls",
         description="A tool for scraping Websites and PDFs. You may ONLY use it if you DO NOT understand a search result and need further information its the website or PDF. Input URLs would need to be valid.",
     )
+    # Replaces load_tools(["google-search"]), its httplib2 client is not thread-safe
+    google_search = StructuredTool.from_function(
+        func=search_google,
+        coroutine=asearch_google,
+        name="google_search",
+        description="A wrapper around Google Search. Useful for when you need to answer questions about current events. Input should be a search query.",
+    )
     submit_report = StructuredTool.from_function(
         func=report,
         name="submit_report",
         description="A tool to submit the final report. It should be called as the last step. If you decide that the search was not successful, you should submit a one liner report in the fazit with a negative conclusion like: 'The search did not yield relevant information for <meaning of keywords> in <place>.'",
     )
-    return load_tools(["google-search"]) + [scrape_urls, submit_report]
+    return [google_search, scrape_urls, submit_report]
 
 
-def create_indi_report_agent() -> BaseMultiActionAgent:
+def create_indi_report_agent(tools: list[BaseTool]) -> BaseMultiActionAgent:
     """
     Create an agent for generating a search report fopr an individual search result.
 
@@ -110,15 +158,36 @@ def create_indi_report_agent() -> BaseMultiActionAgent:
     all information he needs, he returnes an report for that search query.
 
     Args:
-        search_results: A list of search results.
+        tools: The tools of the agent.
 
     Returns:
         A LangChain Runnable for generating a search report.
     """
-    indi_template.messages[0].prompt.template = AGENT_INSTRUCTIONS
+    return create_openai_tools_agent(llm, tools, indi_template)
+
+
+_indi_report_executor: AgentExecutor | None = None
+_indi_report_executor_lock = threading.Lock()
+
+
+def get_indi_report_executor() -> AgentExecutor:
+    """
+    Returns the executor of the individual analysis agent, creating it on first use.
+
+    The agent and its tools are stateless between runs, so one executor serves all
+    search results, also concurrently.
 
-    agent = create_openai_tools_agent(llm, get_tools(), indi_template)
-    return agent
+    Returns:
+        The agent executor.
+    """
+    global _indi_report_executor
+    with _indi_report_executor_lock:
+        if _indi_report_executor is None:
+            tools = get_tools()
+            _indi_report_executor = AgentExecutor(
+                agent=create_indi_report_agent(tools), tools=tools
+            )
+        return _indi_report_executor
 
 
 def run_individual_analysis_agent(input: Any) -> str:
@@ -132,10 +201,29 @@ def run_individual_analysis_agent(input: Any) -> str:
         The generated report for a single web search result.
     """
     input = str(input)
-    agent = create_indi_report_agent()
-    # Create an agent executor by passing in the agent and tools
-    agent_executor = AgentExecutor(agent=agent, tools=get_tools())
-    for step in agent_executor.iter({"input": input}):
+    for step in get_indi_report_executor().iter({"input": input}):
+        if output := step.get("intermediate_step"):
+            action, value = output[0]
+            if action.tool == "submit_report":
+                return value
+    return "Error submitting report."
+
+
+async def arun_individual_analysis_agent(input: Any) -> str:
+    """
+    Run the individual analysis agent without blocking the event loop.
+
+    The blocking tools run in the default executor, so several agents may run concurrently
+    and an agent can be cancelled between its steps.
+
+    Args:
+        input: The input for the agent.
+
+    Returns:
+        The generated report for a single web search result.
+    """
+    input = str(input)
+    async for step in get_indi_report_executor().aiter({"input": input}):
         if output := step.get("intermediate_step"):
             action, value = output[0]
             if action.tool == "submit_report":
@@ -1,13 +1,13 @@
 from enum import Enum
 
 
-class NewsEnergyTypeTable(Enum):
+class NewsEnergyType(Enum):
     """
-    Enum for the news energy type tables.
-    
+    Enum for the energy type selections of the news.
+
     Attributes:
-        SOLAR: The solar news table.
-        SOLAR_AND_WIND: The combined solar and wind news table.
+        SOLAR: The solar news.
+        SOLAR_AND_WIND: The solar and wind news.
     """
-    SOLAR = "nefino_news_solar"
-    SOLAR_AND_WIND = "nefino_news"
+    SOLAR = ("SOLAR",)
+    SOLAR_AND_WIND = ("SOLAR", "WI")
@@ -12,27 +12,63 @@ from data_sources.web_search.analysis import (
     run_general_search,
 )
 from data_sources.web_search.individual_analysis_agent import (
-    run_individual_analysis_agent,
+    arun_individual_analysis_agent,
 )
-from enums import NewsEnergyTypeTable
+from enums import NewsEnergyType
 from langchain_core.messages import AIMessage, HumanMessage
 from utility.database import drop_database_table as clear_news_db
-from utility.database import (
-    get_environment_variable,
-    save_analysis_evaluation,
-    set_environment_variable,
-)
+from utility.database import embedding_model
 from utility.database import (
     reset_vector_store as clear_and_update_news_vectorstore,
 )
+from utility.database import update_vector_store as update_news_vectorstore
+from utility.ingestion import IngestionProgress
+from utility.llm_cache import LLMResponseCache, enable_llm_response_cache
 from utility.places import get_random_samples, get_selection_targets, validate_place_id
+from utility.results import (
+    ANALYSIS_RESULTS_COLUMNS,
+    save_analysis_evaluation,
+    save_analysis_evaluations,
+)
 from utility.visualization import plot_for_each_federal_state
 
-# Set the active table to Solar
-set_environment_variable("ACTIVE_TABLE", NewsEnergyTypeTable.SOLAR.value)
+
+def show_llm_cache_statistics(
+    container: st.container, llm_cache: LLMResponseCache | None
+) -> None:
+    """
+    Shows the hits and misses of the LLM response cache.
+
+    Args:
+        container: The Streamlit container to show the statistics in.
+        llm_cache: The LLM response cache, None if it is disabled.
+    """
+    if llm_cache is None:
+        return
+    container.caption(
+        f"LLM cache: {llm_cache.store.hits} hits, {llm_cache.store.misses} misses "
+        f"({llm_cache.store.hit_rate:.0%} hit rate)."
+    )
+
+
+def show_ingestion_progress(placeholder: st.empty, progress: IngestionProgress) -> None:
+    """
+    Shows the rows, chunks and throughput ingested so far.
+
+    Args:
+        placeholder: The Streamlit placeholder the progress replaces.
+        progress: The progress of the ingestion.
+    """
+    placeholder.write(
+        f"Ingested {progress.rows} news as {progress.chunks} chunks "
+        f"({progress.rows_per_second:.1f} rows/s)."
+    )
 
 
 async def main():
+    # Repeated analyses of the same places reuse the cached LLM responses
+    llm_cache = enable_llm_response_cache()
+
     # Set up the Streamlit interface
     st.title("GAI-based FFPV Attitude Identifier", anchor=False)
     st.markdown(
@@ -56,14 +92,17 @@ async def main():
     energy_types = vs_control_container.selectbox(
         "Energy Types",
         options=[
-            NewsEnergyTypeTable.SOLAR.name,
-            NewsEnergyTypeTable.SOLAR_AND_WIND.name,
+            NewsEnergyType.SOLAR.name,
+            NewsEnergyType.SOLAR_AND_WIND.name,
         ],
         index=0,
     )
-    set_environment_variable("ACTIVE_TABLE", NewsEnergyTypeTable[energy_types].value)
+    # Passed to every analysis of this session instead of a process-wide setting
+    energy_type = NewsEnergyType[energy_types]
 
-    vs_control_col1, vs_control_col2, vs_control_col3 = vs_control_container.columns(3)
+    vs_control_col1, vs_control_col2, vs_control_col3, vs_control_col4 = (
+        vs_control_container.columns(4)
+    )
 
     # Set up the danger zone checkbox
     danger_zone = vs_control_col1.checkbox("Danger Zone")
@@ -79,11 +118,34 @@ async def main():
         disabled=danger_zone is not True,
         help="Add data to Clickhouse, does not reset it.",
     ):
-        vectorstore = clear_and_update_news_vectorstore()
-        count = vectorstore.client.command(
-            f"SELECT total_rows FROM system.tables WHERE name = '{get_environment_variable('ACTIVE_TABLE')}';"
+        progress_text = db_control_tab.empty()
+        vectorstore = clear_and_update_news_vectorstore(
+            on_progress=lambda progress: show_ingestion_progress(progress_text, progress)
+        )
+        db_control_tab.write(f"Vectorstore created with {vectorstore.count()} entries.")
+        db_control_tab.write(
+            f"Embedding cache: {embedding_model.hits} hits, {embedding_model.misses} misses "
+            f"({embedding_model.hit_rate:.0%} hit rate)."
+        )
+
+    # Set up the incremental update vectorstore button
+    if vs_control_col4.button(
+        "Update News VS",
+        help="Add new and changed news to Clickhouse, keeps all other news.",
+    ):
+        progress_text = db_control_tab.empty()
+        vectorstore, statistics = update_news_vectorstore(
+            on_progress=lambda progress: show_ingestion_progress(progress_text, progress)
+        )
+        db_control_tab.write(
+            f"Vectorstore updated: {statistics['new']} new, {statistics['changed']} changed, "
+            f"{statistics['unchanged']} unchanged news, {statistics['duplicates']} near-duplicates "
+            f"linked instead of embedded. It holds {vectorstore.count()} entries."
+        )
+        db_control_tab.write(
+            f"Embedding cache: {embedding_model.hits} hits, {embedding_model.misses} misses "
+            f"({embedding_model.hit_rate:.0%} hit rate)."
         )
-        db_control_tab.write(f"Vectorstore created with {count} entries.")
 
     # Set up control about the db of analysed results
     pass
@@ -119,7 +181,9 @@ async def main():
                 start_time = time.time()
 
                 st.write("📚 Collecting Analyses...")
-                _, combined_analysis = await generate_combined_analysis(target)
+                _, combined_analysis = await generate_combined_analysis(
+                    target, energy_type
+                )
 
                 st.write("🧠 Evaluating Analyses...")
                 _, evaluated_result = await evaluate_attitude(target, combined_analysis)
@@ -157,6 +221,7 @@ async def main():
 
                 main_control_tab.subheader("Combined Analyses:", anchor=False)
                 main_control_tab.write(combined_analysis)
+                show_llm_cache_statistics(main_control_tab, llm_cache)
 
     batch_operation_container = main_control_tab.container(border=True)
     batch_operation_container.header("Batch Operation", anchor=False)
@@ -212,7 +277,7 @@ async def main():
                 f"👀 Analyzing {target_length} targets...", expanded=True
             ) as status:
                 batch_analysis_results = await run_full_analysis(
-                    targets, asyncio_cancel_flag
+                    targets, asyncio_cancel_flag, energy_type
                 )
 
                 for i, target_and_evaluation in enumerate(batch_analysis_results):
@@ -265,25 +330,19 @@ async def main():
 
                 # Save the results to the database
                 button_placeholder.empty()
-                for index in range(len(batch_operation_results)):
-                    result = batch_operation_results[index]
-                    updated = save_analysis_evaluation(
-                        result[0],
-                        result[1],
-                        result[2],
-                        result[3],
-                        result[4],
-                        result[5],
-                        result[6],
-                        result[7],
-                        result[8],
-                        result[9],
-                    )
-                    if updated:
+                updated_place_ids = save_analysis_evaluations(
+                    [
+                        dict(zip(ANALYSIS_RESULTS_COLUMNS, result))
+                        for result in batch_operation_results
+                    ]
+                )
+                for result in batch_operation_results:
+                    if result[0] in updated_place_ids:
                         status.warning(
                             f"Target **{result[1]}** has been evaluated before. Updated.",
                             icon="⚠️",
                         )
+                show_llm_cache_statistics(main_control_tab, llm_cache)
 
     if operation_col2.button(
         "Run only Nefino LI News Analysis", type="secondary", disabled=not target
@@ -293,7 +352,7 @@ async def main():
         else:
             validate_place_id(target["id"])
             news_container = main_control_tab.container(border=True)
-            single_news_analysis = await create_news_analysis(target)
+            single_news_analysis = await create_news_analysis(target, energy_type)
             news_container.write(single_news_analysis.content)
 
     # Set up the run only Search Engine Analysis button
@@ -316,9 +375,11 @@ async def main():
         if not target or not target["id"]:
             main_control_tab.info("Select a Target first!")
         else:
-            search = run_general_search({"name": "FFPV"}, [target["name"]])
+            search = await run_general_search({"name": "FFPV"}, [target["name"]])
             search_engine_container = main_control_tab.container(border=True)
-            search_engine_container.write(run_individual_analysis_agent(search))
+            search_engine_container.write(
+                await arun_individual_analysis_agent(search)
+            )
 
     # Set up the clear output and break operations button
     if main_control_tab.button("Clear Output and Break Operations"):
@@ -332,7 +393,7 @@ async def main():
         st.session_state.messages = []
         st.experimental_rerun()
 
-    chat_bot = create_chat_chain()
+    chat_bot = create_chat_chain(energy_type)
     today = datetime.now().date().strftime("%B %d, %Y")
 
     # Initialize chat history
@@ -0,0 +1,161 @@
+import os
+import sqlite3
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv(verbose=True)
+CACHE_DIR = os.getenv("CACHE_DIR", "/workspaces/thesis/.cache")
+# Hits refresh the access time of an entry at most this often, in seconds
+ACCESS_RESOLUTION = 60.0
+# The share of max_entries evicted at once when a cache is full
+EVICTION_FRACTION = 0.1
+
+
+def get_cache_directory(name: str) -> str:
+    """
+    Returns the directory of a named cache, creating it if necessary.
+
+    Args:
+        name: The name of the cache.
+
+    Returns:
+        The path of the cache directory.
+    """
+    directory = os.path.join(CACHE_DIR, name)
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+class DiskCache:
+    """
+    Persistent key-value cache in a SQLite file, bounded in size and optionally in age.
+
+    Hits refresh the access time of their entry, at most once per ACCESS_RESOLUTION, so
+    most hits do not write. Once the cache holds more than max_entries, the least recently
+    used EVICTION_FRACTION of them are evicted at once through the index on the access
+    time. Entries older than the TTL are misses and are deleted on lookup. The file can be
+    shared by threads and processes.
+    """
+
+    def __init__(
+        self, path: str, max_entries: int = 100_000, ttl: float | None = None
+    ) -> None:
+        """
+        Initialize the DiskCache class.
+
+        Args:
+            path: The path of the SQLite file.
+            max_entries: The maximum number of entries.
+            ttl: The maximum age of an entry in seconds, None to keep entries until evicted.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT, created REAL, accessed REAL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)"
+            )
+        # Counts the inserts of this process, recounted before evicting, as other
+        # processes and replaced keys make it drift
+        self._count = len(self)
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        The share of lookups served from the cache since the last reset.
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def reset_statistics(self) -> None:
+        """
+        Resets the hit and miss counters.
+        """
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get(self, key: str) -> str | None:
+        """
+        Looks up an entry.
+
+        Args:
+            key: The key.
+
+        Returns:
+            The value, or None if the entry is missing or expired.
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT value, created, accessed FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            if now - row[2] > ACCESS_RESOLUTION:
+                self._connection.execute(
+                    "UPDATE entries SET accessed = ? WHERE key = ?", (now, key)
+                )
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Stores an entry, replacing an existing one and evicting the least recently used
+        entries if the cache is full.
+
+        Args:
+            key: The key.
+            value: The value.
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._count += 1
+            if self._count <= self.max_entries:
+                return
+            self._count = self._connection.execute(
+                "SELECT COUNT(*) FROM entries"
+            ).fetchone()[0]
+            if self._count <= self.max_entries:
+                return
+            evicted = (
+                self._count
+                - self.max_entries
+                + int(self.max_entries * EVICTION_FRACTION)
+            )
+            self._connection.execute(
+                "DELETE FROM entries WHERE key IN ("
+                "SELECT key FROM entries ORDER BY accessed ASC LIMIT ?)",
+                (evicted,),
+            )
+            self._count -= evicted
+
+    def clear(self) -> None:
+        """
+        Deletes all entries.
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM entries")
+            self._count = 0
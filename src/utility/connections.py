@@ -0,0 +1,144 @@
+import threading
+import time
+
+import clickhouse_connect
+from clickhouse_connect import common
+from clickhouse_connect.driver.client import Client
+from clickhouse_connect.driver.httputil import get_pool_manager
+from langchain_core.embeddings import Embeddings
+from utility.news_store import NewsVectorStore
+
+CLICKHOUSE_HOST = "clickhouse"
+
+# Without a session id the client may be shared by concurrent queries of several threads
+common.set_setting("autogenerate_session_id", False)
+
+
+class ClickhouseConnectionManager:
+    """
+    Process-wide manager of the ClickHouse connections.
+
+    Keeps one client and one vector store per table on top of a shared pool of keep-alive
+    HTTP connections. The client is health checked at most once per interval and recreated
+    if the server stopped responding.
+    """
+
+    def __init__(
+        self,
+        host: str = CLICKHOUSE_HOST,
+        pool_size: int = 16,
+        health_check_interval: float = 30.0,
+    ) -> None:
+        """
+        Initialize the ClickhouseConnectionManager class.
+
+        Args:
+            host: The ClickHouse host.
+            pool_size: The maximum number of pooled HTTP connections.
+            health_check_interval: The number of seconds a connection is trusted without a ping.
+        """
+        self.host = host
+        self.health_check_interval = health_check_interval
+        self._pool_mgr = get_pool_manager(maxsize=pool_size, block=False)
+        self._lock = threading.Lock()
+        self._client: Client | None = None
+        self._vector_stores: dict[str, NewsVectorStore] = {}
+        # Held while a vector store sets up its table, which takes the client lock
+        self._vector_stores_lock = threading.Lock()
+        self._last_checked: dict[int, float] = {}
+
+    def _is_healthy(self, client: Client) -> bool:
+        """
+        Checks the health of a client, pinging the server only once per interval.
+
+        Args:
+            client: The client to check.
+
+        Returns:
+            True if the client can be used, False if it has to be recreated.
+        """
+        now = time.monotonic()
+        if now - self._last_checked.get(id(client), 0.0) < self.health_check_interval:
+            return True
+        if not client.ping():
+            return False
+        self._last_checked[id(client)] = now
+        return True
+
+    def get_client(self) -> Client:
+        """
+        Returns the shared client, reconnecting if it is unhealthy.
+
+        Returns:
+            The ClickHouse client.
+        """
+        with self._lock:
+            if self._client is None or not self._is_healthy(self._client):
+                self._client = clickhouse_connect.get_client(
+                    host=self.host, pool_mgr=self._pool_mgr
+                )
+                self._last_checked[id(self._client)] = time.monotonic()
+            return self._client
+
+    def get_vector_store(self, table: str, embedding: Embeddings) -> NewsVectorStore:
+        """
+        Returns the vector store of a table, creating the table on first use.
+
+        The vector store runs its queries with the shared client. It is created once, so
+        concurrent sessions do not all run the table setup and its mutations.
+
+        Args:
+            table: The name of the news table.
+            embedding: The embedding model of the vector store.
+
+        Returns:
+            The news vector store.
+        """
+        vector_store = self._vector_stores.get(table)
+        if vector_store is None:
+            with self._vector_stores_lock:
+                vector_store = self._vector_stores.get(table)
+                if vector_store is None:
+                    vector_store = NewsVectorStore(
+                        table, embedding, client_provider=self.get_client
+                    )
+                    self._vector_stores[table] = vector_store
+        return vector_store
+
+    def release_vector_store(self, table: str) -> None:
+        """
+        Forgets the vector store of a table, e.g. after the table has been dropped.
+
+        Args:
+            table: The name of the table.
+        """
+        with self._vector_stores_lock:
+            self._vector_stores.pop(table, None)
+
+
+_connection_manager: ClickhouseConnectionManager | None = None
+_connection_manager_lock = threading.Lock()
+
+
+def get_connection_manager() -> ClickhouseConnectionManager:
+    """
+    Returns the process-wide connection manager.
+
+    Returns:
+        The shared ClickhouseConnectionManager.
+    """
+    global _connection_manager
+    with _connection_manager_lock:
+        if _connection_manager is None:
+            _connection_manager = ClickhouseConnectionManager()
+        return _connection_manager
+
+
+def get_clickhouse_client() -> Client:
+    """
+    Returns the shared ClickHouse client.
+
+    Returns:
+        The ClickHouse client.
+    """
+    return get_connection_manager().get_client()
@@ -1,21 +1,55 @@
+import csv
+import hashlib
+import io
 import os
+import uuid
+from contextlib import ExitStack
+from datetime import date
+from typing import Any, BinaryIO, Callable, Iterator
 
 import streamlit as st
-from clickhouse_connect import get_client
 from clickhouse_connect.driver.exceptions import DatabaseError
 from dotenv import load_dotenv
-from enums import NewsEnergyTypeTable
-from langchain.document_loaders.csv_loader import CSVLoader
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_community.vectorstores.clickhouse import Clickhouse, ClickhouseSettings
-from langchain_core.documents import Document
+from enums import NewsEnergyType
 from langchain_openai import OpenAIEmbeddings
+from utility.connections import get_clickhouse_client, get_connection_manager
+from utility.deduplication import deduplicate_news_rows
+from utility.embedding_cache import CachedEmbeddings
+from utility.ingestion import IngestionProgress, ingest_news_rows
+from utility.lexical_index import (
+    get_lexical_index_path,
+    rebuild_lexical_index,
+    remove_lexical_index,
+    update_lexical_index,
+)
+from utility.local_news_store import (
+    LocalNewsStore,
+    get_local_news_store,
+    local_news_table_exists,
+)
+from utility.news_store import NewsVectorStore
+from utility.retrieval import NewsContextRetriever, RetrievalSettings
 
 load_dotenv(verbose=True)
 OPENAI_ORG_ID = os.getenv("OPENAI_ORG_ID")
+# "clickhouse" or "local" for the in-process store of utility.local_news_store
+NEWS_VECTOR_BACKEND = os.getenv("NEWS_VECTOR_BACKEND", "clickhouse")
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+# One table for all energy types, every search filters on the energy_types column
+NEWS_TABLE = "nefino_news_energy_types"
+# The news CSVs hold different articles, an article in both is read once
+NEWS_SOURCES = (
+    "/workspaces/thesis/assets/nefino_solar_and_wind_news_until_2024_03_28_cleaned.csv",
+    "/workspaces/thesis/assets/nefino_solar_news_until_2024_03_28_cleaned.csv",
+)
+NEWS_FILE_SEPARATOR = ";"
+NEWS_METADATA_COLUMNS = ["date", "news_id"]
 
-embedding_model = OpenAIEmbeddings(
-    model="text-embedding-3-small", organization=OPENAI_ORG_ID
+# Rebuilds only send texts to OpenAI which have never been embedded before
+embedding_model = CachedEmbeddings(
+    OpenAIEmbeddings(model=EMBEDDING_MODEL, organization=OPENAI_ORG_ID),
+    model=EMBEDDING_MODEL,
 )
 
 
@@ -32,53 +66,80 @@ def get_environment_variable(var_name: str) -> str:
     return os.getenv(var_name)
 
 
-def set_environment_variable(var_name: str, value: str) -> None:
+def establish_clickhouse_connection() -> NewsVectorStore:
     """
-    Set the value of an environment variable.
+    Establish a connection to the Clickhouse vector store.
 
-    Args:
-        var_name: The name of the environment variable.
-        value: The value to set.
+    The vector store is shared by the process, so only the first call per table connects.
+
+    Returns:
+        The NewsVectorStore object representing the connection.
     """
-    os.environ[var_name] = value
+    return get_connection_manager().get_vector_store(NEWS_TABLE, embedding_model)
 
 
-def get_clickhouse_settings() -> ClickhouseSettings:
+def get_news_vector_store() -> NewsVectorStore | LocalNewsStore:
     """
-    Retrieve the configuration settings for Clickhouse.
+    Retrieve the vector store of the news table from the configured backend.
 
     Returns:
-        The configuration settings for Clickhouse.
+        The ClickHouse NewsVectorStore, or the LocalNewsStore if NEWS_VECTOR_BACKEND is "local".
+
+    Raises:
+        ValueError: If the backend is unknown.
     """
-    return ClickhouseSettings(
-        host="clickhouse",
-        table=get_environment_variable("ACTIVE_TABLE"),
-        index_type="minmax",
-    )
+    match NEWS_VECTOR_BACKEND:
+        case "clickhouse":
+            return establish_clickhouse_connection()
+        case "local":
+            return get_local_news_store(NEWS_TABLE, embedding_model)
+        case _:
+            raise ValueError(f"Unknown news vector backend: {NEWS_VECTOR_BACKEND}")
 
 
-def establish_clickhouse_connection() -> Clickhouse:
+def create_news_retriever(
+    energy_type: NewsEnergyType,
+    place_ids: list[str] | None = None,
+    k: int = 4,
+) -> NewsContextRetriever:
     """
-    Establish a connection to the Clickhouse vector store.
+    Create a retriever over the news table.
+
+    The retriever is bound to its energy type, so concurrent sessions and batches may
+    retrieve news of different energy types. The retrieved chunks are diversified, merged
+    and cut to the token budget of the NEWS_RETRIEVAL_* settings.
+
+    Args:
+        energy_type: Only retrieve news about the energy types of this selection.
+        place_ids: Only retrieve news about these places. Defaults to all places.
+        k: The number of chunks to retrieve. Defaults to 4.
 
     Returns:
-        The Clickhouse object representing the connection.
+        The retriever.
     """
-    clickhouse_config = get_clickhouse_settings()
-    return Clickhouse(embedding=embedding_model, config=clickhouse_config)
+    search_kwargs = {"energy_types": list(energy_type.value)}
+    if place_ids is not None:
+        search_kwargs["place_ids"] = place_ids
+    return NewsContextRetriever(
+        vector_store=get_news_vector_store(),
+        search_kwargs=search_kwargs,
+        settings=RetrievalSettings.from_environment(k),
+    )
 
 
-def check_table_exists(table: str = get_environment_variable("ACTIVE_TABLE")) -> bool:
+def check_table_exists(table: str = NEWS_TABLE) -> bool:
     """
     Check if a table exists in the database.
 
     Args:
-        table: The name of the table to check. Defaults to the active table.
+        table: The name of the table to check. Defaults to the news table.
 
     Returns:
         True if the table exists, False otherwise.
     """
-    client = get_client(host="clickhouse")
+    if NEWS_VECTOR_BACKEND == "local":
+        return local_news_table_exists(table)
+    client = get_clickhouse_client()
     try:
         client.command(f"CHECK TABLE {table};")
     except DatabaseError:
@@ -88,174 +149,253 @@ def check_table_exists(table: str = get_environment_variable("ACTIVE_TABLE")) ->
 
 def drop_database_table() -> None:
     """
-    Drop the active table from the database.
+    Drop the news table from the database.
     """
-    active_table = get_environment_variable("ACTIVE_TABLE")
     if not check_table_exists():
         st.error("Table does not exist.")
         return
 
-    vector_store = establish_clickhouse_connection()
+    vector_store = get_news_vector_store()
     vector_store.drop()
-    try:
-        vector_store.client.command(f"CHECK TABLE {active_table};")
-    except DatabaseError:
-        st.write(f'Table "{active_table}" dropped.')
-    except Exception as e:
-        st.error(f'Failed to drop table "{active_table}".')
-        raise e
+    remove_lexical_index(NEWS_TABLE)
+    if NEWS_VECTOR_BACKEND == "clickhouse":
+        get_connection_manager().release_vector_store(NEWS_TABLE)
+    if check_table_exists():
+        st.error(f'Failed to drop table "{NEWS_TABLE}".')
+    else:
+        st.write(f'Table "{NEWS_TABLE}" dropped.')
 
 
-def reset_vector_store(chunk_size: int = 500, chunk_overlap: int = 20) -> Clickhouse:
+def reset_vector_store(
+    chunk_size: int = 500,
+    chunk_overlap: int = 20,
+    on_progress: Callable[[IngestionProgress], None] | None = None,
+) -> NewsVectorStore | LocalNewsStore:
     """
-    Reset the vector store in Clickhouse.
+    Reset the vector store of the news table.
 
     Args:
         chunk_size: The size of the chunks to split the text into. Defaults to 500.
         chunk_overlap: The number of characters to overlap between chunks. Defaults to 20.
+        on_progress: Called with the progress of the ingestion.
 
     Returns:
-        The Clickhouse object representing the vectorestore connection.
+        The vector store of the active news table.
     """
-    active_table = get_environment_variable("ACTIVE_TABLE")
     if check_table_exists():
-        st.write(f'Table "{active_table}" already exists and will be reset.')
+        st.write(f'Table "{NEWS_TABLE}" already exists and will be reset.')
         drop_database_table()
-    documents = generate_documents_from_csv(chunk_size, chunk_overlap)
-
-    clickhouse_config = get_clickhouse_settings()
-    return Clickhouse.from_documents(
-        documents, embedding_model, config=clickhouse_config
-    )
+    vector_store, _ = update_vector_store(chunk_size, chunk_overlap, on_progress)
+    return vector_store
 
 
-def generate_documents_from_csv(
-    chunk_size: int = 500, chunk_overlap: int = 20
-) -> list[Document]:
+def update_vector_store(
+    chunk_size: int = 500,
+    chunk_overlap: int = 20,
+    on_progress: Callable[[IngestionProgress], None] | None = None,
+) -> tuple[NewsVectorStore | LocalNewsStore, dict[str, int]]:
     """
-    Generate a list of Document objects from a CSV file.
+    Incrementally update the vector store of the news table from the news CSVs.
+
+    News articles are identified by their news ID. Near-duplicates are clustered per place
+    and only one representative per cluster is embedded, so places are the unit of an
+    update: the places with new or changed articles are ingested again as a whole and their
+    former chunks are replaced, all other places are left untouched. Unchanged texts hit the
+    embedding cache. Articles missing from the CSVs are kept, so the CSVs may hold deltas.
+    The lexical index is updated for the ingested places only.
 
     Args:
         chunk_size: The size of the chunks to split the text into. Defaults to 500.
         chunk_overlap: The number of characters to overlap between chunks. Defaults to 20.
+        on_progress: Called with the progress of the ingestion.
 
     Returns:
-        A list of Document objects.
+        The vector store and the number of "new", "changed" and "unchanged" articles and of
+        the near-"duplicates" which were linked to a representative instead of embedded.
     """
-    source = ""
-    match get_environment_variable("ACTIVE_TABLE"):
-        case NewsEnergyTypeTable.SOLAR.value:
-            source = "/workspaces/thesis/assets/nefino_solar_news_until_2024_03_28_cleaned.csv"
-        case NewsEnergyTypeTable.SOLAR_AND_WIND.value:
-            source = "/workspaces/thesis/assets/nefino_solar_and_wind_news_until_2024_03_28_cleaned.csv"
-        case _:
-            st.error("No active table selected.")
-            return []
-
-    csv_loader = CSVLoader(
-        file_path=source,
-        source_column="place_id",
-        metadata_columns=["date", "news_id"],
+    embedding_model.reset_statistics()
+    vector_store = get_news_vector_store()
+    existing_news = vector_store.existing_news()
+
+    statistics = {"new": 0, "changed": 0, "unchanged": 0, "duplicates": 0}
+    outdated_places = set()
+    for row in read_news_rows():
+        stored = existing_news.get(row["news_id"])
+        if stored is None:
+            statistics["new"] += 1
+        elif stored != [(row["place_id"], row["content_hash"])]:
+            statistics["changed"] += 1
+            # The article may have moved to another place, or have left stale versions
+            outdated_places.update(place_id for place_id, _ in stored)
+        else:
+            statistics["unchanged"] += 1
+            continue
+        outdated_places.add(row["place_id"])
+    lexical_index_exists = os.path.exists(get_lexical_index_path(NEWS_TABLE))
+    if not outdated_places and lexical_index_exists:
+        return vector_store, statistics
+
+    ingestion_id = uuid.uuid4().hex
+    ingested_news_ids = []
+
+    def outdated_representatives() -> Iterator[dict[str, Any]]:
+        rows = (row for row in read_news_rows() if row["place_id"] in outdated_places)
+        for representative in deduplicate_news_rows(rows):
+            statistics["duplicates"] += len(representative["duplicates"])
+            ingested_news_ids.append(representative["news_id"])
+            ingested_news_ids.extend(
+                news_id for news_id, _ in representative["duplicates"]
+            )
+            yield representative
+
+    ingest_news_rows(
+        outdated_representatives(),
+        vector_store,
+        chunk_size,
+        chunk_overlap,
+        on_progress=on_progress,
+        ingestion_id=ingestion_id,
     )
-    documents = csv_loader.load()
+    # The former chunks are deleted after the insert, so searches never miss a place
+    vector_store.delete_outdated_chunks(outdated_places, ingested_news_ids, ingestion_id)
+    if not lexical_index_exists:
+        rebuild_lexical_index(NEWS_TABLE, vector_store.iterate_documents())
+    else:
+        update_lexical_index(
+            NEWS_TABLE,
+            outdated_places,
+            vector_store.iterate_documents(place_ids=outdated_places),
+        )
+    return vector_store, statistics
 
-    text_splitter = CharacterTextSplitter(
-        chunk_size=chunk_size, chunk_overlap=chunk_overlap
-    )
-    return text_splitter.split_documents(documents)
-
-
-def save_analysis_evaluation(
-    place_id: str,
-    place_name: str,
-    place_type: str,
-    attitude_label: str,
-    concise_thoughts: str,
-    cf1: str,
-    cf2: str,
-    cf3: str,
-    cf4: str,
-    cf5: str,
-) -> bool:
+
+def parse_energy_types(value: str) -> list[str]:
     """
-    Save a analysis evaluation to the database.
-
-    Args:a
-        place_id: The ID of the place.
-        place_name: The name of the place.
-        place_type: The type of the place.
-        attitude_label: The attitude towards FFPV.
-        concise_thoughts: The concise thoughts about the place's attitude towards FFPV.
-        cf1: The classification feature 1.
-        cf2: The classification feature 2.
-        cf3: The classification feature 3.
-        cf4: The classification feature 4.
-        cf5: The classification feature 5.
+    Parses energy types from the Nefino array notation, e.g. "{WI,SOLAR}".
+
+    Args:
+        value: The energy types in array notation.
 
     Returns:
-        True if the place has been updated, False if it was a new entry.
+        The energy types.
     """
-    place_has_been_updated = False
-    client = get_client(host="clickhouse")
+    return [
+        energy_type.strip()
+        for energy_type in value.strip("{} ").split(",")
+        if energy_type.strip()
+    ]
 
-    try:
-        client.command("CHECK TABLE ANALYSIS_RESULTS;")
-    except DatabaseError:
-        st.write("Creating table ANALYSIS_RESULTS...")
-        client.command(
-            "CREATE TABLE ANALYSIS_RESULTS ("
-            "cf1 String, "
-            "cf2 String, "
-            "cf3 String, "
-            "cf4 String, "
-            "cf5 String, "
-            "attitude_label String, "
-            "concise_thoughts String,"
-            "place_id String, "
-            "place_name String, "
-            "place_type String "
-            ") ENGINE = MergeTree() "
-            "ORDER BY place_id "
-            "PRIMARY KEY place_id;"
-        )
 
-    # First, check if the record exists
-    place_id = place_id.replace("'", "''")
-    place_name = place_name.replace("'", "''")
-    place_type = place_type.replace("'", "''")
-    attitude_label = attitude_label.replace("'", "''")
-    concise_thoughts = concise_thoughts.replace("'", "''")
-    cf1 = cf1.replace("'", "''")
-    cf2 = cf2.replace("'", "''")
-    cf3 = cf3.replace("'", "''")
-    cf4 = cf4.replace("'", "''")
-    cf5 = cf5.replace("'", "''")
-
-    result = client.command(
-        f"SELECT count(*) FROM ANALYSIS_RESULTS WHERE place_id = '{place_id}'"
+def read_news_csv_header(f: BinaryIO) -> list[str]:
+    """
+    Read the column names of a news CSV from its first line.
+
+    Args:
+        f: The CSV file, opened in binary mode.
+
+    Returns:
+        The column names.
+    """
+    f.seek(0)
+    line = f.readline().decode("utf-8-sig")
+    return next(csv.reader([line.rstrip("\r\n")], delimiter=NEWS_FILE_SEPARATOR))
+
+
+def read_news_csv_record(f: BinaryIO, header: list[str]) -> dict[str, str] | None:
+    """
+    Read the CSV record at the current position of a news CSV.
+
+    Quoted fields may span lines, so lines are joined until all quotes are closed.
+
+    Args:
+        f: The CSV file, opened in binary mode.
+        header: The column names.
+
+    Returns:
+        A dictionary representing the CSV row, or None at the end of the file.
+    """
+    record = b""
+    while line := f.readline():
+        record += line
+        if record.count(b'"') % 2 == 0:
+            break
+    if not record.strip():
+        return None
+    values = next(
+        csv.reader(io.StringIO(record.decode("utf-8")), delimiter=NEWS_FILE_SEPARATOR)
     )
+    return dict(zip(header, values))
 
-    # If the record exists, update it
-    if result > 0:
-        client.command(
-            (
-                "ALTER TABLE ANALYSIS_RESULTS UPDATE ",
-                f"attitude_label = '{attitude_label}', ",
-                f"concise_thoughts = '{concise_thoughts}', ",
-                f"cf1 = '{cf1}', cf2 = '{cf2}', cf3 = '{cf3}', ",
-                f"cf4 = '{cf4}', cf5 = '{cf5}' ",
-                f"WHERE place_id = '{place_id}'"
-            )
-        )
-        place_has_been_updated = True
 
-    # If the record doesn't exist, insert it
-    else:
-        client.command((
-            "INSERT INTO ANALYSIS_RESULTS (place_id, place_name, place_type, attitude_label, concise_thoughts, cf1, cf2, cf3, cf4, cf5) ",
-            f"VALUES ('{place_id}', '{place_name}', '{place_type}', "
-            f"'{attitude_label}', '{concise_thoughts}', '{cf1}', '{cf2}', "
-            f"'{cf3}', '{cf4}', '{cf5}')"
-        ))
-
-    return place_has_been_updated
+def iterate_news_csv_records(f: BinaryIO) -> Iterator[tuple[int, dict[str, str]]]:
+    """
+    Read the records of a news CSV one by one with their position in the file.
+
+    Args:
+        f: The CSV file, opened in binary mode.
+
+    Yields:
+        The byte offset and a dictionary representing the CSV row.
+    """
+    header = read_news_csv_header(f)
+    while True:
+        offset = f.tell()
+        row = read_news_csv_record(f, header)
+        if row is None:
+            return
+        yield offset, row
+
+
+def read_news_rows() -> Iterator[dict[str, Any]]:
+    """
+    Read the news articles of all news CSVs one by one, grouped by their place.
+
+    The CSVs are united by news ID: an article in several CSVs is read once, from the
+    first CSV, with the energy types of all of them. A first pass only collects the
+    place, energy types and file position of every article, so no article text is held in
+    memory. The articles are then read place by place from their positions.
+
+    Every article gets a "content" field formatted like the documents of the former
+    CSVLoader, a "content_hash" field identifying its date and content and its
+    "energy_types" parsed from the Nefino array notation, e.g. "{WI,SOLAR}".
+
+    Yields:
+        A dictionary representing a news article, all articles of a place in a row.
+    """
+    with ExitStack() as stack:
+        files = [stack.enter_context(open(source, "rb")) for source in NEWS_SOURCES]
+        headers = [read_news_csv_header(f) for f in files]
+
+        energy_types_by_news_id: dict[str, set[str]] = {}
+        positions: dict[str, tuple[str, int, int]] = {}
+        for source, f in enumerate(files):
+            for offset, row in iterate_news_csv_records(f):
+                energy_types_by_news_id.setdefault(row["news_id"], set()).update(
+                    parse_energy_types(row["energy_types"])
+                )
+                positions.setdefault(row["news_id"], (row["place_id"], source, offset))
+
+        for news_id, (_, source, offset) in sorted(
+            positions.items(), key=lambda item: item[1]
+        ):
+            files[source].seek(offset)
+            row = read_news_csv_record(files[source], headers[source])
+            energy_types = sorted(energy_types_by_news_id[news_id])
+            if set(parse_energy_types(row["energy_types"])) != set(energy_types):
+                # Articles found in a single CSV keep their text and content hash
+                row = {**row, "energy_types": "{" + ",".join(energy_types) + "}"}
+            content = "\n".join(
+                f"{key.strip()}: {value.strip() if value is not None else value}"
+                for key, value in row.items()
+                if key not in NEWS_METADATA_COLUMNS
+            )
+            yield {
+                "news_id": int(row["news_id"]),
+                "date": date.fromisoformat(row["date"]),
+                "place_id": row["place_id"],
+                "energy_types": energy_types,
+                "content": content,
+                "content_hash": hashlib.sha256(
+                    f'{row["date"]}\0{content}'.encode("utf-8")
+                ).hexdigest(),
+            }
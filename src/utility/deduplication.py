@@ -0,0 +1,158 @@
+import re
+import zlib
+from collections import defaultdict
+from itertools import groupby
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+
+# Mersenne prime of the universal hash functions, shingle hashes are reduced below it
+MINHASH_PRIME = (1 << 31) - 1
+
+
+class MinHashDeduplicator:
+    """
+    Near-duplicate detection with MinHash signatures and banded locality-sensitive hashing.
+
+    Texts are shingled into character n-grams. Texts sharing a band of their signatures are
+    candidates, candidates whose estimated Jaccard similarity reaches the threshold are
+    near-duplicates. Rewrites of the same press release reach about 0.5 with 5-grams,
+    unrelated news stay below 0.1.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.4,
+        shingle_size: int = 5,
+        bands: int = 32,
+        rows_per_band: int = 4,
+        seed: int = 42,
+    ) -> None:
+        """
+        Initialize the MinHashDeduplicator class.
+
+        Args:
+            threshold: The estimated Jaccard similarity from which texts are near-duplicates.
+            shingle_size: The number of characters per shingle.
+            bands: The number of LSH bands.
+            rows_per_band: The number of signature values per band.
+            seed: The seed of the hash functions.
+        """
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.bands = bands
+        self.rows_per_band = rows_per_band
+        rng = np.random.default_rng(seed)
+        permutations = bands * rows_per_band
+        self._a = rng.integers(1, MINHASH_PRIME, size=permutations, dtype=np.uint64)
+        self._b = rng.integers(0, MINHASH_PRIME, size=permutations, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        Computes the MinHash signature of a text.
+
+        Args:
+            text: The text.
+
+        Returns:
+            The minimum of every hash function over the shingles of the text.
+        """
+        normalized = " ".join(re.findall(r"\w+", text.lower()))
+        shingles = {
+            normalized[start : start + self.shingle_size]
+            for start in range(max(len(normalized) - self.shingle_size + 1, 1))
+        }
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) % MINHASH_PRIME for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        # a < 2^31 and hashes < 2^31, so the products fit into 64 bits
+        return (
+            (self._a[:, None] * hashes[None, :] + self._b[:, None]) % MINHASH_PRIME
+        ).min(axis=1)
+
+    def cluster(self, texts: list[str]) -> list[list[int]]:
+        """
+        Clusters texts into groups of near-duplicates.
+
+        Args:
+            texts: The texts.
+
+        Returns:
+            The positions of the texts of each cluster, every text is in exactly one cluster.
+        """
+        if not texts:
+            return []
+        signatures = np.stack([self.signature(text) for text in texts])
+        parents = list(range(len(texts)))
+
+        def find(position: int) -> int:
+            while parents[position] != position:
+                parents[position] = parents[parents[position]]
+                position = parents[position]
+            return position
+
+        for band in range(self.bands):
+            buckets = defaultdict(list)
+            band_values = signatures[
+                :, band * self.rows_per_band : (band + 1) * self.rows_per_band
+            ]
+            for position, values in enumerate(band_values):
+                buckets[values.tobytes()].append(position)
+            for bucket in buckets.values():
+                for other in bucket[1:]:
+                    first, second = find(bucket[0]), find(other)
+                    if first == second:
+                        continue
+                    similarity = np.mean(signatures[bucket[0]] == signatures[other])
+                    if similarity >= self.threshold:
+                        parents[second] = first
+
+        clusters = defaultdict(list)
+        for position in range(len(texts)):
+            clusters[find(position)].append(position)
+        return list(clusters.values())
+
+
+def deduplicate_news_rows(
+    rows: Iterable[dict[str, Any]],
+    deduplicator: MinHashDeduplicator | None = None,
+) -> Iterator[dict[str, Any]]:
+    """
+    Collapses near-duplicate news articles of the same place into one representative.
+
+    Articles are only compared within their place, so place-scoped retrieval still finds
+    every place's news. The most recent article of a cluster represents it. It gets the
+    union of the cluster's energy types and a "duplicates" field linking the news ID and
+    content hash of every other article of the cluster.
+
+    The rows must come grouped by place, as read_news_rows yields them. Each place is
+    yielded as soon as its last row is read, so only one place is held in memory.
+
+    Args:
+        rows: The news articles grouped by place, as read by read_news_rows.
+        deduplicator: The near-duplicate detection. Defaults to MinHashDeduplicator().
+
+    Yields:
+        The representative of each cluster, place by place.
+    """
+    deduplicator = deduplicator or MinHashDeduplicator()
+    for _, place_rows in groupby(rows, key=lambda row: row["place_id"]):
+        place_rows = list(place_rows)
+        for cluster in deduplicator.cluster([row["content"] for row in place_rows]):
+            members = sorted(
+                (place_rows[position] for position in cluster),
+                key=lambda row: (row["date"], row["news_id"]),
+                reverse=True,
+            )
+            representative = members[0]
+            yield {
+                **representative,
+                "energy_types": sorted(
+                    {energy_type for row in members for energy_type in row["energy_types"]}
+                ),
+                "duplicates": [
+                    (row["news_id"], row["content_hash"]) for row in members[1:]
+                ],
+            }
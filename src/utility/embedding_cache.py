@@ -0,0 +1,262 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from utility.cache import get_cache_directory
+
+DIGEST_SIZE = 32
+
+
+class EmbeddingStore:
+    """
+    Append-only on-disk store of embeddings keyed by a SHA-256 digest.
+
+    The digests are stored back to back in "keys.bin" and the vectors as a float32 matrix in
+    "vectors.f32", which is memory-mapped for reads. Row i of the matrix belongs to digest i.
+
+    The app and the offline jobs share the store, so appends hold an exclusive file lock
+    and first pick up the rows other processes appended.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """
+        Initialize the EmbeddingStore class.
+
+        Args:
+            directory: The directory of the store.
+        """
+        self.directory = directory
+        self._keys_path = os.path.join(directory, "keys.bin")
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._file_lock_path = os.path.join(directory, "lock")
+        self._lock = threading.Lock()
+        self._rows: dict[bytes, int] = {}
+        # The number of rows in both files, counted apart from the index of the digests
+        self._row_count = 0
+        self._dimension: int | None = None
+        self._vectors: np.memmap | None = None
+        self._load()
+
+    def _load(self) -> None:
+        """
+        Loads the digest index and maps the vectors.
+        """
+        if not os.path.exists(self._meta_path):
+            return
+        with open(self._meta_path, "r") as f:
+            self._dimension = json.load(f)["dimension"]
+
+        with open(self._keys_path, "rb") as f:
+            keys = f.read()
+        row_size = self._dimension * 4
+        # Vectors are written before their keys, so a torn write leaves surplus vectors only
+        rows = min(
+            len(keys) // DIGEST_SIZE, os.path.getsize(self._vectors_path) // row_size
+        )
+        self._rows = {
+            keys[row * DIGEST_SIZE : (row + 1) * DIGEST_SIZE]: row for row in range(rows)
+        }
+        self._row_count = rows
+        self._map_vectors()
+
+    def _read_appended_rows(self) -> None:
+        """
+        Indexes the rows other processes appended and trims a torn write behind them.
+
+        Must be called while holding the file lock, so no other process is appending.
+        """
+        with open(self._meta_path, "r") as f:
+            self._dimension = json.load(f)["dimension"]
+        row_size = self._dimension * 4
+        keys_size = (
+            os.path.getsize(self._keys_path) if os.path.exists(self._keys_path) else 0
+        )
+        vectors_size = (
+            os.path.getsize(self._vectors_path)
+            if os.path.exists(self._vectors_path)
+            else 0
+        )
+        rows = min(keys_size // DIGEST_SIZE, vectors_size // row_size)
+        if rows > self._row_count:
+            with open(self._keys_path, "rb") as f:
+                f.seek(self._row_count * DIGEST_SIZE)
+                keys = f.read((rows - self._row_count) * DIGEST_SIZE)
+            for offset in range(0, len(keys), DIGEST_SIZE):
+                self._rows.setdefault(
+                    keys[offset : offset + DIGEST_SIZE], self._row_count
+                )
+                self._row_count += 1
+
+        # Only the bytes behind the last complete key and vector pair are cut off
+        if vectors_size > rows * row_size:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(rows * row_size)
+        if keys_size > rows * DIGEST_SIZE:
+            with open(self._keys_path, "r+b") as f:
+                f.truncate(rows * DIGEST_SIZE)
+
+    def _map_vectors(self) -> None:
+        """
+        Memory-maps the vectors of all indexed rows.
+        """
+        self._vectors = (
+            np.memmap(
+                self._vectors_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(self._row_count, self._dimension),
+            )
+            if self._row_count
+            else None
+        )
+
+    def __len__(self) -> int:
+        return self._row_count
+
+    def get_many(self, digests: list[bytes]) -> list[list[float] | None]:
+        """
+        Looks up the embeddings of several digests.
+
+        Args:
+            digests: The digests to look up.
+
+        Returns:
+            The embedding of each digest, or None if it is not stored.
+        """
+        with self._lock:
+            rows = [self._rows.get(digest) for digest in digests]
+            return [
+                self._vectors[row].tolist() if row is not None else None for row in rows
+            ]
+
+    def put_many(self, digests: list[bytes], vectors: list[list[float]]) -> None:
+        """
+        Appends the embeddings of several digests.
+
+        Args:
+            digests: The digests of the embeddings.
+            vectors: The embeddings.
+        """
+        with self._lock, open(self._file_lock_path, "a") as file_lock:
+            fcntl.flock(file_lock, fcntl.LOCK_EX)
+            try:
+                if os.path.exists(self._meta_path):
+                    self._read_appended_rows()
+                # Filter under the locks, concurrent batches may share digests
+                new_entries = {
+                    digest: vector
+                    for digest, vector in zip(digests, vectors)
+                    if digest not in self._rows
+                }
+                if new_entries:
+                    matrix = np.asarray(list(new_entries.values()), dtype=np.float32)
+                    if self._dimension is None:
+                        self._dimension = matrix.shape[1]
+                        with open(self._meta_path, "w") as f:
+                            json.dump({"dimension": self._dimension}, f)
+
+                    # Vectors are written before their keys, see _load
+                    with open(self._vectors_path, "ab") as f:
+                        f.write(matrix.tobytes())
+                    with open(self._keys_path, "ab") as f:
+                        f.write(b"".join(new_entries.keys()))
+                    for digest in new_entries:
+                        self._rows[digest] = self._row_count
+                        self._row_count += 1
+                self._map_vectors()
+            finally:
+                fcntl.flock(file_lock, fcntl.LOCK_UN)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings backed by a persistent, content-addressed cache.
+
+    Texts are keyed by a hash of the model name and the text, so only texts which have never
+    been embedded with the model are sent to the underlying embeddings.
+    """
+
+    def __init__(self, underlying: Embeddings, model: str) -> None:
+        """
+        Initialize the CachedEmbeddings class.
+
+        Args:
+            underlying: The embeddings used for cache misses.
+            model: The name of the embedding model, part of the cache key.
+        """
+        self.underlying = underlying
+        self.model = model
+        self.store = EmbeddingStore(get_cache_directory(f"embeddings/{model}"))
+        self.hits = 0
+        self.misses = 0
+        self._statistics_lock = threading.Lock()
+
+    def _digest(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).digest()
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        The share of texts served from the cache since the last reset.
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def reset_statistics(self) -> None:
+        """
+        Resets the hit and miss counters.
+        """
+        with self._statistics_lock:
+            self.hits = 0
+            self.misses = 0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embed documents, using cached embeddings where available.
+
+        Args:
+            texts: The texts to embed.
+
+        Returns:
+            The embedding of each text.
+        """
+        digests = [self._digest(text) for text in texts]
+        embeddings = self.store.get_many(digests)
+
+        # Embed every missing text only once, even if it occurs several times
+        missing = {
+            digest: text
+            for digest, text, embedding in zip(digests, texts, embeddings)
+            if embedding is None
+        }
+        missing_count = sum(embedding is None for embedding in embeddings)
+        # Ingestion workers embed batches concurrently
+        with self._statistics_lock:
+            self.hits += len(texts) - missing_count
+            self.misses += missing_count
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            self.store.put_many(list(missing.keys()), vectors)
+            computed = dict(zip(missing.keys(), vectors))
+            embeddings = [
+                embedding if embedding is not None else computed[digest]
+                for digest, embedding in zip(digests, embeddings)
+            ]
+        return embeddings
+
+    def embed_query(self, text: str) -> list[float]:
+        """
+        Embed a query, using the cached embedding where available.
+
+        Args:
+            text: The query to embed.
+
+        Returns:
+            The embedding of the query.
+        """
+        return self.embed_documents([text])[0]
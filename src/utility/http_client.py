@@ -0,0 +1,43 @@
+import asyncio
+import threading
+import weakref
+
+import httpx
+
+# Enough keep-alive connections for the concurrent searches of several targets
+HTTP_MAX_CONNECTIONS = 32
+HTTP_TIMEOUT = 30.0
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+_clients_lock = threading.Lock()
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Returns the pooled HTTP client of the running event loop.
+
+    An httpx client is bound to the event loop it was first used on, and every Streamlit
+    run starts its own loop, so there is one client per loop. Its keep-alive connections
+    are shared by all requests of the loop.
+
+    Returns:
+        The HTTP client.
+
+    Raises:
+        RuntimeError: If no event loop is running.
+    """
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        client = _clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                timeout=HTTP_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+                ),
+            )
+            _clients[loop] = client
+        return client
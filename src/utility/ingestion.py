@@ -0,0 +1,137 @@
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable
+
+from langchain.text_splitter import CharacterTextSplitter
+from utility.news_store import NewsChunk, NewsVectorStore
+
+
+@dataclass
+class IngestionProgress:
+    """
+    Progress of a running ingestion.
+
+    Attributes:
+        rows: The number of news articles read so far.
+        chunks: The number of chunks inserted so far.
+        started: The monotonic start time of the ingestion.
+    """
+
+    rows: int = 0
+    chunks: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def rows_per_second(self) -> float:
+        """
+        The number of news articles ingested per second.
+        """
+        elapsed = time.monotonic() - self.started
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+
+def split_news_row(
+    row: dict[str, Any], text_splitter: CharacterTextSplitter, ingestion_id: str = ""
+) -> list[NewsChunk]:
+    """
+    Split a single news article into chunks.
+
+    Args:
+        row: The news article, as read by read_news_rows, optionally with "duplicates".
+        text_splitter: The text splitter to use.
+        ingestion_id: The ID of the ingestion run.
+
+    Returns:
+        A list of NewsChunk objects.
+    """
+    return [
+        NewsChunk(
+            id=f'{row["news_id"]}_{chunk_index}',
+            document=text,
+            news_id=row["news_id"],
+            date=row["date"],
+            place_id=row["place_id"],
+            chunk_index=chunk_index,
+            content_hash=row["content_hash"],
+            energy_types=tuple(row["energy_types"]),
+            duplicates=tuple(row.get("duplicates", ())),
+            ingestion_id=ingestion_id,
+        )
+        for chunk_index, text in enumerate(text_splitter.split_text(row["content"]))
+    ]
+
+
+def ingest_news_rows(
+    rows: Iterable[dict[str, Any]],
+    vector_store: NewsVectorStore,
+    chunk_size: int = 500,
+    chunk_overlap: int = 20,
+    batch_size: int = 128,
+    max_in_flight: int = 4,
+    on_progress: Callable[[IngestionProgress], None] | None = None,
+    ingestion_id: str = "",
+) -> IngestionProgress:
+    """
+    Stream news articles into the vector store.
+
+    The articles are read lazily, chunked, embedded in batches with several embedding
+    requests in flight and inserted batch by batch. Reading pauses while the maximum number
+    of batches is in flight, so memory stays bounded by max_in_flight * batch_size chunks
+    regardless of the number of articles.
+
+    Args:
+        rows: The news articles, as read by read_news_rows.
+        vector_store: The vector store to insert into.
+        chunk_size: The size of the chunks to split the text into. Defaults to 500.
+        chunk_overlap: The number of characters to overlap between chunks. Defaults to 20.
+        batch_size: The number of chunks embedded per request. Defaults to 128.
+        max_in_flight: The maximum number of concurrent embedding requests. Defaults to 4.
+        on_progress: Called with the progress after every inserted batch.
+        ingestion_id: The ID of the ingestion run, stored with every chunk.
+
+    Returns:
+        The final progress.
+    """
+    text_splitter = CharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+    progress = IngestionProgress()
+    in_flight: deque[tuple[list[NewsChunk], int, Future]] = deque()
+
+    def insert_oldest_batch() -> None:
+        # Batches are inserted in submission order
+        chunks, rows_read, future = in_flight.popleft()
+        vector_store.insert_chunks(chunks, future.result())
+        progress.rows = rows_read
+        progress.chunks += len(chunks)
+        if on_progress:
+            on_progress(progress)
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+
+        def submit(chunks: list[NewsChunk], rows_read: int) -> None:
+            if len(in_flight) >= max_in_flight:
+                insert_oldest_batch()
+            future = executor.submit(
+                vector_store.embedding.embed_documents,
+                [chunk.document for chunk in chunks],
+            )
+            in_flight.append((chunks, rows_read, future))
+
+        batch: list[NewsChunk] = []
+        rows_read = 0
+        for row in rows:
+            rows_read += 1
+            batch.extend(split_news_row(row, text_splitter, ingestion_id))
+            if len(batch) >= batch_size:
+                submit(batch, rows_read)
+                batch = []
+        if batch:
+            submit(batch, rows_read)
+        while in_flight:
+            insert_oldest_batch()
+
+    progress.rows = rows_read
+    return progress
@@ -0,0 +1,553 @@
+import os
+import re
+import threading
+from collections import Counter
+from typing import Iterable
+
+import numpy as np
+from utility.cache import get_cache_directory
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Splits a text into lowercase word tokens.
+
+    German compounds like "Flächennutzungsplan" stay single tokens, so exact terms match.
+
+    Args:
+        text: The text.
+
+    Returns:
+        The tokens.
+    """
+    return re.findall(r"\w\w+", text.lower())
+
+
+def group_documents(values: np.ndarray, documents: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Groups documents by a value in compressed sparse row layout.
+
+    Args:
+        values: The value of each entry.
+        documents: The document of each entry.
+
+    Returns:
+        The sorted distinct "keys", and the sorted "documents" of the i-th key at
+        documents[offsets[i]:offsets[i + 1]].
+    """
+    order = np.lexsort((documents, values))
+    keys, counts = np.unique(values[order], return_counts=True)
+    return {
+        "keys": keys.astype(np.str_),
+        "offsets": np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+        "documents": documents[order].astype(np.int32),
+    }
+
+
+def group_filter_documents(
+    place_ids: np.ndarray, energy_types: np.ndarray
+) -> dict[str, np.ndarray]:
+    """
+    Groups the documents of an index by their place and by each of their energy types.
+
+    Args:
+        place_ids: The place of each document.
+        energy_types: The comma-separated energy types of each document.
+
+    Returns:
+        The arrays of both groupings, prefixed with "place_" and "energy_type_".
+    """
+    split = [value.split(",") if value else [] for value in energy_types.tolist()]
+    arrays = {
+        f"place_{name}": values
+        for name, values in group_documents(
+            place_ids, np.arange(len(place_ids))
+        ).items()
+    }
+    arrays.update(
+        {
+            f"energy_type_{name}": values
+            for name, values in group_documents(
+                np.array([value for types in split for value in types], dtype=np.str_),
+                np.repeat(
+                    np.arange(len(split)),
+                    np.array([len(types) for types in split], dtype=np.int64),
+                ),
+            ).items()
+        }
+    )
+    return arrays
+
+
+FILTER_ARRAYS = (
+    "place_keys",
+    "place_offsets",
+    "place_documents",
+    "energy_type_keys",
+    "energy_type_offsets",
+    "energy_type_documents",
+)
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over the news chunks.
+
+    The postings are stored in compressed sparse row layout: the documents and term
+    frequencies of the i-th vocabulary term are postings[offsets[i]:offsets[i + 1]]. Every
+    document keeps its chunk ID, place and energy types. The documents of each place and
+    energy type are grouped in the same layout, so filtered searches only score the
+    postings of the matching documents.
+    """
+
+    def __init__(
+        self,
+        arrays: dict[str, np.ndarray],
+        k1: float = 1.2,
+        b: float = 0.75,
+    ) -> None:
+        """
+        Initialize the LexicalIndex class.
+
+        Args:
+            arrays: The arrays of the index as built by build.
+            k1: The BM25 term frequency saturation.
+            b: The BM25 document length normalization.
+        """
+        self.vocabulary = arrays["vocabulary"]
+        self.offsets = arrays["offsets"]
+        self.postings_documents = arrays["postings_documents"]
+        self.postings_frequencies = arrays["postings_frequencies"]
+        self.document_lengths = arrays["document_lengths"]
+        self.chunk_ids = arrays["chunk_ids"]
+        self.place_ids = arrays["place_ids"]
+        self.energy_types = arrays["energy_types"]
+        # Archives written before the filters were grouped are grouped on load
+        if not all(name in arrays for name in FILTER_ARRAYS):
+            arrays = {
+                **arrays,
+                **group_filter_documents(self.place_ids, self.energy_types),
+            }
+        self.place_keys = arrays["place_keys"]
+        self.place_offsets = arrays["place_offsets"]
+        self.place_documents = arrays["place_documents"]
+        self.energy_type_keys = arrays["energy_type_keys"]
+        self.energy_type_offsets = arrays["energy_type_offsets"]
+        self.energy_type_documents = arrays["energy_type_documents"]
+        self.k1 = k1
+        self.b = b
+        self.average_length = (
+            float(self.document_lengths.mean()) if len(self.document_lengths) else 0.0
+        )
+
+    @classmethod
+    def build(
+        cls, documents: Iterable[tuple[str, str, str, list[str]]]
+    ) -> "LexicalIndex":
+        """
+        Builds the index.
+
+        Args:
+            documents: Tuples of the chunk ID, text, place ID and energy types of each chunk.
+
+        Returns:
+            The index.
+        """
+        term_ids: dict[str, int] = {}
+        columns = cls._tokenize_documents(documents, term_ids)
+        return cls._from_postings(np.array(list(term_ids), dtype=np.str_), *columns)
+
+    @staticmethod
+    def _tokenize_documents(
+        documents: Iterable[tuple[str, str, str, list[str]]],
+        term_ids: dict[str, int],
+        first_document: int = 0,
+    ) -> tuple[np.ndarray, ...]:
+        """
+        Counts the terms of documents.
+
+        Args:
+            documents: Tuples of the chunk ID, text, place ID and energy types of each chunk.
+            term_ids: The ID of each known term, new terms are added.
+            first_document: The number of the first document.
+
+        Returns:
+            The term ID, document and term frequency of each posting, and the chunk ID,
+            place, comma-separated energy types and length of each document.
+        """
+        posting_terms, posting_documents, posting_frequencies = [], [], []
+        chunk_ids, place_ids, energy_types, document_lengths = [], [], [], []
+        for document, (chunk_id, text, place_id, chunk_energy_types) in enumerate(
+            documents, first_document
+        ):
+            tokens = tokenize(text)
+            for term, frequency in Counter(tokens).items():
+                posting_terms.append(term_ids.setdefault(term, len(term_ids)))
+                posting_documents.append(document)
+                posting_frequencies.append(frequency)
+            chunk_ids.append(chunk_id)
+            place_ids.append(place_id)
+            energy_types.append(",".join(chunk_energy_types))
+            document_lengths.append(len(tokens))
+        return (
+            np.asarray(posting_terms, dtype=np.int64),
+            np.asarray(posting_documents, dtype=np.int32),
+            np.asarray(posting_frequencies, dtype=np.uint16),
+            np.array(chunk_ids, dtype=np.str_),
+            np.array(place_ids, dtype=np.str_),
+            np.array(energy_types, dtype=np.str_),
+            np.asarray(document_lengths, dtype=np.int32),
+        )
+
+    @classmethod
+    def _from_postings(
+        cls,
+        terms: np.ndarray,
+        posting_terms: np.ndarray,
+        posting_documents: np.ndarray,
+        posting_frequencies: np.ndarray,
+        chunk_ids: np.ndarray,
+        place_ids: np.ndarray,
+        energy_types: np.ndarray,
+        document_lengths: np.ndarray,
+    ) -> "LexicalIndex":
+        """
+        Lays out postings in compressed sparse row layout.
+
+        Terms without postings are left out of the vocabulary.
+
+        Args:
+            terms: The term of each term ID.
+            posting_terms: The term ID of each posting.
+            posting_documents: The document of each posting.
+            posting_frequencies: The term frequency of each posting.
+            chunk_ids: The chunk ID of each document.
+            place_ids: The place of each document.
+            energy_types: The comma-separated energy types of each document.
+            document_lengths: The number of tokens of each document.
+
+        Returns:
+            The index.
+        """
+        # Sort the vocabulary, so terms are looked up by binary search
+        used = np.flatnonzero(np.bincount(posting_terms, minlength=len(terms)))
+        order = used[np.argsort(terms[used])]
+        rank = np.full(len(terms), -1, dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        term_ranks = rank[posting_terms]
+        postings = np.lexsort((posting_documents, term_ranks))
+        return cls(
+            {
+                "vocabulary": terms[order].astype(np.str_),
+                "offsets": np.concatenate(
+                    [[0], np.cumsum(np.bincount(term_ranks, minlength=len(order)))]
+                ).astype(np.int64),
+                "postings_documents": posting_documents.astype(np.int32)[postings],
+                "postings_frequencies": posting_frequencies.astype(np.uint16)[postings],
+                "document_lengths": document_lengths.astype(np.int32),
+                "chunk_ids": chunk_ids.astype(np.str_),
+                "place_ids": place_ids.astype(np.str_),
+                "energy_types": energy_types.astype(np.str_),
+                **group_filter_documents(
+                    place_ids.astype(np.str_), energy_types.astype(np.str_)
+                ),
+            }
+        )
+
+    def replace_places(
+        self,
+        place_ids: Iterable[str],
+        documents: Iterable[tuple[str, str, str, list[str]]],
+    ) -> "LexicalIndex":
+        """
+        Builds a copy of the index with the documents of some places replaced.
+
+        The postings of the other places are copied, so only the texts of the given places
+        are read and tokenized.
+
+        Args:
+            place_ids: The places whose documents are replaced.
+            documents: Tuples of the chunk ID, text, place ID and energy types of each new
+                chunk about the places.
+
+        Returns:
+            The updated index.
+        """
+        kept = ~np.isin(self.place_ids, np.array(list(place_ids), dtype=np.str_))
+        renumbered = np.cumsum(kept, dtype=np.int64) - 1
+        posting_terms = np.repeat(
+            np.arange(len(self.vocabulary)), np.diff(self.offsets)
+        )
+        kept_postings = kept[self.postings_documents]
+        # The known terms keep their vocabulary position as term ID
+        term_ids = {str(term): term_id for term_id, term in enumerate(self.vocabulary)}
+        added = self._tokenize_documents(documents, term_ids, int(kept.sum()))
+        return self._from_postings(
+            np.array(list(term_ids), dtype=np.str_),
+            np.concatenate([posting_terms[kept_postings], added[0]]),
+            np.concatenate(
+                [renumbered[self.postings_documents[kept_postings]], added[1]]
+            ),
+            np.concatenate([self.postings_frequencies[kept_postings], added[2]]),
+            np.concatenate([self.chunk_ids[kept], added[3]]),
+            np.concatenate([self.place_ids[kept], added[4]]),
+            np.concatenate([self.energy_types[kept], added[5]]),
+            np.concatenate([self.document_lengths[kept], added[6]]),
+        )
+
+    def save(self, path: str) -> None:
+        """
+        Writes the index to a compressed NumPy archive, replacing an existing one atomically.
+
+        Args:
+            path: The path of the archive.
+        """
+        temporary_path = f"{path}.tmp.npz"
+        np.savez_compressed(
+            temporary_path,
+            vocabulary=self.vocabulary,
+            offsets=self.offsets,
+            postings_documents=self.postings_documents,
+            postings_frequencies=self.postings_frequencies,
+            document_lengths=self.document_lengths,
+            chunk_ids=self.chunk_ids,
+            place_ids=self.place_ids,
+            energy_types=self.energy_types,
+            **{name: getattr(self, name) for name in FILTER_ARRAYS},
+        )
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        """
+        Reads an index written by save.
+
+        Args:
+            path: The path of the archive.
+
+        Returns:
+            The index.
+        """
+        with np.load(path) as archive:
+            return cls({name: archive[name] for name in archive.files})
+
+    @staticmethod
+    def _grouped_documents(
+        keys: np.ndarray, offsets: np.ndarray, documents: np.ndarray, values: list[str]
+    ) -> np.ndarray:
+        """
+        Collects the documents of some values of a grouping.
+
+        Args:
+            keys: The sorted values of the grouping.
+            offsets: The offsets of the documents of each value.
+            documents: The documents of all values.
+            values: The values to collect the documents of.
+
+        Returns:
+            The sorted distinct documents.
+        """
+        matches = []
+        for value in values:
+            position = np.searchsorted(keys, value)
+            if position < len(keys) and keys[position] == value:
+                matches.append(documents[offsets[position] : offsets[position + 1]])
+        if not matches:
+            return np.array([], dtype=np.int32)
+        return np.unique(np.concatenate(matches))
+
+    def _filter_documents(
+        self, place_ids: list[str] | None, energy_types: list[str] | None
+    ) -> np.ndarray | None:
+        """
+        Selects the documents about the given places and energy types.
+
+        Args:
+            place_ids: The places, None for all places.
+            energy_types: The energy types, None for all energy types.
+
+        Returns:
+            The sorted matching documents, or None without filters.
+        """
+        documents = None
+        if place_ids is not None:
+            documents = self._grouped_documents(
+                self.place_keys, self.place_offsets, self.place_documents, place_ids
+            )
+        if energy_types is not None:
+            energy_type_documents = self._grouped_documents(
+                self.energy_type_keys,
+                self.energy_type_offsets,
+                self.energy_type_documents,
+                energy_types,
+            )
+            documents = (
+                energy_type_documents
+                if documents is None
+                else np.intersect1d(
+                    documents, energy_type_documents, assume_unique=True
+                )
+            )
+        return documents
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        place_ids: list[str] | None = None,
+        energy_types: list[str] | None = None,
+    ) -> list[tuple[str, float]]:
+        """
+        Ranks the chunks by their BM25 score for a query.
+
+        Only the postings of the documents matching the filters are scored.
+
+        Args:
+            query: The query.
+            k: The number of chunks to return.
+            place_ids: Only search the chunks about these places.
+            energy_types: Only search the chunks about any of these energy types.
+
+        Returns:
+            Tuples of the chunk ID and BM25 score of the best matching chunks, best first.
+            Chunks without any query term are not returned.
+        """
+        allowed = self._filter_documents(place_ids, energy_types)
+        if allowed is not None and len(allowed) == 0:
+            return []
+        documents = len(self.chunk_ids)
+        matched_documents, matched_scores = [], []
+        for term in set(tokenize(query)):
+            position = np.searchsorted(self.vocabulary, term)
+            if position == len(self.vocabulary) or self.vocabulary[position] != term:
+                continue
+            start, end = self.offsets[position], self.offsets[position + 1]
+            matches = self.postings_documents[start:end]
+            frequencies = self.postings_frequencies[start:end].astype(np.float32)
+            idf = np.log(1 + (documents - (end - start) + 0.5) / (end - start + 0.5))
+            if allowed is not None:
+                positions = np.minimum(
+                    np.searchsorted(allowed, matches), len(allowed) - 1
+                )
+                kept = allowed[positions] == matches
+                matches, frequencies = matches[kept], frequencies[kept]
+            norms = self.k1 * (
+                1
+                - self.b
+                + self.b * self.document_lengths[matches] / self.average_length
+            )
+            matched_documents.append(matches)
+            matched_scores.append(
+                idf * frequencies * (self.k1 + 1) / (frequencies + norms)
+            )
+        if not matched_documents:
+            return []
+
+        # Sum the scores of each matched document over the query terms
+        candidates, inverse = np.unique(
+            np.concatenate(matched_documents), return_inverse=True
+        )
+        scores = np.bincount(inverse, weights=np.concatenate(matched_scores))
+        top = np.flatnonzero(scores > 0)
+        top = top[np.argsort(-scores[top], kind="stable")[:k]]
+        return [
+            (str(self.chunk_ids[candidates[index]]), float(scores[index]))
+            for index in top
+        ]
+
+
+def get_lexical_index_path(table: str) -> str:
+    """
+    Returns the path of the lexical index of a news table.
+
+    Args:
+        table: The name of the news table.
+
+    Returns:
+        The path of the index archive.
+    """
+    return os.path.join(get_cache_directory("lexical"), f"{table}.npz")
+
+
+def rebuild_lexical_index(
+    table: str, documents: Iterable[tuple[str, str, str, list[str]]]
+) -> LexicalIndex:
+    """
+    Rebuilds the lexical index of a news table from its stored chunks.
+
+    Only the texts are read, so rebuilding after every ingestion keeps the index in sync
+    with replaced and deleted chunks at a fraction of the cost of the embeddings.
+
+    Args:
+        table: The name of the news table.
+        documents: Tuples of the chunk ID, text, place ID and energy types of each chunk.
+
+    Returns:
+        The index.
+    """
+    lexical_index = LexicalIndex.build(documents)
+    lexical_index.save(get_lexical_index_path(table))
+    return lexical_index
+
+
+def update_lexical_index(
+    table: str,
+    place_ids: Iterable[str],
+    documents: Iterable[tuple[str, str, str, list[str]]],
+) -> LexicalIndex:
+    """
+    Replaces the chunks of the given places in the lexical index of a news table.
+
+    Args:
+        table: The name of the news table, which must have been indexed.
+        place_ids: The places whose chunks were ingested again.
+        documents: Tuples of the chunk ID, text, place ID and energy types of each stored
+            chunk about the places.
+
+    Returns:
+        The index.
+    """
+    lexical_index = LexicalIndex.load(get_lexical_index_path(table)).replace_places(
+        place_ids, documents
+    )
+    lexical_index.save(get_lexical_index_path(table))
+    return lexical_index
+
+
+def remove_lexical_index(table: str) -> None:
+    """
+    Removes the lexical index of a dropped news table.
+
+    Args:
+        table: The name of the news table.
+    """
+    path = get_lexical_index_path(table)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+_lexical_indexes: dict[str, tuple[int, LexicalIndex]] = {}
+_lexical_indexes_lock = threading.Lock()
+
+
+def get_lexical_index(table: str) -> LexicalIndex | None:
+    """
+    Returns the lexical index of a news table, reloading it after it was rebuilt.
+
+    Args:
+        table: The name of the news table.
+
+    Returns:
+        The index, or None if the table has not been indexed.
+    """
+    path = get_lexical_index_path(table)
+    try:
+        modified = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _lexical_indexes_lock:
+        cached = _lexical_indexes.get(table)
+        if cached is None or cached[0] != modified:
+            cached = (modified, LexicalIndex.load(path))
+            _lexical_indexes[table] = cached
+        return cached[1]
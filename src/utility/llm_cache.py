@@ -0,0 +1,128 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Any, Sequence
+
+from dotenv import load_dotenv
+from langchain.globals import set_llm_cache
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+from utility.cache import DiskCache, get_cache_directory
+
+load_dotenv(verbose=True)
+
+
+@dataclass(frozen=True)
+class LLMCacheSettings:
+    """
+    Settings of the persistent LLM response cache.
+
+    Attributes:
+        enabled: Whether the responses are cached.
+        max_entries: The maximum number of cached responses.
+        ttl: The maximum age of a cached response in seconds, None to keep it until evicted.
+    """
+
+    enabled: bool = True
+    max_entries: int = 100_000
+    ttl: float | None = None
+
+    @classmethod
+    def from_environment(cls) -> "LLMCacheSettings":
+        """
+        Reads the settings from the LLM_CACHE_* environment variables.
+
+        Returns:
+            The LLM cache settings.
+        """
+        ttl = os.getenv("LLM_CACHE_TTL")
+        return cls(
+            enabled=os.getenv("LLM_CACHE", "on") != "off",
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", cls.max_entries)),
+            ttl=float(ttl) if ttl else None,
+        )
+
+
+class LLMResponseCache(BaseCache):
+    """
+    LangChain cache of LLM responses in a persistent DiskCache.
+
+    Responses are keyed by a hash of the serialized model with its parameters, the bound
+    tool schemas and the prompt. All chains run at temperature 0, so a cached response is
+    what the model would answer again.
+    """
+
+    def __init__(self, store: DiskCache) -> None:
+        """
+        Initialize the LLMResponseCache class.
+
+        Args:
+            store: The store of the serialized responses.
+        """
+        self.store = store
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Sequence[Generation] | None:
+        """
+        Looks up the cached response to a prompt.
+
+        Args:
+            prompt: The serialized prompt.
+            llm_string: The serialized model, its parameters and bound tools.
+
+        Returns:
+            The cached generations, or None on a miss.
+        """
+        value = self.store.get(self._key(prompt, llm_string))
+        return loads(value) if value is not None else None
+
+    def update(
+        self, prompt: str, llm_string: str, return_val: Sequence[Generation]
+    ) -> None:
+        """
+        Caches the response to a prompt.
+
+        Args:
+            prompt: The serialized prompt.
+            llm_string: The serialized model, its parameters and bound tools.
+            return_val: The generations of the response.
+        """
+        self.store.set(self._key(prompt, llm_string), dumps(list(return_val)))
+
+    def clear(self, **kwargs: Any) -> None:
+        """
+        Deletes all cached responses.
+        """
+        self.store.clear()
+
+
+_llm_response_cache: LLMResponseCache | None = None
+
+
+def enable_llm_response_cache() -> LLMResponseCache | None:
+    """
+    Installs the persistent LLM response cache for every model of the process.
+
+    Models created before or after the call use it alike, so entry points call this once.
+
+    Returns:
+        The installed cache, or None if it is disabled by LLM_CACHE=off.
+    """
+    global _llm_response_cache
+    settings = LLMCacheSettings.from_environment()
+    if not settings.enabled:
+        return None
+    if _llm_response_cache is None:
+        _llm_response_cache = LLMResponseCache(
+            DiskCache(
+                os.path.join(get_cache_directory("llm"), "responses.sqlite"),
+                max_entries=settings.max_entries,
+                ttl=settings.ttl,
+            )
+        )
+        set_llm_cache(_llm_response_cache)
+    return _llm_response_cache
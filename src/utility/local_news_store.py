@@ -0,0 +1,955 @@
+import glob
+import json
+import os
+import shutil
+import threading
+from collections import defaultdict
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from utility.cache import get_cache_directory
+from utility.news_store import NewsChunk
+from utility.quantization import (
+    QuantizationSettings,
+    quantize,
+    squared_distances,
+    top_k,
+)
+
+COLUMN_DTYPES = {
+    "id": np.str_,
+    "news_id": np.uint64,
+    "date": "datetime64[D]",
+    "place_id": np.str_,
+    "chunk_index": np.uint32,
+    "content_hash": np.str_,
+    "energy_types": np.str_,
+    "duplicates": np.str_,
+    "ingestion_id": np.str_,
+    "document_end": np.int64,
+}
+
+
+def parse_duplicates(value: str) -> list[tuple[int, str]]:
+    """
+    Parses the stored near-duplicates of a chunk, "news_id:content_hash" comma-separated.
+
+    Args:
+        value: The stored value.
+
+    Returns:
+        The news ID and content hash of each near-duplicate.
+    """
+    return [
+        (int(news_id), content_hash)
+        for news_id, content_hash in (
+            duplicate.split(":") for duplicate in value.split(",") if duplicate
+        )
+    ]
+
+
+def index_rows(values: np.ndarray, rows: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Groups rows by a value.
+
+    Args:
+        values: The value of each entry.
+        rows: The row of each entry.
+
+    Returns:
+        The sorted rows of each value.
+    """
+    order = np.argsort(values, kind="stable")
+    unique_values, starts = np.unique(values[order], return_index=True)
+    return dict(zip(unique_values, np.split(rows[order], starts[1:])))
+
+
+class LocalNewsStore(VectorStore):
+    """
+    In-process vector store of news chunks, a drop-in for the ClickHouse NewsVectorStore.
+
+    The embeddings are kept in an append-only float32 matrix which is memory-mapped for
+    searches, the chunk texts in an append-only UTF-8 file. The other columns are stored as
+    NumPy segments, one per insert. The last two segments are merged while the last is at
+    least as large, so a row is rewritten a logarithmic number of times and few segments
+    remain. Deletes merge all segments into one.
+
+    With quantization a second, float16 or int8, copy of the embeddings is kept for the
+    first pass of searches, only the best candidates are read from the float32 matrix.
+    """
+
+    def __init__(
+        self,
+        table: str,
+        embedding: Embeddings,
+        directory: str,
+        quantization: QuantizationSettings | None = None,
+    ) -> None:
+        """
+        Initialize the LocalNewsStore class.
+
+        Args:
+            table: The name of the news table.
+            embedding: The embedding model.
+            directory: The directory holding the files of the table.
+            quantization: The quantization settings. Defaults to the environment settings.
+        """
+        self.table = table
+        self.embedding = embedding
+        self.directory = directory
+        self.quantization = quantization or QuantizationSettings.from_environment()
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._quantized_path = os.path.join(directory, f"vectors.{self.quantization.mode}")
+        self._scales_path = os.path.join(directory, "scales.f32")
+        self._documents_path = os.path.join(directory, "documents.bin")
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._lock = threading.RLock()
+        self.create_table()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """
+        The memory-mapped float32 embeddings, one per row.
+        """
+        self._refresh()
+        return self._vectors
+
+    def create_table(self) -> None:
+        """
+        Creates the table directory if it does not exist and loads the table.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    def _segment_paths(self) -> list[str]:
+        return sorted(glob.glob(os.path.join(self.directory, "segment_*.npz")))
+
+    def _load(self) -> None:
+        """
+        Loads the columns of all segments and maps the embeddings.
+
+        A segment whose rows are covered by an earlier segment is left over from an
+        interrupted merge and is removed.
+        """
+        self._segments = []
+        loaded_rows = 0
+        for path in self._segment_paths():
+            with np.load(path) as segment:
+                # Segments written before merging was introduced follow each other
+                start_row = loaded_rows
+                if "start_row" in segment.files:
+                    start_row = int(segment["start_row"])
+                columns = {
+                    column: segment[column].astype(dtype)
+                    for column, dtype in COLUMN_DTYPES.items()
+                }
+            if start_row < loaded_rows:
+                os.remove(path)
+                continue
+            self._segments.append(
+                {"path": path, "start_row": start_row, "columns": columns}
+            )
+            loaded_rows += len(columns["id"])
+        self._row_count = loaded_rows
+        self._documents_size = (
+            int(self._segments[-1]["columns"]["document_end"][-1]) if loaded_rows else 0
+        )
+        self._dimension = None
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, "r") as f:
+                self._dimension = json.load(f)["dimension"]
+        self._stale = True
+        self._refresh()
+
+    def _refresh(self) -> None:
+        """
+        Concatenates the columns of the segments and maps the embeddings after inserts.
+
+        Inserts only append a segment, so a bulk ingestion does not rebuild the columns
+        and indexes per batch, only the next read does.
+        """
+        if not self._stale:
+            return
+        with self._lock:
+            if not self._stale:
+                return
+            self._columns = {
+                column: np.concatenate(
+                    [segment["columns"][column] for segment in self._segments]
+                    or [np.array([], dtype=dtype)]
+                ).astype(dtype, copy=False)
+                for column, dtype in COLUMN_DTYPES.items()
+            }
+            # The segments keep views of the concatenated columns, not a second copy
+            for segment in self._segments:
+                start_row = segment["start_row"]
+                end_row = start_row + len(segment["columns"]["id"])
+                segment["columns"] = {
+                    column: values[start_row:end_row]
+                    for column, values in self._columns.items()
+                }
+            self._map_vectors()
+            self._stale = False
+
+    def _merge_segments(self) -> None:
+        """
+        Merges the last two segments while the last one is at least as large.
+
+        The merged segment replaces the earlier file before the later file is removed, so
+        an interrupted merge leaves a covered segment which the next load removes.
+        """
+        while len(self._segments) >= 2 and len(
+            self._segments[-1]["columns"]["id"]
+        ) >= len(self._segments[-2]["columns"]["id"]):
+            previous, last = self._segments[-2:]
+            columns = {
+                column: np.concatenate(
+                    [previous["columns"][column], last["columns"][column]]
+                )
+                for column in COLUMN_DTYPES
+            }
+            temporary_path = os.path.join(self.directory, "merge.tmp.npz")
+            np.savez(
+                temporary_path, start_row=np.int64(previous["start_row"]), **columns
+            )
+            os.replace(temporary_path, previous["path"])
+            os.remove(last["path"])
+            self._segments[-2:] = [{**previous, "columns": columns}]
+
+    def _map_vectors(self) -> None:
+        """
+        Memory-maps the embeddings and indexes the rows by place.
+        """
+        rows = len(self._columns["id"])
+        self._vectors = (
+            np.memmap(
+                self._vectors_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(rows, self._dimension),
+            )
+            if rows
+            else np.zeros((0, self._dimension or 0), dtype=np.float32)
+        )
+        self._squared_norms = None
+        self._map_quantized_vectors()
+
+        self._rows_by_id_cache = None
+        self._rows_by_place = index_rows(
+            self._columns["place_id"], np.arange(len(self._columns["place_id"]))
+        )
+        # The energy types of a chunk are stored comma-separated
+        energy_types = [
+            value.split(",") if value else [] for value in self._columns["energy_types"]
+        ]
+        self._rows_by_energy_type = index_rows(
+            np.array(
+                [energy_type for types in energy_types for energy_type in types],
+                dtype=np.str_,
+            ),
+            np.repeat(
+                np.arange(len(energy_types)),
+                np.array([len(types) for types in energy_types], dtype=np.int64),
+            ),
+        )
+
+    def _map_quantized_vectors(self) -> None:
+        """
+        Memory-maps the quantized embeddings, quantizing the table first if it has none yet.
+        """
+        self._quantized = None
+        self._scales = None
+        dtype = self.quantization.dtype
+        rows = len(self._vectors)
+        if dtype is None or rows == 0:
+            return
+
+        expected_size = rows * np.dtype(dtype).itemsize * self._dimension
+        if (
+            not os.path.exists(self._quantized_path)
+            or os.path.getsize(self._quantized_path) < expected_size
+        ):
+            for path in (self._quantized_path, self._scales_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            for start in range(0, rows, 65536):
+                self._append_quantized(np.asarray(self._vectors[start : start + 65536]), start)
+
+        self._quantized = np.memmap(
+            self._quantized_path, dtype=dtype, mode="r", shape=(rows, self._dimension)
+        )
+        if dtype is np.int8:
+            self._scales = np.memmap(
+                self._scales_path, dtype=np.float32, mode="r", shape=(rows,)
+            )
+
+    def _remove_other_quantized_copies(self) -> None:
+        """
+        Removes the quantized copies of the other quantization modes before the rows change.
+
+        Only the copy of the current mode is kept in sync with the rows, a copy of another
+        mode would pass the size check of a later run in that mode with its rows shifted.
+        """
+        for path in glob.glob(os.path.join(self.directory, "vectors.*")):
+            if path not in (self._vectors_path, self._quantized_path):
+                os.remove(path)
+        if self.quantization.dtype is not np.int8 and os.path.exists(self._scales_path):
+            os.remove(self._scales_path)
+
+    def _append_quantized(self, vectors: np.ndarray, rows: int) -> None:
+        """
+        Appends the quantized copy of embeddings, truncating the files to the given rows.
+
+        Args:
+            vectors: The float32 embeddings to append.
+            rows: The number of rows before the appended embeddings.
+        """
+        if self.quantization.dtype is None:
+            return
+        codes, scales = quantize(vectors, self.quantization)
+        with open(self._quantized_path, "ab") as f:
+            f.truncate(rows * codes.dtype.itemsize * self._dimension)
+            f.write(codes.tobytes())
+        if scales is not None:
+            with open(self._scales_path, "ab") as f:
+                f.truncate(rows * 4)
+                f.write(scales.tobytes())
+
+    def _read_documents(self, rows: np.ndarray) -> list[str]:
+        """
+        Reads the texts of the given rows.
+
+        Args:
+            rows: The row indices.
+
+        Returns:
+            The text of each row.
+        """
+        ends = self._columns["document_end"]
+        documents = []
+        with open(self._documents_path, "rb") as f:
+            for row in rows:
+                start = int(ends[row - 1]) if row > 0 else 0
+                f.seek(start)
+                documents.append(f.read(int(ends[row]) - start).decode("utf-8"))
+        return documents
+
+    def drop(self) -> None:
+        """
+        Drops the table and its files.
+        """
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.create_table()
+
+    def news_versions_by_place(
+        self,
+        place_ids: list[str] | None = None,
+        energy_types: list[str] | None = None,
+    ) -> dict[str, list[tuple[int, str]]]:
+        """
+        Groups the news articles by their place, including the linked near-duplicates.
+
+        Args:
+            place_ids: Only list the news about these places. Defaults to all places.
+            energy_types: Only list the news about any of these energy types.
+
+        Returns:
+            The sorted news IDs and content hashes of the news about each place by its ID.
+        """
+        self._refresh()
+        columns = self._columns
+        rows = self._candidate_rows(place_ids, energy_types)
+        if rows is None:
+            rows = np.arange(len(columns["id"]))
+        versions = defaultdict(set)
+        for row in rows:
+            place_versions = versions[str(columns["place_id"][row])]
+            place_versions.add(
+                (int(columns["news_id"][row]), str(columns["content_hash"][row]))
+            )
+            place_versions.update(parse_duplicates(str(columns["duplicates"][row])))
+        return {
+            place_id: sorted(place_versions)
+            for place_id, place_versions in versions.items()
+        }
+
+    def iterate_documents(
+        self, place_ids: Iterable[str] | None = None
+    ) -> Iterator[tuple[str, str, str, list[str]]]:
+        """
+        Streams the texts of the chunks, e.g. to index them.
+
+        Args:
+            place_ids: Only stream the chunks about these places. Defaults to all places.
+
+        Yields:
+            Tuples of the chunk ID, text, place ID and energy types of each chunk.
+        """
+        self._refresh()
+        columns = self._columns
+        all_rows = self._candidate_rows(
+            list(place_ids) if place_ids is not None else None, None
+        )
+        if all_rows is None:
+            all_rows = np.arange(len(columns["id"]))
+        for start in range(0, len(all_rows), 4096):
+            rows = all_rows[start : start + 4096]
+            for row, document in zip(rows, self._read_documents(rows)):
+                energy_types = str(columns["energy_types"][row])
+                yield (
+                    str(columns["id"][row]),
+                    document,
+                    str(columns["place_id"][row]),
+                    energy_types.split(",") if energy_types else [],
+                )
+
+    def count(self) -> int:
+        """
+        Counts the chunks in the table.
+
+        Returns:
+            The number of chunks.
+        """
+        return self._row_count
+
+    def existing_news(self) -> dict[int, list[tuple[str, str]]]:
+        """
+        Lists the news articles stored in the table, including the near-duplicates linked
+        to a stored article.
+
+        An article is stored once, but an interrupted update can leave an earlier version
+        at another place or with another content hash until its place is ingested again.
+
+        Returns:
+            The sorted places and content hashes each stored news article is stored with,
+            by its news ID.
+        """
+        self._refresh()
+        versions = set()
+        for news_id, place_id, content_hash, duplicates in zip(
+            self._columns["news_id"],
+            self._columns["place_id"],
+            self._columns["content_hash"],
+            self._columns["duplicates"],
+        ):
+            versions.add((int(news_id), str(place_id), str(content_hash)))
+            for duplicate_id, duplicate_hash in parse_duplicates(str(duplicates)):
+                versions.add((duplicate_id, str(place_id), duplicate_hash))
+        existing_news = {}
+        for news_id, place_id, content_hash in sorted(versions):
+            existing_news.setdefault(news_id, []).append((place_id, content_hash))
+        return existing_news
+
+    def delete_outdated_chunks(
+        self, place_ids: Iterable[str], news_ids: Iterable[int], ingestion_id: str
+    ) -> None:
+        """
+        Deletes the chunks of earlier ingestions which cover any of the given news articles
+        and compacts the table.
+
+        Chunks of the given ingestion, e.g. the freshly inserted ones, are kept.
+
+        Args:
+            place_ids: The places whose news were ingested again.
+            news_ids: The news IDs which were ingested again, also as near-duplicates.
+            ingestion_id: The ID of the current ingestion run.
+        """
+        place_ids = set(place_ids)
+        news_ids = set(news_ids)
+        if not place_ids:
+            return
+        with self._lock:
+            self._refresh()
+            keep = np.fromiter(
+                (
+                    place_id not in place_ids
+                    or chunk_ingestion_id == ingestion_id
+                    or (
+                        int(news_id) not in news_ids
+                        and not any(
+                            duplicate_id in news_ids
+                            for duplicate_id, _ in parse_duplicates(str(duplicates))
+                        )
+                    )
+                    for news_id, place_id, chunk_ingestion_id, duplicates in zip(
+                        self._columns["news_id"],
+                        self._columns["place_id"],
+                        self._columns["ingestion_id"],
+                        self._columns["duplicates"],
+                    )
+                ),
+                dtype=bool,
+                count=self.count(),
+            )
+            if keep.all():
+                return
+            rows = np.flatnonzero(keep)
+            documents = self._read_documents(rows)
+            vectors = np.asarray(self._vectors[rows])
+            columns = {column: values[rows] for column, values in self._columns.items()}
+            self._rewrite(columns, vectors, documents)
+
+    def _rewrite(
+        self, columns: dict[str, np.ndarray], vectors: np.ndarray, documents: list[str]
+    ) -> None:
+        """
+        Replaces all files of the table with a single segment.
+
+        Args:
+            columns: The columns of the remaining rows.
+            vectors: The embeddings of the remaining rows.
+            documents: The texts of the remaining rows.
+        """
+        encoded = [document.encode("utf-8") for document in documents]
+        columns["document_end"] = np.cumsum([len(text) for text in encoded], dtype=np.int64)
+        for path in self._segment_paths():
+            os.remove(path)
+        self._remove_other_quantized_copies()
+        with open(self._vectors_path, "wb") as f:
+            f.write(vectors.astype(np.float32).tobytes())
+        self._append_quantized(vectors.astype(np.float32), 0)
+        with open(self._documents_path, "wb") as f:
+            f.write(b"".join(encoded))
+        np.savez(
+            os.path.join(self.directory, "segment_000000.npz"),
+            start_row=np.int64(0),
+            **columns,
+        )
+        self._load()
+
+    def insert_chunks(
+        self, chunks: list[NewsChunk], embeddings: list[list[float]]
+    ) -> None:
+        """
+        Appends embedded chunks as a new segment.
+
+        Args:
+            chunks: The chunks to insert.
+            embeddings: The embedding of each chunk.
+        """
+        if not chunks:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        encoded = [chunk.document.encode("utf-8") for chunk in chunks]
+
+        with self._lock:
+            if self._dimension is None:
+                self._dimension = vectors.shape[1]
+                with open(self._meta_path, "w") as f:
+                    json.dump({"dimension": self._dimension}, f)
+
+            rows = self._row_count
+            documents_size = self._documents_size
+            columns = {
+                "id": [chunk.id for chunk in chunks],
+                "news_id": [chunk.news_id for chunk in chunks],
+                "date": [chunk.date for chunk in chunks],
+                "place_id": [chunk.place_id for chunk in chunks],
+                "chunk_index": [chunk.chunk_index for chunk in chunks],
+                "content_hash": [chunk.content_hash for chunk in chunks],
+                "energy_types": [",".join(chunk.energy_types) for chunk in chunks],
+                "duplicates": [
+                    ",".join(
+                        f"{news_id}:{content_hash}"
+                        for news_id, content_hash in chunk.duplicates
+                    )
+                    for chunk in chunks
+                ],
+                "ingestion_id": [chunk.ingestion_id for chunk in chunks],
+                "document_end": documents_size
+                + np.cumsum([len(text) for text in encoded], dtype=np.int64),
+            }
+
+            # The segment is written last, it commits the appended vectors and texts.
+            # Surplus bytes of an interrupted insert are truncated first.
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(rows * self._dimension * 4)
+                f.write(vectors.tobytes())
+            self._remove_other_quantized_copies()
+            self._append_quantized(vectors, rows)
+            with open(self._documents_path, "ab") as f:
+                f.truncate(documents_size)
+                f.write(b"".join(encoded))
+            columns = {
+                column: np.asarray(values, dtype=COLUMN_DTYPES[column])
+                for column, values in columns.items()
+            }
+            segment = (
+                int(os.path.basename(self._segments[-1]["path"])[8:14]) + 1
+                if self._segments
+                else 0
+            )
+            path = os.path.join(self.directory, f"segment_{segment:06d}.npz")
+            np.savez(path, start_row=np.int64(rows), **columns)
+
+            self._segments.append({"path": path, "start_row": rows, "columns": columns})
+            self._row_count += len(chunks)
+            self._documents_size = int(columns["document_end"][-1])
+            self._merge_segments()
+            self._stale = True
+
+    def add_chunks(self, chunks: list[NewsChunk]) -> list[str]:
+        """
+        Embeds and inserts chunks.
+
+        Args:
+            chunks: The chunks to insert.
+
+        Returns:
+            The IDs of the inserted chunks.
+        """
+        embeddings = self.embedding.embed_documents([chunk.document for chunk in chunks])
+        self.insert_chunks(chunks, embeddings)
+        return [chunk.id for chunk in chunks]
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: list[dict] | None = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        """
+        Embeds and inserts texts, taking the chunk columns from their metadata.
+
+        Args:
+            texts: The texts to insert.
+            metadatas: The metadata of each text, see NewsChunk.metadata.
+
+        Returns:
+            The IDs of the inserted chunks.
+        """
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        return self.add_chunks(
+            [
+                NewsChunk.from_metadata(text, metadata, index)
+                for index, (text, metadata) in enumerate(zip(texts, metadatas))
+            ]
+        )
+
+    def _candidate_rows(
+        self,
+        place_ids: list[str] | None,
+        energy_types: list[str] | None,
+        ids: list[str] | None = None,
+    ) -> np.ndarray | None:
+        """
+        Resolves the rows of the given places, energy types and chunk IDs.
+
+        Args:
+            place_ids: The places to search, None for all places.
+            energy_types: The energy types to search, None for all energy types.
+            ids: The chunks to search, None for all chunks.
+
+        Returns:
+            The sorted row indices, or None for all rows.
+        """
+        rows = None
+        filters = [
+            (place_ids, lambda: self._rows_by_place),
+            (energy_types, lambda: self._rows_by_energy_type),
+            (ids, self._rows_by_id),
+        ]
+        for values, get_rows_by_value in filters:
+            if values is None:
+                continue
+            rows_by_value = get_rows_by_value()
+            matches = [
+                rows_by_value[value] for value in values if value in rows_by_value
+            ]
+            matching_rows = (
+                np.unique(np.concatenate(matches))
+                if matches
+                else np.array([], dtype=np.int64)
+            )
+            rows = (
+                matching_rows
+                if rows is None
+                else np.intersect1d(rows, matching_rows, assume_unique=True)
+            )
+        return rows
+
+    def _rows_by_id(self) -> dict[str, np.ndarray]:
+        """
+        Indexes the rows by chunk ID on first use, only ID-filtered searches need it.
+
+        Returns:
+            The rows of each chunk ID.
+        """
+        if self._rows_by_id_cache is None:
+            self._rows_by_id_cache = index_rows(
+                self._columns["id"], np.arange(len(self._columns["id"]))
+            )
+        return self._rows_by_id_cache
+
+    def _exact_search(
+        self, query: np.ndarray, k: int, rows: np.ndarray | None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the closest rows by their float32 embedding.
+
+        Args:
+            query: The query embedding.
+            k: The number of rows to return.
+            rows: The rows to search, None for all rows.
+
+        Returns:
+            The closest rows and their L2 distance, closest first.
+        """
+        vectors = self._vectors
+        all_squared_norms = self._squared_norms
+        if all_squared_norms is None or len(all_squared_norms) != len(vectors):
+            all_squared_norms = np.einsum("ij,ij->i", vectors, vectors)
+            self._squared_norms = all_squared_norms
+
+        if rows is None:
+            squared_norms = all_squared_norms
+            candidates = vectors
+        else:
+            squared_norms = all_squared_norms[rows]
+            candidates = vectors[rows]
+
+        # |v - q|^2 = |v|^2 - 2 v.q + |q|^2, the last term does not change the ranking
+        distances = squared_norms - 2 * (candidates @ query)
+        top = top_k(distances, k)
+        top_rows = top if rows is None else rows[top]
+        return top_rows, np.sqrt(np.maximum(distances[top] + query @ query, 0.0))
+
+    def _quantized_search(
+        self, query: np.ndarray, k: int, rows: np.ndarray | None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Ranks the rows by their quantized embedding and re-ranks the best by the exact one.
+
+        Args:
+            query: The query embedding.
+            k: The number of rows to return.
+            rows: The rows to search, None for all rows.
+
+        Returns:
+            The closest rows and their L2 distance, closest first.
+        """
+        quantized, scales = self._quantized, self._scales
+        if rows is not None:
+            quantized = quantized[rows]
+            scales = scales[rows] if scales is not None else None
+        first_pass = top_k(
+            squared_distances(quantized, query, scales), k * self.quantization.oversampling
+        )
+        candidate_rows = np.sort(first_pass if rows is None else rows[first_pass])
+
+        distances = squared_distances(self._vectors[candidate_rows], query)
+        top = top_k(distances, k)
+        return candidate_rows[top], np.sqrt(distances[top])
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        place_ids: list[str] | None = None,
+        energy_types: list[str] | None = None,
+        ids: list[str] | None = None,
+    ) -> list[tuple[Document, float]]:
+        """
+        Returns the chunks closest to an embedding together with their L2 distance.
+
+        Args:
+            embedding: The embedding to search for.
+            k: The number of chunks to return.
+            place_ids: Only search the news about these places.
+            energy_types: Only search the news about any of these energy types.
+            ids: Only search these chunks.
+
+        Returns:
+            Tuples of the closest chunks and their distance, closest first.
+        """
+        return [
+            (document, distance)
+            for document, distance, _ in self.similarity_search_with_embeddings_by_vector(
+                embedding, k, place_ids, energy_types, ids
+            )
+        ]
+
+    def similarity_search_with_embeddings_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        place_ids: list[str] | None = None,
+        energy_types: list[str] | None = None,
+        ids: list[str] | None = None,
+    ) -> list[tuple[Document, float, list[float]]]:
+        """
+        Returns the chunks closest to an embedding with their distance and stored embedding.
+
+        Args:
+            embedding: The embedding to search for.
+            k: The number of chunks to return.
+            place_ids: Only search the news about these places.
+            energy_types: Only search the news about any of these energy types.
+            ids: Only search these chunks.
+
+        Returns:
+            Tuples of the closest chunks, their distance and their embedding, closest first.
+        """
+        if self.count() == 0:
+            return []
+        self._refresh()
+        query = np.asarray(embedding, dtype=np.float32)
+        rows = self._candidate_rows(place_ids, energy_types, ids)
+        if self._quantized is None:
+            top_rows, distances = self._exact_search(query, k, rows)
+        else:
+            top_rows, distances = self._quantized_search(query, k, rows)
+
+        documents = self._read_documents(top_rows)
+        return [
+            (
+                Document(
+                    page_content=document,
+                    metadata={
+                        "source": str(self._columns["place_id"][row]),
+                        "news_id": int(self._columns["news_id"][row]),
+                        "date": str(self._columns["date"][row]),
+                        "chunk_index": int(self._columns["chunk_index"][row]),
+                        "energy_types": (
+                            str(self._columns["energy_types"][row]).split(",")
+                            if self._columns["energy_types"][row]
+                            else []
+                        ),
+                        "duplicate_news_ids": [
+                            news_id
+                            for news_id, _ in parse_duplicates(
+                                str(self._columns["duplicates"][row])
+                            )
+                        ],
+                    },
+                ),
+                float(distance),
+                self._vectors[row].tolist(),
+            )
+            for row, document, distance in zip(top_rows, documents, distances)
+        ]
+
+    def similarity_search_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        place_ids: list[str] | None = None,
+        energy_types: list[str] | None = None,
+        ids: list[str] | None = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        """
+        Returns the chunks closest to an embedding.
+
+        Args:
+            embedding: The embedding to search for.
+            k: The number of chunks to return.
+            place_ids: Only search the news about these places.
+            energy_types: Only search the news about any of these energy types.
+            ids: Only search these chunks.
+
+        Returns:
+            The closest chunks, closest first.
+        """
+        return [
+            document
+            for document, _ in self.similarity_search_with_score_by_vector(
+                embedding, k, place_ids, energy_types, ids
+            )
+        ]
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        place_ids: list[str] | None = None,
+        energy_types: list[str] | None = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        """
+        Returns the chunks closest to a query.
+
+        Args:
+            query: The query to search for.
+            k: The number of chunks to return.
+            place_ids: Only search the news about these places.
+            energy_types: Only search the news about any of these energy types.
+
+        Returns:
+            The closest chunks, closest first.
+        """
+        return self.similarity_search_by_vector(
+            self.embedding.embed_query(query), k, place_ids, energy_types
+        )
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: list[dict] | None = None,
+        table: str = "",
+        **kwargs: Any,
+    ) -> "LocalNewsStore":
+        """
+        Creates a local news table and inserts the texts.
+
+        Args:
+            texts: The texts to insert.
+            embedding: The embedding model.
+            metadatas: The metadata of each text, see NewsChunk.metadata.
+            table: The name of the news table.
+
+        Returns:
+            The vector store.
+        """
+        vector_store = get_local_news_store(table, embedding)
+        vector_store.add_texts(texts, metadatas)
+        return vector_store
+
+
+_local_news_stores: dict[str, LocalNewsStore] = {}
+_local_news_stores_lock = threading.Lock()
+
+
+def get_local_news_store(table: str, embedding: Embeddings) -> LocalNewsStore:
+    """
+    Returns the process-wide local vector store of a table.
+
+    Args:
+        table: The name of the news table.
+        embedding: The embedding model.
+
+    Returns:
+        The local news vector store.
+    """
+    with _local_news_stores_lock:
+        if table not in _local_news_stores:
+            _local_news_stores[table] = LocalNewsStore(
+                table, embedding, os.path.join(get_cache_directory("news"), table)
+            )
+        return _local_news_stores[table]
+
+
+def local_news_table_exists(table: str) -> bool:
+    """
+    Check if a local news table holds any data.
+
+    Args:
+        table: The name of the table.
+
+    Returns:
+        True if the table has been populated, False otherwise.
+    """
+    return bool(
+        glob.glob(os.path.join(get_cache_directory("news"), table, "segment_*.npz"))
+    )
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+
+from clickhouse_connect.driver.client import Client
+from utility.cache import get_cache_directory
+from utility.connections import get_clickhouse_client
+from utility.database import NEWS_VECTOR_BACKEND
+
+NEWS_DIGESTS_TABLE = "nefino_news_digests"
+VERSION_COLUMN = "version"
+
+
+@dataclass(frozen=True)
+class NewsDigest:
+    """
+    The precomputed news analysis of a place.
+
+    Attributes:
+        place_id: The ID of the place.
+        energy_type: The name of the energy type selection the news were retrieved for.
+        include_ancestors: Whether the news about the ancestors of the place were included.
+        fingerprint: The fingerprint of the news the digest was computed from.
+        digest: The news analysis.
+    """
+
+    place_id: str
+    energy_type: str
+    include_ancestors: bool
+    fingerprint: str
+    digest: str
+
+
+def fingerprint_news(versions: list[tuple[int, str]]) -> str:
+    """
+    Computes the fingerprint of the news about a place.
+
+    Args:
+        versions: The sorted news IDs and content hashes of the news.
+
+    Returns:
+        The hex digest of the news.
+    """
+    return hashlib.sha256(json.dumps(versions).encode("utf-8")).hexdigest()
+
+
+def combine_fingerprints(*parts: str) -> str:
+    """
+    Combines fingerprints, e.g. of the places of a lineage and the prompt, into one.
+
+    Args:
+        parts: The fingerprints in a fixed order.
+
+    Returns:
+        The hex digest of the fingerprints.
+    """
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def ensure_news_digests_table(client: Client) -> None:
+    """
+    Create the news digests table if it does not exist.
+
+    Recomputing a digest is a plain insert, the table collapses the rows of a place to the
+    one with the highest version.
+
+    Args:
+        client: The ClickHouse client.
+    """
+    client.command(
+        f"CREATE TABLE IF NOT EXISTS {NEWS_DIGESTS_TABLE} ("
+        "place_id String, "
+        "energy_type LowCardinality(String), "
+        "include_ancestors Bool, "
+        "fingerprint String, "
+        "digest String, "
+        f"{VERSION_COLUMN} UInt64"
+        f") ENGINE = ReplacingMergeTree({VERSION_COLUMN}) "
+        "ORDER BY (energy_type, include_ancestors, place_id)"
+    )
+
+
+def _get_local_digest_path(
+    place_id: str, energy_type: str, include_ancestors: bool
+) -> str:
+    """
+    Returns the path of a news digest in the local store.
+
+    Args:
+        place_id: The ID of the place.
+        energy_type: The name of the energy type selection.
+        include_ancestors: Whether the news about the ancestors are included.
+
+    Returns:
+        The path of the digest file.
+    """
+    scope = "lineage" if include_ancestors else "place"
+    directory = get_cache_directory(os.path.join("digests", f"{energy_type}_{scope}"))
+    return os.path.join(directory, f"{place_id}.json")
+
+
+def load_news_digests(
+    energy_type: str,
+    include_ancestors: bool,
+    place_ids: list[str] | None = None,
+) -> dict[str, NewsDigest]:
+    """
+    Loads the stored news digests from the configured backend.
+
+    Args:
+        energy_type: The name of the energy type selection.
+        include_ancestors: Whether the news about the ancestors are included.
+        place_ids: Only load the digests of these places. Defaults to all places.
+
+    Returns:
+        The digests by place ID.
+    """
+    if NEWS_VECTOR_BACKEND == "local":
+        if place_ids is None:
+            directory = os.path.dirname(
+                _get_local_digest_path("", energy_type, include_ancestors)
+            )
+            place_ids = [
+                name.removesuffix(".json")
+                for name in os.listdir(directory)
+                if name.endswith(".json")
+            ]
+        digests = {}
+        for place_id in place_ids:
+            try:
+                with open(
+                    _get_local_digest_path(place_id, energy_type, include_ancestors),
+                    "r",
+                ) as f:
+                    digests[place_id] = NewsDigest(**json.load(f))
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+        return digests
+
+    client = get_clickhouse_client()
+    ensure_news_digests_table(client)
+    parameters = {"energy_type": energy_type, "include_ancestors": include_ancestors}
+    place_filter = ""
+    if place_ids is not None:
+        place_filter = "AND place_id IN {place_ids:Array(String)} "
+        parameters["place_ids"] = list(place_ids)
+    result = client.query(
+        "SELECT place_id, fingerprint, digest "
+        f"FROM {NEWS_DIGESTS_TABLE} FINAL "
+        "WHERE energy_type = {energy_type:String} "
+        "AND include_ancestors = {include_ancestors:Bool} " + place_filter,
+        parameters=parameters,
+    )
+    return {
+        place_id: NewsDigest(
+            place_id, energy_type, include_ancestors, fingerprint, digest
+        )
+        for place_id, fingerprint, digest in result.result_rows
+    }
+
+
+def save_news_digests(digests: list[NewsDigest]) -> None:
+    """
+    Saves news digests to the configured backend, replacing former digests of the places.
+
+    Args:
+        digests: The digests.
+    """
+    if not digests:
+        return
+    if NEWS_VECTOR_BACKEND == "local":
+        for digest in digests:
+            path = _get_local_digest_path(
+                digest.place_id, digest.energy_type, digest.include_ancestors
+            )
+            with open(f"{path}.tmp", "w") as f:
+                json.dump(asdict(digest), f)
+            os.replace(f"{path}.tmp", path)
+        return
+
+    client = get_clickhouse_client()
+    ensure_news_digests_table(client)
+    # Later digests of the same batch get a higher version and win
+    version = time.time_ns()
+    columns = list(NewsDigest.__dataclass_fields__)
+    client.insert(
+        NEWS_DIGESTS_TABLE,
+        [
+            [getattr(digest, column) for column in columns] + [version + index]
+            for index, digest in enumerate(digests)
+        ],
+        column_names=[*columns, VERSION_COLUMN],
+    )
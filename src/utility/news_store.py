@@ -0,0 +1,805 @@
+import json
+import os
+from dataclasses import asdict, dataclass
+from datetime import date
+from typing import Any, Callable, Iterable, Iterator
+
+from clickhouse_connect.driver.client import Client
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from utility.quantization import QuantizationSettings
+
+ANN_INDEX_NAME = "embedding_ann_idx"
+# The factor of nearest neighbours the ANN index returns before the energy type filter
+ANN_FILTER_OVERSAMPLING = 4
+# Computed by ClickHouse on insert, scaled symmetrically per vector like quantize()
+QUANTIZED_COLUMNS = {
+    "embedding_scale": "Float32 MATERIALIZED "
+    "greatest(arrayMax(arrayMap(x -> abs(x), embedding)), 1e-30) / 127",
+    "embedding_q": "Array(Int8) MATERIALIZED "
+    "arrayMap(x -> toInt8(round(x / embedding_scale)), embedding)",
+}
+
+
+@dataclass(frozen=True)
+class NewsChunk:
+    """
+    A chunk of a single news article as it is stored in the news table.
+
+    Attributes:
+        id: The unique ID of the chunk.
+        document: The text of the chunk.
+        news_id: The Nefino ID of the news article.
+        date: The publication date of the news article.
+        place_id: The NUTS code of the place the news article is about.
+        chunk_index: The position of the chunk inside the news article.
+        content_hash: The hash of the news article the chunk was split from.
+        energy_types: The Nefino energy types of the news article, e.g. ("WI", "SOLAR").
+        duplicates: The news ID and content hash of each near-duplicate of the news
+            article, which are not stored themselves.
+        ingestion_id: The ID of the ingestion run which inserted the chunk.
+    """
+
+    id: str
+    document: str
+    news_id: int
+    date: date
+    place_id: str
+    chunk_index: int
+    content_hash: str
+    energy_types: tuple[str, ...] = ()
+    duplicates: tuple[tuple[int, str], ...] = ()
+    ingestion_id: str = ""
+
+    @property
+    def metadata(self) -> dict[str, Any]:
+        """
+        The metadata of the chunk, with the place as "source" like the former CSVLoader.
+        """
+        return {
+            "source": self.place_id,
+            "news_id": self.news_id,
+            "date": self.date.isoformat(),
+            "chunk_index": self.chunk_index,
+            "energy_types": list(self.energy_types),
+            "duplicate_news_ids": [news_id for news_id, _ in self.duplicates],
+        }
+
+    @classmethod
+    def from_metadata(
+        cls, document: str, metadata: dict[str, Any], index: int = 0
+    ) -> "NewsChunk":
+        """
+        Creates a chunk from a text and its metadata, see NewsChunk.metadata.
+
+        Args:
+            document: The text of the chunk.
+            metadata: The metadata of the chunk.
+            index: The chunk index to use if the metadata has none.
+
+        Returns:
+            The chunk.
+        """
+        chunk_index = int(metadata.get("chunk_index", index))
+        return cls(
+            id=f'{metadata.get("news_id", 0)}_{chunk_index}',
+            document=document,
+            news_id=int(metadata.get("news_id", 0)),
+            date=date.fromisoformat(metadata.get("date", "1970-01-01")),
+            place_id=metadata.get("source", ""),
+            chunk_index=chunk_index,
+            content_hash=metadata.get("content_hash", ""),
+            energy_types=tuple(metadata.get("energy_types", ())),
+            duplicates=tuple(
+                (int(news_id), "") for news_id in metadata.get("duplicate_news_ids", ())
+            ),
+        )
+
+
+NEWS_CHUNK_COLUMNS = [*NewsChunk.__dataclass_fields__.keys(), "metadata", "embedding"]
+
+
+@dataclass(frozen=True)
+class NewsIndexSettings:
+    """
+    Settings of the approximate nearest neighbour index on the embedding column.
+
+    Attributes:
+        index_type: "none" for exact brute-force search, "annoy" or "usearch".
+        trees: The number of trees of an annoy index.
+        search_k_nodes: The number of nodes an annoy search inspects, -1 for the default.
+        granularity: The number of granules covered by one index block.
+    """
+
+    index_type: str = "none"
+    trees: int = 100
+    search_k_nodes: int = -1
+    granularity: int = 100_000_000
+
+    @classmethod
+    def from_environment(cls) -> "NewsIndexSettings":
+        """
+        Reads the settings from the NEWS_ANN_INDEX* environment variables.
+
+        Returns:
+            The index settings.
+        """
+        return cls(
+            index_type=os.getenv("NEWS_ANN_INDEX", cls.index_type),
+            trees=int(os.getenv("NEWS_ANN_INDEX_TREES", cls.trees)),
+            search_k_nodes=int(
+                os.getenv("NEWS_ANN_INDEX_SEARCH_K_NODES", cls.search_k_nodes)
+            ),
+            granularity=int(os.getenv("NEWS_ANN_INDEX_GRANULARITY", cls.granularity)),
+        )
+
+    @property
+    def index_definition(self) -> str | None:
+        """
+        The type expression of the index, or None for exact search.
+
+        Raises:
+            ValueError: If the index type is unknown.
+        """
+        match self.index_type:
+            case "none":
+                return None
+            case "annoy":
+                return f"annoy('L2Distance', {self.trees})"
+            case "usearch":
+                return "usearch('L2Distance')"
+            case _:
+                raise ValueError(f"Unknown ANN index type: {self.index_type}")
+
+    @property
+    def creation_settings(self) -> dict[str, int]:
+        """
+        The settings needed to create the experimental index.
+        """
+        if self.index_type == "none":
+            return {}
+        return {f"allow_experimental_{self.index_type}_index": 1}
+
+    @property
+    def query_settings(self) -> dict[str, int]:
+        """
+        The settings of similarity searches.
+
+        Exact search skips the data skipping indexes, so an ANN index left on the table from
+        an earlier configuration is ignored.
+        """
+        if self.index_type == "none":
+            return {"use_skip_indexes": 0}
+        if self.index_type == "annoy":
+            return {"annoy_index_search_k_nodes": self.search_k_nodes}
+        return {}
+
+
+class NewsVectorStore(VectorStore):
+    """
+    Vector store of news chunks in a ClickHouse table.
+
+    Besides the text and embedding every chunk keeps typed columns for its news article, so
+    the table can be diffed against the Nefino CSV and filtered without parsing metadata.
+    """
+
+    def __init__(
+        self,
+        table: str,
+        embedding: Embeddings,
+        client_provider: Callable[[], Client],
+        index_settings: NewsIndexSettings | None = None,
+        quantization: QuantizationSettings | None = None,
+    ) -> None:
+        """
+        Initialize the NewsVectorStore class.
+
+        Args:
+            table: The name of the news table.
+            embedding: The embedding model.
+            client_provider: Returns the ClickHouse client to run queries with.
+            index_settings: The ANN index settings. Defaults to the environment settings.
+            quantization: The quantization settings. Defaults to the environment settings.
+        """
+        self.table = table
+        self.embedding = embedding
+        self.index_settings = index_settings or NewsIndexSettings.from_environment()
+        self.quantization = quantization or QuantizationSettings.from_environment()
+        self._client_provider = client_provider
+        self.create_table()
+        self.ensure_ann_index()
+        self.ensure_quantized_columns()
+
+    @property
+    def client(self) -> Client:
+        return self._client_provider()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def create_table(self) -> None:
+        """
+        Creates the news table if it does not exist.
+        """
+        self.client.command(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "id String, "
+            "document String, "
+            "news_id UInt64, "
+            "date Date, "
+            "place_id LowCardinality(String), "
+            "chunk_index UInt32, "
+            "content_hash String, "
+            "energy_types Array(LowCardinality(String)), "
+            "duplicates Array(Tuple(UInt64, String)), "
+            "ingestion_id LowCardinality(String), "
+            "metadata String, "
+            "embedding Array(Float32), "
+            "INDEX news_id_idx news_id TYPE bloom_filter GRANULARITY 1"
+            ") ENGINE = MergeTree() "
+            "ORDER BY (place_id, news_id, chunk_index)"
+        )
+
+    def ensure_ann_index(self) -> None:
+        """
+        Adds the configured ANN index to the news table and builds it for the existing rows.
+
+        An existing index whose type expression or granularity differs from the settings,
+        e.g. another number of annoy trees, is dropped and built again.
+        """
+        index_definition = self.index_settings.index_definition
+        if index_definition is None:
+            return
+        existing = self.client.query(
+            "SELECT type_full, granularity FROM system.data_skipping_indices "
+            "WHERE database = currentDatabase() AND table = {table:String} "
+            "AND name = {name:String}",
+            parameters={"table": self.table, "name": ANN_INDEX_NAME},
+        ).result_rows
+        if existing:
+            type_full, granularity = existing[0]
+            # ClickHouse formats the expression itself, so whitespace is not compared
+            if (
+                "".join(type_full.split()) == "".join(index_definition.split())
+                and granularity == self.index_settings.granularity
+            ):
+                return
+
+        settings = self.index_settings.creation_settings
+        if existing:
+            self.client.command(
+                f"ALTER TABLE {self.table} DROP INDEX {ANN_INDEX_NAME}", settings=settings
+            )
+        self.client.command(
+            f"ALTER TABLE {self.table} ADD INDEX {ANN_INDEX_NAME} embedding "
+            f"TYPE {index_definition} GRANULARITY {self.index_settings.granularity}",
+            settings=settings,
+        )
+        self.client.command(
+            f"ALTER TABLE {self.table} MATERIALIZE INDEX {ANN_INDEX_NAME}",
+            settings=settings,
+        )
+
+    def ensure_quantized_columns(self) -> None:
+        """
+        Adds the int8 copy of the embeddings to the news table and computes it for the
+        existing rows.
+
+        Materializing a column rewrites every part of the table, so only missing columns
+        are added and computed. Rows inserted later compute them on insert.
+
+        Raises:
+            ValueError: If the quantization mode is not supported by ClickHouse.
+        """
+        match self.quantization.mode:
+            case "none":
+                return
+            case "int8":
+                pass
+            case _:
+                # Float16 columns need ClickHouse 24.11+, the image runs 23.4
+                raise ValueError(
+                    f"Quantization mode {self.quantization.mode} is only supported "
+                    "by the local news store."
+                )
+        existing = {
+            name
+            for (name,) in self.client.query(
+                "SELECT name FROM system.columns "
+                "WHERE database = currentDatabase() AND table = {table:String} "
+                "AND name IN {columns:Array(String)}",
+                parameters={"table": self.table, "columns": list(QUANTIZED_COLUMNS)},
+            ).result_rows
+        }
+        # The scale is added and computed first, the codes are computed from it
+        for column, definition in QUANTIZED_COLUMNS.items():
+            if column in existing:
+                continue
+            self.client.command(
+                f"ALTER TABLE {self.table} ADD COLUMN IF NOT EXISTS {column} {definition}"
+            )
+            self.client.command(f"ALTER TABLE {self.table} MATERIALIZE COLUMN {column}")
+
+    def drop(self) -> None:
+        """
+        Drops the news table.
+        """
+        self.client.command(f"DROP TABLE IF EXISTS {self.table}")
+
+    def count(self) -> int:
+        """
+        Counts the chunks in the news table.
+
+        Returns:
+            The number of chunks.
+        """
+        return self.client.command(f"SELECT count() FROM {self.table}")
+
+    def existing_news(self) -> dict[int, list[tuple[str, str]]]:
+        """
+        Lists the news articles stored in the news table, including the near-duplicates
+        linked to a stored article.
+
+        An article is stored once, but an interrupted update can leave an earlier version
+        at another place or with another content hash until its place is ingested again.
+
+        Returns:
+            The sorted places and content hashes each stored news article is stored with,
+            by its news ID.
+        """
+        result = self.client.query(
+            "SELECT news_id, place_id, content_hash FROM ("
+            f"SELECT news_id, place_id, content_hash FROM {self.table} "
+            "UNION ALL "
+            "SELECT duplicate.1 AS news_id, place_id, duplicate.2 AS content_hash "
+            f"FROM {self.table} ARRAY JOIN duplicates AS duplicate"
+            ") GROUP BY news_id, place_id, content_hash "
+            "ORDER BY news_id, place_id, content_hash"
+        )
+        existing_news = {}
+        for news_id, place_id, content_hash in result.result_rows:
+            existing_news.setdefault(news_id, []).append((place_id, content_hash))
+        return existing_news
+
+    def news_versions_by_place(
+        self,
+        place_ids: list[str] | None = None,
+        energy_types: list[str] | None = None,
+    ) -> dict[str, list[tuple[int, str]]]:
+        """
+        Groups the news articles by their place, including the linked near-duplicates.
+
+        Args:
+            place_ids: Only list the news about these places. Defaults to all places.
+            energy_types: Only list the news about any of these energy types.
+
+        Returns:
+            The sorted news IDs and content hashes of the news about each place by its ID.
+        """
+        conditions, parameters = [], {}
+        if place_ids is not None:
+            conditions.append("place_id IN {place_ids:Array(String)}")
+            parameters["place_ids"] = list(place_ids)
+        if energy_types is not None:
+            conditions.append("hasAny(energy_types, {energy_types:Array(String)})")
+            parameters["energy_types"] = list(energy_types)
+        prewhere = f"PREWHERE {' AND '.join(conditions)} " if conditions else ""
+        result = self.client.query(
+            "SELECT place_id, arraySort(groupUniqArray(version)) FROM ("
+            "SELECT place_id, "
+            "arrayJoin(arrayPushFront(duplicates, (news_id, content_hash))) AS version "
+            f"FROM {self.table} {prewhere}"
+            ") GROUP BY place_id",
+            parameters=parameters,
+        )
+        return {
+            place_id: [tuple(version) for version in versions]
+            for place_id, versions in result.result_rows
+        }
+
+    def iterate_documents(
+        self, place_ids: Iterable[str] | None = None
+    ) -> Iterator[tuple[str, str, str, list[str]]]:
+        """
+        Streams the texts of the chunks, e.g. to index them.
+
+        Args:
+            place_ids: Only stream the chunks about these places. Defaults to all places.
+
+        Yields:
+            Tuples of the chunk ID, text, place ID and energy types of each chunk.
+        """
+        query = f"SELECT id, document, place_id, energy_types FROM {self.table}"
+        parameters = {}
+        if place_ids is not None:
+            query += " PREWHERE place_id IN {place_ids:Array(String)}"
+            parameters["place_ids"] = list(place_ids)
+        with self.client.query_row_block_stream(query, parameters=parameters) as stream:
+            for block in stream:
+                for chunk_id, document, place_id, energy_types in block:
+                    yield chunk_id, document, place_id, energy_types
+
+    def delete_outdated_chunks(
+        self, place_ids: Iterable[str], news_ids: Iterable[int], ingestion_id: str
+    ) -> None:
+        """
+        Deletes the chunks of earlier ingestions which cover any of the given news articles.
+
+        Chunks of the given ingestion, e.g. the freshly inserted ones, are kept.
+
+        Args:
+            place_ids: The places whose news were ingested again.
+            news_ids: The news IDs which were ingested again, also as near-duplicates.
+            ingestion_id: The ID of the current ingestion run.
+        """
+        place_ids = list(place_ids)
+        if not place_ids:
+            return
+        self.client.command(
+            f"DELETE FROM {self.table} "
+            "WHERE place_id IN {place_ids:Array(String)} "
+            "AND ingestion_id != {ingestion_id:String} "
+            "AND hasAny(arrayPushFront(arrayMap(d -> d.1, duplicates), news_id), "
+            "{news_ids:Array(UInt64)})",
+            parameters={
+                "place_ids": place_ids,
+                "news_ids": list(news_ids),
+                "ingestion_id": ingestion_id,
+            },
+        )
+
+    def insert_chunks(
+        self, chunks: list[NewsChunk], embeddings: list[list[float]]
+    ) -> None:
+        """
+        Inserts embedded chunks with a single columnar insert.
+
+        Args:
+            chunks: The chunks to insert.
+            embeddings: The embedding of each chunk.
+        """
+        if not chunks:
+            return
+        rows = [
+            [*asdict(chunk).values(), json.dumps(chunk.metadata), embedding]
+            for chunk, embedding in zip(chunks, embeddings)
+        ]
+        self.client.insert(self.table, rows, column_names=NEWS_CHUNK_COLUMNS)
+
+    def add_chunks(self, chunks: list[NewsChunk]) -> list[str]:
+        """
+        Embeds and inserts chunks.
+
+        Args:
+            chunks: The chunks to insert.
+
+        Returns:
+            The IDs of the inserted chunks.
+        """
+        embeddings = self.embedding.embed_documents([chunk.document for chunk in chunks])
+        self.insert_chunks(chunks, embeddings)
+        return [chunk.id for chunk in chunks]
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: list[dict] | None = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        """
+        Embeds and inserts texts, taking the chunk columns from their metadata.
+
+        Args:
+            texts: The texts to insert.
+            metadatas: The metadata of each text, see NewsChunk.metadata.
+
+        Returns:
+            The IDs of the inserted chunks.
+        """
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        return self.add_chunks(
+            [
+                NewsChunk.from_metadata(text, metadata, index)
+                for index, (text, metadata) in enumerate(zip(texts, metadatas))
+            ]
+        )
+
+    def similarity_search_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        place_ids: list[str] | None = None,
+        energy_types: list[str] | None = None,
+        ids: list[str] | None = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        """
+        Returns the chunks closest to an embedding.
+
+        Args:
+            embedding: The embedding to search for.
+            k: The number of chunks to return.
+            place_ids: Only search the news about these places.
+            energy_types: Only search the news about any of these energy types.
+            ids: Only search these chunks.
+
+        Returns:
+            The closest chunks, closest first.
+        """
+        return [
+            document
+            for document, _ in self.similarity_search_with_score_by_vector(
+                embedding, k, place_ids, energy_types, ids
+            )
+        ]
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        place_ids: list[str] | None = None,
+        energy_types: list[str] | None = None,
+        ids: list[str] | None = None,
+    ) -> list[tuple[Document, float]]:
+        """
+        Returns the chunks closest to an embedding together with their L2 distance.
+
+        Args:
+            embedding: The embedding to search for.
+            k: The number of chunks to return.
+            place_ids: Only search the news about these places.
+            energy_types: Only search the news about any of these energy types.
+            ids: Only search these chunks.
+
+        Returns:
+            Tuples of the closest chunks and their distance, closest first.
+        """
+        return [
+            (document, distance)
+            for document, distance, _ in self._search_by_vector(
+                embedding, k, place_ids, energy_types, ids, with_embeddings=False
+            )
+        ]
+
+    def similarity_search_with_embeddings_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        place_ids: list[str] | None = None,
+        energy_types: list[str] | None = None,
+        ids: list[str] | None = None,
+    ) -> list[tuple[Document, float, list[float]]]:
+        """
+        Returns the chunks closest to an embedding with their distance and stored embedding.
+
+        Args:
+            embedding: The embedding to search for.
+            k: The number of chunks to return.
+            place_ids: Only search the news about these places.
+            energy_types: Only search the news about any of these energy types.
+            ids: Only search these chunks.
+
+        Returns:
+            Tuples of the closest chunks, their distance and their embedding, closest first.
+        """
+        return self._search_by_vector(
+            embedding, k, place_ids, energy_types, ids, with_embeddings=True
+        )
+
+    def _search_query(
+        self,
+        embedding: list[float],
+        k: int,
+        place_ids: list[str] | None,
+        energy_types: list[str] | None,
+        ids: list[str] | None,
+        with_embeddings: bool,
+    ) -> tuple[str, dict[str, Any]]:
+        """
+        Builds the query of a similarity search.
+
+        ClickHouse only searches an ANN index for a plain ORDER BY L2Distance(embedding,
+        <constant>) LIMIT n without a WHERE clause. So with an index, searches without a
+        place or chunk filter take the nearest neighbours from the index and filter them
+        afterwards. Place and chunk filters are selective and run as PREWHERE. The place
+        is the leading column of the sorting key, so only the granules of the given places
+        are read and an exact search there is cheaper than the index.
+
+        Args:
+            embedding: The embedding to search for.
+            k: The number of chunks to return.
+            place_ids: Only search the news about these places.
+            energy_types: Only search the news about any of these energy types.
+            ids: Only search these chunks.
+            with_embeddings: Whether to return the stored embeddings of the chunks.
+
+        Returns:
+            The query and its parameters.
+        """
+        returned_embedding = ", embedding " if with_embeddings else " "
+        if (
+            self.index_settings.index_definition is not None
+            and place_ids is None
+            and ids is None
+        ):
+            # The index analysis needs the embedding and limit as literals, not parameters
+            literal = "[" + ",".join(repr(float(value)) for value in embedding) + "]"
+            parameters = {"k": k}
+            candidates, condition = int(k), ""
+            if energy_types is not None:
+                candidates *= ANN_FILTER_OVERSAMPLING
+                parameters["energy_types"] = list(energy_types)
+                condition = "WHERE hasAny(energy_types, {energy_types:Array(String)}) "
+            query = (
+                f"SELECT document, metadata, L2Distance(embedding, {literal}) AS dist"
+                + returned_embedding
+                + "FROM ("
+                f"SELECT document, metadata, energy_types, embedding FROM {self.table} "
+                f"ORDER BY L2Distance(embedding, {literal}) LIMIT {candidates}) "
+                + condition
+                + "ORDER BY dist ASC LIMIT {k:UInt32}"
+            )
+            return query, parameters
+
+        parameters = {"embedding": embedding, "k": k}
+        conditions = []
+        if place_ids is not None:
+            conditions.append("place_id IN {place_ids:Array(String)}")
+            parameters["place_ids"] = list(place_ids)
+        if energy_types is not None:
+            conditions.append("hasAny(energy_types, {energy_types:Array(String)})")
+            parameters["energy_types"] = list(energy_types)
+        if ids is not None:
+            conditions.append("id IN {ids:Array(String)}")
+            parameters["ids"] = list(ids)
+        prewhere = f"PREWHERE {' AND '.join(conditions)} " if conditions else ""
+
+        if self.quantization.mode == "int8":
+            # The first pass only reads the int8 column, a quarter of the float32 bytes.
+            # The float32 embeddings are read for the candidates only.
+            parameters["candidates"] = k * self.quantization.oversampling
+            candidates = (
+                f"id IN (SELECT id FROM {self.table} "
+                + prewhere
+                + "ORDER BY L2Distance("
+                "arrayMap(x -> x * embedding_scale, embedding_q), "
+                "{embedding:Array(Float32)}) ASC "
+                "LIMIT {candidates:UInt32}) "
+            )
+            prewhere = (
+                prewhere + "AND " + candidates if prewhere else "PREWHERE " + candidates
+            )
+
+        query = (
+            "SELECT document, metadata, "
+            "L2Distance(embedding, {embedding:Array(Float32)}) AS dist"
+            + returned_embedding
+            + f"FROM {self.table} "
+            + prewhere
+            + "ORDER BY dist ASC LIMIT {k:UInt32}"
+        )
+        return query, parameters
+
+    def explain_search(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        place_ids: list[str] | None = None,
+        energy_types: list[str] | None = None,
+        ids: list[str] | None = None,
+    ) -> str:
+        """
+        Explains which indexes a similarity search reads, e.g. to check the ANN index.
+
+        Args:
+            embedding: The embedding to search for.
+            k: The number of chunks to return.
+            place_ids: Only search the news about these places.
+            energy_types: Only search the news about any of these energy types.
+            ids: Only search these chunks.
+
+        Returns:
+            The output of EXPLAIN indexes = 1.
+        """
+        query, parameters = self._search_query(
+            embedding, k, place_ids, energy_types, ids, with_embeddings=False
+        )
+        result = self.client.query(
+            "EXPLAIN indexes = 1 " + query,
+            parameters=parameters,
+            settings=self.index_settings.query_settings,
+        )
+        return "\n".join(row[0] for row in result.result_rows)
+
+    def _search_by_vector(
+        self,
+        embedding: list[float],
+        k: int,
+        place_ids: list[str] | None,
+        energy_types: list[str] | None,
+        ids: list[str] | None,
+        with_embeddings: bool,
+    ) -> list[tuple[Document, float, list[float] | None]]:
+        """
+        Searches the chunks closest to an embedding, see _search_query.
+
+        Args:
+            embedding: The embedding to search for.
+            k: The number of chunks to return.
+            place_ids: Only search the news about these places.
+            energy_types: Only search the news about any of these energy types.
+            ids: Only search these chunks.
+            with_embeddings: Whether to return the stored embeddings of the chunks.
+
+        Returns:
+            Tuples of the closest chunks, their distance and their embedding or None,
+            closest first.
+        """
+        query, parameters = self._search_query(
+            embedding, k, place_ids, energy_types, ids, with_embeddings
+        )
+        result = self.client.query(
+            query, parameters=parameters, settings=self.index_settings.query_settings
+        )
+        return [
+            (
+                Document(page_content=row[0], metadata=json.loads(row[1])),
+                row[2],
+                row[3] if with_embeddings else None,
+            )
+            for row in result.result_rows
+        ]
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        place_ids: list[str] | None = None,
+        energy_types: list[str] | None = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        """
+        Returns the chunks closest to a query.
+
+        Args:
+            query: The query to search for.
+            k: The number of chunks to return.
+            place_ids: Only search the news about these places.
+            energy_types: Only search the news about any of these energy types.
+
+        Returns:
+            The closest chunks, closest first.
+        """
+        return self.similarity_search_by_vector(
+            self.embedding.embed_query(query), k, place_ids, energy_types
+        )
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: list[dict] | None = None,
+        table: str = "",
+        client_provider: Callable[[], Client] | None = None,
+        **kwargs: Any,
+    ) -> "NewsVectorStore":
+        """
+        Creates a news table and inserts the texts.
+
+        Args:
+            texts: The texts to insert.
+            embedding: The embedding model.
+            metadatas: The metadata of each text, see NewsChunk.metadata.
+            table: The name of the news table.
+            client_provider: Returns the ClickHouse client to run queries with.
+
+        Returns:
+            The vector store.
+        """
+        vector_store = cls(table, embedding, client_provider)
+        vector_store.add_texts(texts, metadatas)
+        return vector_store
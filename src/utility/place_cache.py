@@ -0,0 +1,120 @@
+"""
+Binary columnar cache of the place files.
+
+The semicolon separated place files are converted once into uncompressed Arrow IPC files, which
+are memory-mapped on load. The frames keep the Arrow columns as pandas ArrowDtype columns, so
+the strings and geometries are read from the mapped file instead of being copied into Python
+objects. The hex encoded WKB geometries are decoded into raw WKB bytes while building the cache. The cache is rebuilt whenever the fingerprint of the place files changes.
+"""
+
+import json
+import os
+
+import pandas as pd
+from utility.cache import get_cache_directory
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is not part of the non-geo requirements
+    pa = None
+
+MANIFEST_FILE = "manifest.json"
+
+
+def decode_wkb_hex(geometries: pd.Series) -> pd.Series:
+    """
+    Decodes a column of hex encoded WKB geometries into raw WKB bytes.
+
+    Args:
+        geometries: The hex encoded geometries, empty values are kept as None.
+
+    Returns:
+        The geometries as WKB bytes.
+    """
+    return geometries.map(
+        lambda geometry: bytes.fromhex(geometry) if isinstance(geometry, str) else None
+    )
+
+
+def _read_manifest(directory: str) -> list | None:
+    """
+    Reads the fingerprint of the place files the cache was built from.
+
+    Args:
+        directory: The cache directory.
+
+    Returns:
+        The fingerprint, or None if the cache has not been built yet.
+    """
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def load_place_cache(fingerprint: tuple) -> dict[str, pd.DataFrame] | None:
+    """
+    Loads the place frames from the cache if it was built from the given place files.
+
+    Args:
+        fingerprint: The fingerprint of the current place files.
+
+    Returns:
+        The place frames by place type with ArrowDtype columns backed by the mapped files,
+        or None if the cache is missing or stale.
+    """
+    if pa is None:
+        return None
+    directory = get_cache_directory("places")
+    if _read_manifest(directory) != [list(entry) for entry in fingerprint]:
+        return None
+
+    frames = {}
+    for file_name, _, size in fingerprint:
+        if size == 0:
+            continue
+        place_type = file_name.split(".")[0]
+        table = feather.read_table(
+            os.path.join(directory, f"{place_type}.arrow"), memory_map=True
+        )
+        frames[place_type] = table.to_pandas(types_mapper=pd.ArrowDtype)
+    return frames
+
+
+def write_place_cache(frames: dict[str, pd.DataFrame], fingerprint: tuple) -> None:
+    """
+    Writes the place frames into the cache.
+
+    The manifest is written last, so an interrupted build leaves a stale cache behind.
+
+    Args:
+        frames: The place frames by place type, with decoded geometries.
+        fingerprint: The fingerprint of the place files the frames were read from.
+    """
+    if pa is None:
+        return
+    directory = get_cache_directory("places")
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    for place_type, frame in frames.items():
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        feather.write_feather(
+            table,
+            os.path.join(directory, f"{place_type}.arrow"),
+            compression="uncompressed",
+        )
+
+    with open(manifest_path, "w") as f:
+        json.dump([list(entry) for entry in fingerprint], f)
+
+
+if __name__ == "__main__":
+    # Build step: python -m utility.place_cache
+    from utility.places import get_place_registry
+
+    registry = get_place_registry()
+    print(f"Place cache holds {len(registry)} places.")
@@ -1,24 +1,430 @@
 import os
+import threading
+from dataclasses import dataclass
 
+import numpy as np
 import pandas as pd
+from utility.place_cache import decode_wkb_hex, load_place_cache, write_place_cache
+
+PLACES_DIRECTORY = "/workspaces/thesis/assets/places"
+PLACE_FILE_SEPARATOR = ";"
+FEDERAL_STATE_PLACE_TYPE = "1_federal_states"
+PARENT_LINK_COLUMNS = (
+    "federal_state_id",
+    "planning_region_id",
+    "county_id",
+    "administrative_unit_id",
+)
+
+
+@dataclass(frozen=True)
+class Place:
+    """
+    A single place of the place dataset.
+
+    Attributes:
+        nuts_code: The NUTS code identifying the place.
+        name: The name of the place.
+        place_type: The place type, i.e. the name of the file the place is stored in.
+        federal_state_id: The NUTS code of the federal state of the place.
+        planning_region_id: The NUTS code of the planning region of the place.
+        county_id: The NUTS code of the county of the place.
+        administrative_unit_id: The NUTS code of the administrative unit of the place.
+    """
+
+    nuts_code: str
+    name: str
+    place_type: str
+    federal_state_id: str | None = None
+    planning_region_id: str | None = None
+    county_id: str | None = None
+    administrative_unit_id: str | None = None
+
+    def to_target(self) -> dict[str, str]:
+        """
+        Converts the place into the target dictionary used by the analysis pipeline.
+
+        Returns:
+            A dictionary with an "id", "name" and "place_type" field.
+        """
+        return {"id": self.nuts_code, "name": self.name, "place_type": self.place_type}
+
+
+def _to_csr(adjacency: list[list[int]]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Packs an adjacency list into compressed sparse row arrays.
+
+    Args:
+        adjacency: A list holding the neighbour indices of each node.
+
+    Returns:
+        A tuple of the row offsets and the concatenated neighbour indices.
+    """
+    offsets = np.zeros(len(adjacency) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(neighbours) for neighbours in adjacency])
+    indices = np.fromiter(
+        (index for neighbours in adjacency for index in neighbours),
+        dtype=np.int32,
+        count=int(offsets[-1]),
+    )
+    return offsets, indices
+
+
+class PlaceHierarchy:
+    """
+    Precomputed parent/child graph of all places.
+
+    Every place is mapped to an integer index. Children, ancestors and descendants are stored
+    as compressed sparse row arrays, so each query is a single slice.
+    """
+
+    def __init__(self, places: dict[str, Place]) -> None:
+        """
+        Initialize the PlaceHierarchy class.
+
+        Args:
+            places: All places indexed by their NUTS code.
+        """
+        self._codes = np.array(list(places.keys()), dtype=object)
+        self._index = {nuts_code: index for index, nuts_code in enumerate(places)}
+        place_types = [place.place_type for place in places.values()]
+
+        # Parent links pointing to places which are not part of the dataset are ignored
+        links = [
+            [
+                self._index[parent]
+                for parent in (getattr(place, column) for column in PARENT_LINK_COLUMNS)
+                if parent in self._index
+            ]
+            for place in places.values()
+        ]
+
+        ancestors: list[list[int]] = []
+        for linked in links:
+            seen: set[int] = set()
+            stack = list(linked)
+            while stack:
+                index = stack.pop()
+                if index not in seen:
+                    seen.add(index)
+                    stack.extend(links[index])
+            # Nearest ancestors first, i.e. the most specific place type first
+            ancestors.append(sorted(seen, key=lambda i: place_types[i], reverse=True))
+
+        # A linked place is a direct parent unless it is already an ancestor of another link,
+        # e.g. the federal state of a municipality which also links its county.
+        parents = [
+            [
+                index
+                for index in linked
+                if not any(index in ancestors[other] for other in linked)
+            ]
+            for linked in links
+        ]
+
+        children: list[list[int]] = [[] for _ in links]
+        for child, parent_indices in enumerate(parents):
+            for parent in parent_indices:
+                children[parent].append(child)
+
+        descendants: list[list[int]] = [[] for _ in links]
+        for descendant, ancestor_indices in enumerate(ancestors):
+            for ancestor in ancestor_indices:
+                descendants[ancestor].append(descendant)
+
+        self._ancestors = _to_csr(ancestors)
+        self._children = _to_csr(children)
+        self._descendants = _to_csr(descendants)
+
+    def _lookup(self, csr: tuple[np.ndarray, np.ndarray], nuts_code: str) -> list[str]:
+        """
+        Resolves the neighbours of a place in one of the adjacency arrays.
+
+        Args:
+            csr: The adjacency arrays to look up.
+            nuts_code: The NUTS code of the place.
+
+        Returns:
+            The NUTS codes of the neighbours.
+
+        Raises:
+            ValueError: If the place ID is not part of the hierarchy.
+        """
+        index = self._index.get(nuts_code)
+        if index is None:
+            raise ValueError("Invalid place id")
+        offsets, indices = csr
+        return self._codes[indices[offsets[index] : offsets[index + 1]]].tolist()
+
+    def ancestors(self, nuts_code: str) -> list[str]:
+        """
+        Returns all ancestors of a place, nearest first.
+
+        Args:
+            nuts_code: The NUTS code of the place.
+
+        Returns:
+            The NUTS codes of the ancestors.
+        """
+        return self._lookup(self._ancestors, nuts_code)
+
+    def children(self, nuts_code: str) -> list[str]:
+        """
+        Returns the direct children of a place.
+
+        Args:
+            nuts_code: The NUTS code of the place.
+
+        Returns:
+            The NUTS codes of the children.
+        """
+        return self._lookup(self._children, nuts_code)
+
+    def descendants(self, nuts_code: str) -> list[str]:
+        """
+        Returns all descendants of a place.
+
+        Args:
+            nuts_code: The NUTS code of the place.
+
+        Returns:
+            The NUTS codes of the descendants.
+        """
+        return self._lookup(self._descendants, nuts_code)
+
+
+class PlaceRegistry:
+    """
+    In-memory index of all places, loaded once and shared by the process.
+
+    The registry is reloaded only when the modification time or size of a place file changes.
+    """
+
+    def __init__(self, directory: str = PLACES_DIRECTORY) -> None:
+        """
+        Initialize the PlaceRegistry class.
+
+        Args:
+            directory: The directory containing the place files.
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._fingerprint: tuple | None = None
+        self._frames: dict[str, pd.DataFrame] = {}
+        self._places: dict[str, Place] = {}
+        self._targets: list[dict[str, str]] = []
+        self._hierarchy: PlaceHierarchy | None = None
+        self._geometries = None
+
+    def _snapshot(self) -> tuple:
+        """
+        Fingerprints the place files by their name, modification time and size.
+
+        Returns:
+            A tuple which changes whenever a place file changes.
+        """
+        return tuple(
+            sorted(
+                (file.name, file.stat().st_mtime_ns, file.stat().st_size)
+                for file in os.scandir(self.directory)
+                if file.name.endswith(".csv")
+            )
+        )
+
+    def refresh(self) -> None:
+        """
+        Reloads the place files if they changed since they were loaded.
+        """
+        fingerprint = self._snapshot()
+        if fingerprint == self._fingerprint:
+            return
+        with self._lock:
+            if fingerprint != self._fingerprint:
+                self._load(fingerprint)
+
+    def _load(self, fingerprint: tuple) -> None:
+        """
+        Loads all place files and rebuilds the indexes.
+
+        Args:
+            fingerprint: The fingerprint of the place files being loaded.
+        """
+        frames = load_place_cache(fingerprint)
+        if frames is None:
+            frames = {}
+            for file_name, _, size in fingerprint:
+                if size == 0:
+                    continue
+                frame = pd.read_csv(
+                    os.path.join(self.directory, file_name), sep=PLACE_FILE_SEPARATOR
+                )
+                if "geom" in frame.columns:
+                    frame["geom"] = decode_wkb_hex(frame["geom"])
+                frames[file_name.split(".")[0]] = frame
+            write_place_cache(frames, fingerprint)
+            # Continue with the mapped cache, like every later load
+            frames = load_place_cache(fingerprint) or frames
+
+        places: dict[str, Place] = {}
+        targets: list[dict[str, str]] = []
+        for place_type, frame in frames.items():
+            columns = {
+                column: [
+                    None if pd.isna(value) else value
+                    for value in frame[column].tolist()
+                ]
+                if column in frame.columns
+                else [None] * len(frame)
+                for column in PARENT_LINK_COLUMNS
+            }
+            for index, (nuts_code, name) in enumerate(
+                zip(frame["nuts_code"].tolist(), frame["name"].tolist())
+            ):
+                place = Place(
+                    nuts_code=nuts_code,
+                    name=name,
+                    place_type=place_type,
+                    **{column: values[index] for column, values in columns.items()},
+                )
+                places[nuts_code] = place
+                if place_type != FEDERAL_STATE_PLACE_TYPE:
+                    targets.append(place.to_target())
+
+        self._frames = frames
+        self._places = places
+        self._targets = targets
+        self._hierarchy = PlaceHierarchy(places)
+        self._geometries = None
+        self._fingerprint = fingerprint
+
+    def __contains__(self, nuts_code: str) -> bool:
+        return nuts_code in self._places
+
+    def __len__(self) -> int:
+        return len(self._places)
+
+    def get(self, nuts_code: str) -> Place | None:
+        """
+        Looks up a place by its NUTS code.
+
+        Args:
+            nuts_code: The NUTS code of the place.
+
+        Returns:
+            The place, or None if it does not exist.
+        """
+        return self._places.get(nuts_code)
+
+    def frame(self, place_type: str) -> pd.DataFrame:
+        """
+        Returns the raw table of a single place type.
+
+        Args:
+            place_type: The place type, e.g. "3_counties".
+
+        Returns:
+            The DataFrame of the place file. It is shared and must not be modified.
+        """
+        return self._frames[place_type]
+
+    @property
+    def place_types(self) -> list[str]:
+        """
+        The loaded place types in file order.
+        """
+        return list(self._frames.keys())
+
+    @property
+    def hierarchy(self) -> PlaceHierarchy:
+        """
+        The parent/child graph of all places.
+        """
+        return self._hierarchy
+
+    @property
+    def geometries(self):
+        """
+        The decoded geometries of all places as GeoSeries indexed by NUTS code.
+
+        The geometries are decoded in a single vectorized pass on first access.
+        """
+        import geopandas as gpd  # Not part of the non-geo requirements
+
+        with self._lock:
+            if self._geometries is None:
+                frames = [
+                    frame[["nuts_code", "geom"]]
+                    for frame in self._frames.values()
+                    if "geom" in frame.columns
+                ]
+                geometries = pd.concat(frames).dropna(subset=["geom"])
+                self._geometries = gpd.GeoSeries.from_wkb(
+                    geometries["geom"].to_numpy(), index=geometries["nuts_code"]
+                )
+            return self._geometries
+
+    @property
+    def targets(self) -> list[dict[str, str]]:
+        """
+        All places selectable as analysis target, i.e. all places except federal states.
+        """
+        return list(self._targets)
+
+
+_registry: PlaceRegistry | None = None
+_registry_lock = threading.Lock()
+
+
+def get_place_registry() -> PlaceRegistry:
+    """
+    Returns the process-wide place registry, reloading it if the place files changed.
+
+    Returns:
+        The shared PlaceRegistry.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PlaceRegistry()
+    _registry.refresh()
+    return _registry
+
+
+def get_place_lineage(place_id: str) -> list[Place]:
+    """
+    Resolves a place together with all of its ancestors.
+
+    Args:
+        place_id: The NUTS code of the place.
+
+    Returns:
+        The place followed by its ancestors, nearest first.
+
+    Raises:
+        ValueError: If the place ID is not found in any of the place files.
+    """
+    registry = get_place_registry()
+    place = registry.get(place_id)
+    if place is None:
+        raise ValueError("Invalid place id")
+    return [place] + [
+        registry.get(ancestor) for ancestor in registry.hierarchy.ancestors(place_id)
+    ]
 
 
 def iterate_place_files():
     """
-    Generator function that iterates over all CSV files in a specific directory.
+    Generator function that iterates over all place files except the federal states.
 
     Yields:
-        A dictionary representing a place.
+        A tuple of the DataFrame of a place file and its place type.
 
     """
-    for file in os.scandir("/workspaces/thesis/assets/places"):
-        if file.name.endswith(".csv"):
-            with open(file.path, "r") as f:
-                if os.stat(file.path).st_size == 0:
-                    continue
-                if file.name.split(".")[0] == "1_federal_states":
-                    continue
-                yield pd.read_csv(file.path), file.name.split(".")[0]
+    registry = get_place_registry()
+    for place_type in registry.place_types:
+        if place_type == FEDERAL_STATE_PLACE_TYPE:
+            continue
+        yield registry.frame(place_type), place_type
 
 
 def validate_place_id(place_id: str) -> bool:
@@ -34,10 +440,9 @@ def validate_place_id(place_id: str) -> bool:
     Raises:
         ValueError: If the place ID is not found in any of the place files.
     """
-    for places, place_type in iterate_place_files():
-        for _, place in places.iterrows():
-            if place_id == place["nuts_code"]:
-                return True
+    place = get_place_registry().get(place_id)
+    if place is not None and place.place_type != FEDERAL_STATE_PLACE_TYPE:
+        return True
     raise ValueError("Invalid place id")
 
 
@@ -49,16 +454,7 @@ def get_selection_targets() -> list[dict[str]]:
     Returns:
         A list of dictionaries, each representing a place.
     """
-    targets: list[dict[str]] = []
-    for places, place_type in iterate_place_files():
-        for _, place in places.iterrows():
-            place = {
-                "id": place["nuts_code"],
-                "name": place["name"],
-                "place_type": place_type,
-            }
-            targets.append(place)
-    return targets
+    return get_place_registry().targets
 
 
 def get_random_samples(seed: int) -> list[dict[str, list[dict[str, str]]]]:
@@ -84,21 +480,13 @@ def get_random_samples(seed: int) -> list[dict[str, list[dict[str, str]]]]:
         "4_administrative_units": 33,
         "5_local_administrative_units": 33,
     }
+    registry = get_place_registry()
     samples = []
     for places_df, place_type in iterate_place_files():
         # Select random samples
         sample_size = sample_sizes[place_type]
-        places_df = places_df.sample(n=sample_size, random_state=seed)
+        nuts_codes = places_df["nuts_code"].sample(n=sample_size, random_state=seed)
         samples.extend(
-            places_df.apply(
-                lambda place: {
-                    "id": place["nuts_code"],
-                    "name": place["name"],
-                    "place_type": place_type,
-                },
-                axis=1,
-            )
-            .to_dict()
-            .values(),
+            registry.get(nuts_code).to_target() for nuts_code in nuts_codes
         )
     return samples
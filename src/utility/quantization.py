@@ -0,0 +1,140 @@
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+QUANTIZATION_DTYPES = {"float16": np.float16, "int8": np.int8}
+
+
+@dataclass(frozen=True)
+class QuantizationSettings:
+    """
+    Settings of the quantized first-pass similarity search.
+
+    The first pass ranks all candidate chunks by their quantized embedding, then the best
+    k * oversampling chunks are re-ranked by their exact embedding.
+
+    Attributes:
+        mode: "none" for exact search only, "float16" or "int8".
+        oversampling: The factor of chunks re-ranked by their exact embedding.
+    """
+
+    mode: str = "none"
+    oversampling: int = 4
+
+    @classmethod
+    def from_environment(cls) -> "QuantizationSettings":
+        """
+        Reads the settings from the NEWS_QUANTIZATION* environment variables.
+
+        Returns:
+            The quantization settings.
+        """
+        return cls(
+            mode=os.getenv("NEWS_QUANTIZATION", cls.mode),
+            oversampling=int(
+                os.getenv("NEWS_QUANTIZATION_OVERSAMPLING", cls.oversampling)
+            ),
+        )
+
+    @property
+    def dtype(self) -> type | None:
+        """
+        The NumPy type of the quantized embeddings, or None for exact search.
+
+        Raises:
+            ValueError: If the mode is unknown.
+        """
+        if self.mode == "none":
+            return None
+        if self.mode not in QUANTIZATION_DTYPES:
+            raise ValueError(f"Unknown quantization mode: {self.mode}")
+        return QUANTIZATION_DTYPES[self.mode]
+
+    def bytes_per_vector(self, dimension: int) -> int:
+        """
+        The bytes a quantized embedding takes, including its int8 scale.
+
+        Args:
+            dimension: The dimension of the embeddings.
+
+        Returns:
+            The number of bytes.
+        """
+        if self.dtype is None:
+            return dimension * 4
+        if self.dtype is np.int8:
+            return dimension + 4
+        return dimension * 2
+
+
+def quantize(
+    vectors: np.ndarray, settings: QuantizationSettings
+) -> tuple[np.ndarray, np.ndarray | None]:
+    """
+    Quantizes embeddings.
+
+    int8 embeddings are scaled symmetrically per vector, so every vector uses the full range.
+
+    Args:
+        vectors: The float32 embeddings, one per row.
+        settings: The quantization settings.
+
+    Returns:
+        The quantized embeddings and, for int8, the scale of each vector.
+    """
+    if settings.dtype is np.int8:
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales = np.maximum(scales, np.finfo(np.float32).tiny).astype(np.float32)
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales
+    return vectors.astype(settings.dtype), None
+
+
+def squared_distances(
+    matrix: np.ndarray,
+    query: np.ndarray,
+    scales: np.ndarray | None = None,
+    block_size: int = 65536,
+) -> np.ndarray:
+    """
+    Computes the squared L2 distances of a query to every row of a possibly quantized matrix.
+
+    The rows are converted to float32 block by block, so memory stays bounded by the block
+    size also for memory-mapped matrices.
+
+    Args:
+        matrix: The embeddings, one per row, in float32, float16 or int8.
+        query: The float32 query embedding.
+        scales: The scale of each row of an int8 matrix.
+        block_size: The number of rows converted at once.
+
+    Returns:
+        The squared distance of each row.
+    """
+    distances = np.empty(len(matrix), dtype=np.float32)
+    for start in range(0, len(matrix), block_size):
+        block = np.asarray(matrix[start : start + block_size], dtype=np.float32)
+        if scales is not None:
+            block *= scales[start : start + block_size, None]
+        block -= query
+        distances[start : start + block_size] = np.einsum("ij,ij->i", block, block)
+    return distances
+
+
+def top_k(distances: np.ndarray, k: int) -> np.ndarray:
+    """
+    Selects the positions of the k smallest distances.
+
+    Args:
+        distances: The distances.
+        k: The number of positions to select.
+
+    Returns:
+        The positions, smallest distance first.
+    """
+    k = min(k, len(distances))
+    if k == 0:
+        return np.array([], dtype=np.int64)
+    top = np.argpartition(distances, k - 1)[:k]
+    return top[np.argsort(distances[top])]
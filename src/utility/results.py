@@ -0,0 +1,203 @@
+import time
+
+import pandas as pd
+import streamlit as st
+from clickhouse_connect.driver.client import Client
+from utility.connections import get_clickhouse_client
+from utility.places import get_place_registry
+
+ANALYSIS_RESULTS_TABLE = "ANALYSIS_RESULTS"
+ANALYSIS_RESULTS_COLUMNS = (
+    "place_id",
+    "place_name",
+    "place_type",
+    "attitude_label",
+    "concise_thoughts",
+    "cf1",
+    "cf2",
+    "cf3",
+    "cf4",
+    "cf5",
+)
+VERSION_COLUMN = "version"
+
+
+def ensure_analysis_results_table(client: Client) -> None:
+    """
+    Create the analysis results table, or migrate it to a ReplacingMergeTree.
+
+    The table keeps every written row and collapses them to the one with the highest version
+    per place, so re-evaluating a place is a plain insert.
+
+    Args:
+        client: The ClickHouse client.
+    """
+    engines = client.query(
+        "SELECT engine FROM system.tables "
+        "WHERE database = currentDatabase() AND name = {table:String}",
+        parameters={"table": ANALYSIS_RESULTS_TABLE},
+    ).result_rows
+    if engines and engines[0][0] == "ReplacingMergeTree":
+        return
+
+    target_table = (
+        f"{ANALYSIS_RESULTS_TABLE}_REPLACING" if engines else ANALYSIS_RESULTS_TABLE
+    )
+    st.write(f"Creating table {target_table}...")
+    client.command(
+        f"CREATE TABLE IF NOT EXISTS {target_table} ("
+        + ", ".join(f"{column} String" for column in ANALYSIS_RESULTS_COLUMNS)
+        + f", {VERSION_COLUMN} UInt64"
+        f") ENGINE = ReplacingMergeTree({VERSION_COLUMN}) "
+        "ORDER BY place_id"
+    )
+    if not engines:
+        return
+
+    # Migrate the rows of the former MergeTree table and swap it with the new one
+    st.write(f"Migrating table {ANALYSIS_RESULTS_TABLE} to a ReplacingMergeTree...")
+    columns = ", ".join(ANALYSIS_RESULTS_COLUMNS)
+    client.command(
+        f"INSERT INTO {target_table} ({columns}, {VERSION_COLUMN}) "
+        f"SELECT {columns}, 0 FROM {ANALYSIS_RESULTS_TABLE}"
+    )
+    client.command(f"EXCHANGE TABLES {ANALYSIS_RESULTS_TABLE} AND {target_table}")
+    client.command(f"DROP TABLE {target_table}")
+
+
+def save_analysis_evaluations(evaluations: list[dict[str, str]]) -> set[str]:
+    """
+    Save a batch of analysis evaluations to the database with a single insert.
+
+    Places which have been evaluated before are replaced by the new evaluation.
+
+    Args:
+        evaluations: The evaluations, each a dictionary with a value for every column of
+            the analysis results table.
+
+    Returns:
+        The IDs of the places which had been evaluated before and have been updated.
+    """
+    if not evaluations:
+        return set()
+
+    client = get_clickhouse_client()
+    ensure_analysis_results_table(client)
+
+    place_ids = [evaluation["place_id"] for evaluation in evaluations]
+    existing_place_ids = client.query(
+        f"SELECT DISTINCT place_id FROM {ANALYSIS_RESULTS_TABLE} "
+        "WHERE place_id IN {place_ids:Array(String)}",
+        parameters={"place_ids": place_ids},
+    ).result_columns
+
+    # Later evaluations of the same batch get a higher version and win
+    version = time.time_ns()
+    rows = [
+        [evaluation[column] for column in ANALYSIS_RESULTS_COLUMNS] + [version + index]
+        for index, evaluation in enumerate(evaluations)
+    ]
+    client.insert(
+        ANALYSIS_RESULTS_TABLE,
+        rows,
+        column_names=[*ANALYSIS_RESULTS_COLUMNS, VERSION_COLUMN],
+    )
+    return set(existing_place_ids[0]) if existing_place_ids else set()
+
+
+def save_analysis_evaluation(
+    place_id: str,
+    place_name: str,
+    place_type: str,
+    attitude_label: str,
+    concise_thoughts: str,
+    cf1: str,
+    cf2: str,
+    cf3: str,
+    cf4: str,
+    cf5: str,
+) -> bool:
+    """
+    Save a analysis evaluation to the database.
+
+    Args:
+        place_id: The ID of the place.
+        place_name: The name of the place.
+        place_type: The type of the place.
+        attitude_label: The attitude towards FFPV.
+        concise_thoughts: The concise thoughts about the place's attitude towards FFPV.
+        cf1: The classification feature 1.
+        cf2: The classification feature 2.
+        cf3: The classification feature 3.
+        cf4: The classification feature 4.
+        cf5: The classification feature 5.
+
+    Returns:
+        True if the place has been updated, False if it was a new entry.
+    """
+    updated_place_ids = save_analysis_evaluations(
+        [
+            {
+                "place_id": place_id,
+                "place_name": place_name,
+                "place_type": place_type,
+                "attitude_label": attitude_label,
+                "concise_thoughts": concise_thoughts,
+                "cf1": cf1,
+                "cf2": cf2,
+                "cf3": cf3,
+                "cf4": cf4,
+                "cf5": cf5,
+            }
+        ]
+    )
+    return place_id in updated_place_ids
+
+
+def fetch_analysis_results(
+    columns: list[str] | None = None,
+    federal_state_id: str | None = None,
+    place_types: list[str] | None = None,
+    attitudes: list[str] | None = None,
+) -> pd.DataFrame:
+    """
+    Fetch analysis results as typed columns, with the filters pushed down into the query.
+
+    Args:
+        columns: The columns to fetch. Defaults to all columns.
+        federal_state_id: Only fetch places inside this federal state.
+        place_types: Only fetch places of these place types.
+        attitudes: Only fetch places with one of these attitude labels.
+
+    Returns:
+        A DataFrame with one row per analysed place.
+
+    Raises:
+        ValueError: If an unknown column is requested.
+    """
+    columns = list(columns or ANALYSIS_RESULTS_COLUMNS)
+    unknown_columns = set(columns) - set(ANALYSIS_RESULTS_COLUMNS)
+    if unknown_columns:
+        raise ValueError(f"Unknown analysis result columns: {sorted(unknown_columns)}")
+
+    conditions = []
+    parameters = {}
+    if federal_state_id is not None:
+        conditions.append("place_id IN {place_ids:Array(String)}")
+        parameters["place_ids"] = get_place_registry().hierarchy.descendants(
+            federal_state_id
+        )
+    if place_types:
+        conditions.append("place_type IN {place_types:Array(String)}")
+        parameters["place_types"] = list(place_types)
+    if attitudes:
+        conditions.append("attitude_label IN {attitudes:Array(String)}")
+        parameters["attitudes"] = list(attitudes)
+
+    # FINAL collapses the rows of re-evaluated places to the latest evaluation
+    query = f"SELECT {', '.join(columns)} FROM {ANALYSIS_RESULTS_TABLE} FINAL"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
+    client = get_clickhouse_client()
+    return client.query_df(query, parameters=parameters)
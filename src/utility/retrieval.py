@@ -0,0 +1,336 @@
+import os
+from dataclasses import dataclass
+from itertools import groupby
+from typing import Any
+
+import numpy as np
+import tiktoken
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from utility.lexical_index import get_lexical_index
+
+# The encoding of the GPT-4 and GPT-3.5 models the chains run on
+TOKEN_ENCODING = "cl100k_base"
+# The rank offset of reciprocal rank fusion, damping the influence of the top ranks
+RRF_K = 60
+# How a news chunk is pasted into a prompt, its date and place tell the model when and
+# where it applies
+NEWS_CONTEXT_FORMAT = "[{date}, {place_id}]\n{text}"
+NEWS_CONTEXT_SEPARATOR = "\n\n"
+
+
+@dataclass(frozen=True)
+class RetrievalSettings:
+    """
+    Settings of the post-processing of retrieved news chunks.
+
+    Attributes:
+        k: The number of chunks selected for the context.
+        fetch_k: The number of closest chunks the selection is made from.
+        lambda_mult: The MMR trade-off, 1 for relevance only, 0 for diversity only.
+        token_budget: The maximum number of tokens of the context.
+        lexical: "off" for vector search only, "fusion" to fuse the fetch_k best BM25 and
+            vector matches, "prefilter" to only score the prefilter_k best BM25 matches.
+        prefilter_k: The number of BM25 matches kept by the lexical prefilter.
+    """
+
+    k: int = 4
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
+    token_budget: int = 1500
+    lexical: str = "fusion"
+    prefilter_k: int = 100
+
+    @classmethod
+    def from_environment(cls, k: int | None = None) -> "RetrievalSettings":
+        """
+        Reads the settings from the NEWS_RETRIEVAL_* environment variables.
+
+        Args:
+            k: The number of chunks selected for the context. Defaults to 4.
+
+        Returns:
+            The retrieval settings.
+        """
+        return cls(
+            k=k or cls.k,
+            fetch_k=int(os.getenv("NEWS_RETRIEVAL_FETCH_K", cls.fetch_k)),
+            lambda_mult=float(os.getenv("NEWS_RETRIEVAL_LAMBDA_MULT", cls.lambda_mult)),
+            token_budget=int(
+                os.getenv("NEWS_RETRIEVAL_TOKEN_BUDGET", cls.token_budget)
+            ),
+            lexical=os.getenv("NEWS_RETRIEVAL_LEXICAL", cls.lexical),
+            prefilter_k=int(os.getenv("NEWS_RETRIEVAL_PREFILTER_K", cls.prefilter_k)),
+        )
+
+
+def chunk_key(document: Document) -> str:
+    """
+    Returns the chunk ID of a retrieved chunk, as used by the lexical index.
+
+    Args:
+        document: The retrieved chunk.
+
+    Returns:
+        The chunk ID.
+    """
+    return f'{document.metadata.get("news_id")}_{document.metadata.get("chunk_index")}'
+
+
+def select_diverse(
+    relevance: np.ndarray, embeddings: np.ndarray, k: int, lambda_mult: float
+) -> list[int]:
+    """
+    Selects candidates by maximal marginal relevance.
+
+    Args:
+        relevance: The relevance of each candidate, in [0, 1].
+        embeddings: The embedding of each candidate.
+        k: The number of candidates to select.
+        lambda_mult: The trade-off, 1 for relevance only, 0 for diversity only.
+
+    Returns:
+        The positions of the selected candidates, in order of selection.
+    """
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    similarity = normalized @ normalized.T
+    selected = [int(np.argmax(relevance))]
+    while len(selected) < min(k, len(relevance)):
+        redundancy = similarity[:, selected].max(axis=1)
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        selected.append(int(np.argmax(scores)))
+    return selected
+
+
+def merge_overlapping_text(first: str, second: str, max_overlap: int = 200) -> str:
+    """
+    Joins two consecutive chunks, dropping the text the second repeats from the first.
+
+    Args:
+        first: The earlier chunk.
+        second: The later chunk.
+        max_overlap: The maximum number of characters the chunks overlap.
+
+    Returns:
+        The joined text.
+    """
+    for overlap in range(min(len(first), len(second), max_overlap), 0, -1):
+        if first.endswith(second[:overlap]):
+            return first + second[overlap:]
+    return f"{first}\n{second}"
+
+
+def merge_adjacent_chunks(documents: list[Document]) -> list[Document]:
+    """
+    Merges selected chunks of the same news article with consecutive chunk indexes.
+
+    A merged document takes the position of its best ranked chunk.
+
+    Args:
+        documents: The selected chunks, best first.
+
+    Returns:
+        The merged documents, best first.
+    """
+    ranked = sorted(
+        enumerate(documents),
+        key=lambda item: (
+            item[1].metadata.get("news_id"),
+            item[1].metadata.get("chunk_index", 0),
+        ),
+    )
+    merged = []
+    for _, group in groupby(ranked, key=lambda item: item[1].metadata.get("news_id")):
+        run_rank, run = None, None
+        for rank, document in group:
+            if (
+                run is not None
+                and document.metadata.get("chunk_index", 0)
+                == run.metadata["chunk_index"] + 1
+            ):
+                run = Document(
+                    page_content=merge_overlapping_text(
+                        run.page_content, document.page_content
+                    ),
+                    metadata={
+                        **run.metadata,
+                        "chunk_index": document.metadata["chunk_index"],
+                    },
+                )
+                run_rank = min(run_rank, rank)
+                continue
+            if run is not None:
+                merged.append((run_rank, run))
+            run_rank, run = rank, document
+        merged.append((run_rank, run))
+    return [document for _, document in sorted(merged, key=lambda item: item[0])]
+
+
+def format_news_document(document: Document) -> str:
+    """
+    Formats a news chunk as it is pasted into a prompt.
+
+    Args:
+        document: The news chunk.
+
+    Returns:
+        The text of the chunk headed by its date and place.
+    """
+    return NEWS_CONTEXT_FORMAT.format(
+        date=document.metadata.get("date", ""),
+        place_id=document.metadata.get("source", ""),
+        text=document.page_content,
+    )
+
+
+def format_news_context(documents: list[Document]) -> str:
+    """
+    Formats retrieved news chunks into the context of a prompt.
+
+    Args:
+        documents: The news chunks.
+
+    Returns:
+        A single string containing all chunks.
+    """
+    return NEWS_CONTEXT_SEPARATOR.join(
+        format_news_document(document) for document in documents
+    )
+
+
+def limit_to_token_budget(
+    documents: list[Document], token_budget: int
+) -> list[Document]:
+    """
+    Keeps the best documents which fit into a token budget together.
+
+    The tokens are counted as the documents are formatted by format_news_context. A
+    document which does not fit is skipped, so a later and shorter one may still fit.
+
+    Args:
+        documents: The documents, best first.
+        token_budget: The maximum number of tokens.
+
+    Returns:
+        The kept documents, best first.
+    """
+    encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+    separator_tokens = len(encoding.encode(NEWS_CONTEXT_SEPARATOR))
+    kept = []
+    for document in documents:
+        tokens = len(encoding.encode(format_news_document(document)))
+        if kept:
+            tokens += separator_tokens
+        if tokens <= token_budget:
+            kept.append(document)
+            token_budget -= tokens
+    return kept
+
+
+class NewsContextRetriever(BaseRetriever):
+    """
+    Retriever of news chunks prepared as context of a prompt.
+
+    The closest fetch_k chunks are fused with the best BM25 matches of the lexical index by
+    reciprocal rank fusion, as embeddings handle exact terms poorly. The candidates are
+    diversified with maximal marginal relevance, so repeated articles do not crowd the k
+    selected slots. Selected chunks of the same article are merged without their overlap
+    and the result is cut to the token budget.
+
+    With the lexical prefilter only the best BM25 matches are scored by their embedding,
+    and a query without any indexed term returns nothing without embedding the query.
+    """
+
+    vector_store: VectorStore
+    search_kwargs: dict[str, Any] = {}
+    settings: RetrievalSettings = RetrievalSettings()
+
+    def _lexical_matches(self, query: str) -> list[str] | None:
+        """
+        Ranks the chunks by the lexical index.
+
+        Args:
+            query: The query.
+
+        Returns:
+            The IDs of the best matching chunks, best first, or None without an index.
+        """
+        if self.settings.lexical == "off":
+            return None
+        lexical_index = get_lexical_index(self.vector_store.table)
+        if lexical_index is None:
+            return None
+        matches = lexical_index.search(
+            query,
+            self.settings.prefilter_k
+            if self.settings.lexical == "prefilter"
+            else self.settings.fetch_k,
+            place_ids=self.search_kwargs.get("place_ids"),
+            energy_types=self.search_kwargs.get("energy_types"),
+        )
+        return [chunk_id for chunk_id, _ in matches]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        lexical_matches = self._lexical_matches(query)
+        prefilter = self.settings.lexical == "prefilter" and lexical_matches is not None
+        if prefilter and not lexical_matches:
+            return []
+
+        query_embedding = self.vector_store.embeddings.embed_query(query)
+        # The stored embeddings come with the candidates, so MMR needs no embedding calls
+        if prefilter:
+            scored = self.vector_store.similarity_search_with_embeddings_by_vector(
+                query_embedding,
+                len(lexical_matches),
+                ids=lexical_matches,
+                **self.search_kwargs,
+            )
+        else:
+            scored = self.vector_store.similarity_search_with_embeddings_by_vector(
+                query_embedding, self.settings.fetch_k, **self.search_kwargs
+            )
+            # Lexical matches the vector search missed are scored by their embedding too
+            found = {chunk_key(document) for document, _, _ in scored}
+            missing = [
+                chunk_id for chunk_id in lexical_matches or [] if chunk_id not in found
+            ]
+            if missing:
+                scored += self.vector_store.similarity_search_with_embeddings_by_vector(
+                    query_embedding, len(missing), ids=missing, **self.search_kwargs
+                )
+        if not scored:
+            return []
+
+        scored.sort(key=lambda item: item[1])
+        candidates = [document for document, _, _ in scored]
+        lexical_ranks = {
+            chunk_id: rank for rank, chunk_id in enumerate(lexical_matches or [])
+        }
+        fused = np.array(
+            [
+                1 / (RRF_K + rank)
+                + (
+                    1 / (RRF_K + lexical_ranks[chunk_key(document)])
+                    if chunk_key(document) in lexical_ranks
+                    else 0
+                )
+                for rank, document in enumerate(candidates)
+            ]
+        )
+
+        candidate_embeddings = np.asarray(
+            [embedding for _, _, embedding in scored], dtype=np.float32
+        )
+        selected = select_diverse(
+            fused / fused.max(),
+            candidate_embeddings,
+            self.settings.k,
+            self.settings.lambda_mult,
+        )
+        documents = merge_adjacent_chunks([candidates[index] for index in selected])
+        return limit_to_token_budget(documents, self.settings.token_budget)
@@ -1,76 +1,153 @@
-import ast
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import geopandas as gpd
-import matplotlib.pyplot as plt
 import pandas as pd
 import streamlit as st
-from clickhouse_connect import get_client
-from utility.places import iterate_place_files
-
+from matplotlib.figure import Figure
+from utility.places import (
+    FEDERAL_STATE_PLACE_TYPE,
+    get_place_registry,
+    iterate_place_files,
+)
+from utility.results import fetch_analysis_results
+
+CLASSIFIED_PLACE_TYPES = [
+    "2_planning_regions",
+    "3_counties",
+    "4_administrative_units",
+    "5_local_administrative_units",
+]
+
+
+def load_classifications(federal_state_id: str | None = None) -> pd.DataFrame:
+    """
+    Loads the attitude classification of all analysed places.
+
+    Args:
+        federal_state_id: Only load the places inside this federal state.
+
+    Returns:
+        A DataFrame with a "nuts_code" and "attitude" column.
+    """
+    results = fetch_analysis_results(
+        columns=["place_id", "attitude_label"], federal_state_id=federal_state_id
+    )
+    return results.rename(columns={"place_id": "nuts_code", "attitude_label": "attitude"})
+
+
+def load_classified_places(federal_state_id: str | None = None) -> gpd.GeoDataFrame:
+    """
+    Loads all places with their geometry and attitude classification in a single pass.
+
+    Args:
+        federal_state_id: Only load the classifications of places inside this federal state.
+
+    Returns:
+        A GeoDataFrame with a "nuts_code", "federal_state_id", "place_type", "attitude"
+        and "geom" column.
+    """
+    places = pd.concat(
+        [
+            frame[["nuts_code", "federal_state_id"]].assign(place_type=place_type)
+            for frame, place_type in iterate_place_files()
+        ],
+        ignore_index=True,
+    )
 
-def plot_for_each_federal_state(streamlit_container: st.container) -> None:
-    federal_state_ids = pd.read_csv(
-        "/workspaces/thesis/assets/places/1_federal_states.csv"
+    # Merge the places with the classifications
+    merged = places.merge(
+        load_classifications(federal_state_id), on="nuts_code", how="left"
     )
 
-    for id, name in federal_state_ids[["nuts_code", "name"]].values:
-        plot_classified_places_in_state(id, name, streamlit_container)
+    # Attach the geometries, which are decoded once per process by the place registry
+    geometries = get_place_registry().geometries
+    merged = merged[merged["nuts_code"].isin(geometries.index)]
+    return gpd.GeoDataFrame(
+        merged, geometry=geometries.loc[merged["nuts_code"]].values
+    ).rename_geometry("geom")
 
 
-def plot_classified_places_in_state(
-    state_code: str, state_name: str, streamlit_container: st.container
-) -> None:
-    levels = iterate_place_files()
-    places = []
-    for level, _ in levels:
-        for _, place in level.iterrows():
-            places.append(place)
-    places = pd.DataFrame.from_records(places)
+def render_state_map(state_name: str, places: gpd.GeoDataFrame) -> bytes:
+    """
+    Renders the classified places of a single federal state.
 
-    # Connect to ClickHouse database
-    client = get_client(host="clickhouse")
+    Runs inside a worker process, so it only uses the object oriented matplotlib API.
 
-    # Query to get the classification data
-    query = "SELECT (place_id, attitude_label, place_type) FROM ANALYSIS_RESULTS"
-    data = client.command(query)
+    Args:
+        state_name: The name of the federal state, used as title.
+        places: The classified places inside the federal state.
 
-    split_data = [ast.literal_eval(item) for item in data.split("\n") if item]
-    nuts_codes, attitudes, place_types = zip(*split_data)
-    print(nuts_codes[:5])
+    Returns:
+        The map as PNG image.
+    """
+    fig = Figure()
+    ax = fig.subplots()
+    places.plot(ax=ax, color="lightcyan", edgecolor="black")
 
-    # Create a DataFrame from the split data
-    classifications = pd.DataFrame({"nuts_code": nuts_codes, "attitude": attitudes, "place_type": place_types})
+    for place_type in CLASSIFIED_PLACE_TYPES:
+        plot_classifications(places[places["place_type"] == place_type], ax)
 
-    # Merge the place GeoDataFrame with the classifications DataFrame
-    merged = pd.merge(places, classifications, on="nuts_code", how="left")
+    ax.set_axis_off()  # Remove axis labels
+    fig.suptitle(state_name)
 
-    # Filter the merged GeoDataFrame to only include rows where the 'federal_state_id' is the given state_code
-    filtered = merged[merged["federal_state_id"] == state_code]
+    image = io.BytesIO()
+    fig.savefig(image, format="png")
+    return image.getvalue()
 
-    # Check for missing values
-    if filtered["geom"].isnull().any():
-        # Handle missing values (e.g., drop the rows)
-        filtered = filtered.dropna(subset=["geom"])
 
-    # Check the format of the data
-    if not isinstance(filtered["geom"].iloc[0], gpd.geoseries.GeoSeries):
-        # Convert the data to the correct format
-        filtered["geom"] = gpd.GeoSeries.from_wkb(filtered["geom"])
+def plot_federal_states(
+    federal_states: list[tuple[str, str]], streamlit_container: st.container
+) -> None:
+    """
+    Plots a map of classified places for each of the given federal states.
+
+    Places and classifications are loaded once and grouped by federal state in one pass,
+    the maps are rendered concurrently in a process pool.
+
+    Args:
+        federal_states: Tuples of the NUTS code and name of each federal state.
+        streamlit_container: The Streamlit container to plot into.
+    """
+    # A single state lets the database filter the classifications
+    federal_state_id = federal_states[0][0] if len(federal_states) == 1 else None
+    places = load_classified_places(federal_state_id)
+    places_by_state = dict(tuple(places.groupby("federal_state_id")))
+
+    jobs = [
+        (state_name, places_by_state[state_code])
+        for state_code, state_name in federal_states
+        if state_code in places_by_state
+    ]
+    if not jobs:
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=min(len(jobs), os.cpu_count() or 1)
+    ) as executor:
+        futures = [
+            executor.submit(render_state_map, state_name, state_places)
+            for state_name, state_places in jobs
+        ]
+        # Collect in submission order so the maps keep the order of the federal states
+        for future in futures:
+            streamlit_container.image(future.result())
 
-    # Set the active geometry column
-    filtered = filtered.set_geometry("geom")
 
-    # Plot the geometries of the filtered GeoDataFrame
-    fig, ax = plt.subplots()
-    filtered.plot(ax=ax, color="lightcyan", edgecolor="black")
+def plot_for_each_federal_state(streamlit_container: st.container) -> None:
+    federal_states = get_place_registry().frame(FEDERAL_STATE_PLACE_TYPE)
+    plot_federal_states(
+        list(federal_states[["nuts_code", "name"]].itertuples(index=False)),
+        streamlit_container,
+    )
 
-    plot_classifications(filtered[filtered["place_type"] == "2_planning_regions"], ax)
-    plot_classifications(filtered[filtered["place_type"] == "3_counties"], ax)
-    plot_classifications(filtered[filtered["place_type"] == "4_administrative_units"], ax)
-    plot_classifications(filtered[filtered["place_type"] == "5_local_administrative_units"], ax)
 
-    ax = ax.set_axis_off()  # Remove axis labels
-    fig.suptitle(state_name)
-    streamlit_container.pyplot(fig)
+def plot_classified_places_in_state(
+    state_code: str, state_name: str, streamlit_container: st.container
+) -> None:
+    plot_federal_states([(state_code, state_name)], streamlit_container)
+
 
 def plot_classifications(df, ax):
     df[df["attitude"] == "negative"].plot(